@@ -1,44 +1,64 @@
 import React, { useState, useEffect } from "react";
 import { AlertTriangle, ChevronDown, ChevronUp, Check, X } from "lucide-react";
-import { Claim } from "../types";
+import { Claim, Page } from "../types";
+
+const PAGE_SIZE = 50;
 
 const AdminClaims = () => {
   const [claims, setClaims] = useState<Claim[]>([]);
   const [expandedClaim, setExpandedClaim] = useState<string | null>(null);
   const [loading, setLoading] = useState(true);
   const [error, setError] = useState<string | null>(null);
+  const [nextCursor, setNextCursor] = useState<string | null>(null);
+  const [loadingMore, setLoadingMore] = useState(false);
+  const [statusFilter, setStatusFilter] = useState("");
+  const [colorFilter, setColorFilter] = useState("");
 
   useEffect(() => {
-    fetchClaims();
-  }, []);
+    setLoading(true);
+    fetchClaims(null);
+  }, [statusFilter, colorFilter]);
 
-  const fetchClaims = async () => {
+  const fetchClaims = async (cursor: string | null) => {
     try {
-      const response = await fetch("http://localhost:8081/admin/claims");
+      // Filtering and paging happen on the server
+      const params = new URLSearchParams({ limit: String(PAGE_SIZE) });
+      if (statusFilter) params.set("status", statusFilter);
+      if (colorFilter) params.set("color", colorFilter);
+      if (cursor) params.set("cursor", cursor);
+
+      const response = await fetch(
+        `http://localhost:8081/admin/claims?${params.toString()}`
+      );
       if (!response.ok) {
         throw new Error("Failed to fetch claims");
       }
-      const data = (await response.json()) as Claim[];
-      console.log(data);
+      const data = (await response.json()) as Page<Claim>;
 
       // Deduplicate claims based on claimManagementId
-      const dedupedClaims = Array.from(
-        new Map(
-          data.map((claim: Claim) => [
-            claim.claimDetails.claimManagementId,
-            claim,
-          ])
-        ).values()
+      setClaims((prevClaims) =>
+        Array.from(
+          new Map(
+            [...(cursor ? prevClaims : []), ...data.items].map(
+              (claim: Claim) => [claim.claimDetails.claimManagementId, claim]
+            )
+          ).values()
+        )
       );
-
-      setClaims(dedupedClaims);
+      setNextCursor(data.next_cursor);
     } catch (err) {
       setError(err instanceof Error ? err.message : "An error occurred");
     } finally {
       setLoading(false);
+      setLoadingMore(false);
     }
   };
 
+  const loadMore = () => {
+    setLoadingMore(true);
+    fetchClaims(nextCursor);
+  };
+
   const toggleExpand = (claimId: string) => {
     setExpandedClaim(expandedClaim === claimId ? null : claimId);
   };
@@ -104,6 +124,29 @@ const AdminClaims = () => {
         Claims Management
       </h1>
 
+      <div className="flex gap-4 mb-4">
+        <select
+          value={statusFilter}
+          onChange={(e) => setStatusFilter(e.target.value)}
+          className="border border-gray-300 rounded-md px-3 py-2 text-sm"
+        >
+          <option value="">All statuses</option>
+          <option value="In Progress">In Progress</option>
+          <option value="Pending">Pending</option>
+          <option value="Approved">Approved</option>
+          <option value="Rejected">Rejected</option>
+        </select>
+        <select
+          value={colorFilter}
+          onChange={(e) => setColorFilter(e.target.value)}
+          className="border border-gray-300 rounded-md px-3 py-2 text-sm"
+        >
+          <option value="">All risk levels</option>
+          <option value="red">Flagged</option>
+          <option value="green">Clear</option>
+        </select>
+      </div>
+
       <div className="bg-white rounded-lg shadow-sm border border-gray-200 overflow-hidden">
         <table className="w-full">
           <thead>
@@ -294,6 +337,18 @@ const AdminClaims = () => {
           </tbody>
         </table>
       </div>
+
+      {nextCursor && (
+        <div className="flex justify-center mt-4">
+          <button
+            onClick={loadMore}
+            disabled={loadingMore}
+            className="px-4 py-2 bg-blue-600 text-white rounded-md hover:bg-blue-700 disabled:opacity-50"
+          >
+            {loadingMore ? "Loading..." : "Load more"}
+          </button>
+        </div>
+      )}
     </div>
   );
 };
@@ -8,7 +8,9 @@ import {
   Car,
   Truck as Truck2,
 } from "lucide-react";
-import type { Policy } from "../types";
+import type { Page, Policy } from "../types";
+
+const PAGE_SIZE = 50;
 
 const AdminPolicies = () => {
   const [policies, setPolicies] = useState<Policy[]>([]);
@@ -20,20 +22,31 @@ const AdminPolicies = () => {
     fileName: string;
   } | null>(null);
 
+  const [nextCursor, setNextCursor] = useState<string | null>(null);
+  const [loadingMore, setLoadingMore] = useState(false);
+  const [statusFilter, setStatusFilter] = useState("");
+
   useEffect(() => {
-    fetchPolicies();
-  }, []);
+    setLoading(true);
+    fetchPolicies(null);
+  }, [statusFilter]);
 
-  const fetchPolicies = async () => {
+  const fetchPolicies = async (cursor: string | null) => {
     try {
-      const response = await fetch("http://localhost:8081/admin/policies");
+      // Filtering and paging happen on the server
+      const params = new URLSearchParams({ limit: String(PAGE_SIZE) });
+      if (statusFilter) params.set("status", statusFilter);
+      if (cursor) params.set("cursor", cursor);
+
+      const response = await fetch(
+        `http://localhost:8081/admin/policies?${params.toString()}`
+      );
       if (!response.ok) {
         throw new Error("Failed to fetch policies");
       }
-      const data = await response.json();
-      console.log(data);
+      const data = (await response.json()) as Page<Policy>;
 
-      const transformedPolicies = (data as Policy[]).map((policy) => ({
+      const transformedPolicies = data.items.map((policy) => ({
         id: policy.id,
         customerId: policy.personalInfo.customer_id, // Include customer ID
         vehicleDetails: policy.vehicleDetails,
@@ -59,11 +72,16 @@ const AdminPolicies = () => {
       }));
 
       // Deduplicate policies based on policy id
-      const uniquePolicies = Array.from(
-        new Map(transformedPolicies.map((p: Policy) => [p.id, p])).values()
+      setPolicies((prevPolicies) =>
+        Array.from(
+          new Map(
+            [...(cursor ? prevPolicies : []), ...transformedPolicies].map(
+              (p: Policy) => [p.id, p]
+            )
+          ).values()
+        )
       );
-
-      setPolicies(uniquePolicies);
+      setNextCursor(data.next_cursor);
     } catch (err) {
       if (err instanceof Error) {
         setError(err.message);
@@ -72,9 +90,15 @@ const AdminPolicies = () => {
       }
     } finally {
       setLoading(false);
+      setLoadingMore(false);
     }
   };
 
+  const loadMore = () => {
+    setLoadingMore(true);
+    fetchPolicies(nextCursor);
+  };
+
   const fetchDocuments = async (policyId: string) => {
     try {
       console.log("The policy id is " + policyId);
@@ -181,6 +205,18 @@ const AdminPolicies = () => {
       <h1 className="text-3xl font-bold text-gray-900 mb-8">
         Policy Management
       </h1>
+      <div className="flex gap-4 mb-4">
+        <select
+          value={statusFilter}
+          onChange={(e) => setStatusFilter(e.target.value)}
+          className="border border-gray-300 rounded-md px-3 py-2 text-sm"
+        >
+          <option value="">All statuses</option>
+          <option value="PENDING">Pending</option>
+          <option value="Active">Active</option>
+          <option value="Rejected">Rejected</option>
+        </select>
+      </div>
       <div className="bg-white rounded-lg shadow-sm border border-gray-200 overflow-hidden">
         <table className="w-full">
           <thead>
@@ -538,6 +574,18 @@ const AdminPolicies = () => {
         </table>
       </div>
 
+      {nextCursor && (
+        <div className="flex justify-center mt-4">
+          <button
+            onClick={loadMore}
+            disabled={loadingMore}
+            className="px-4 py-2 bg-blue-600 text-white rounded-md hover:bg-blue-700 disabled:opacity-50"
+          >
+            {loadingMore ? "Loading..." : "Load more"}
+          </button>
+        </div>
+      )}
+
       {/* Modal Popup for Full Image */}
       {selectedDoc && (
         <div className="fixed inset-0 flex items-center justify-center z-50">
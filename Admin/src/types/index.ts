@@ -71,3 +71,10 @@ export interface Claim {
   userName: string;
   claimDetails: ClaimDetails;
 }
+
+// One keyset page from the admin list endpoints
+export interface Page<T> {
+  items: T[];
+  next_cursor: string | null;
+  total?: number;
+}
@@ -14,6 +14,9 @@ from config import Config
 import warnings
 warnings.filterwarnings("ignore")
 from middleware.behavior_tracker import UserBehaviorTracker
+from database.schema import bootstrap_schema
+from database.stats import start_stats_reconciler
+from utils.scoring_queue import start_scoring_workers
 
 app = Flask(__name__)
 CORS(app)
@@ -22,6 +25,16 @@ app.config.from_object(Config)
 # Register blueprints
 os.makedirs(Config.UPLOAD_FOLDER, exist_ok=True)
 
+# Make sure every hot lookup is index-backed before serving traffic
+if Config.NEO4J_SCHEMA_ON_STARTUP:
+    bootstrap_schema()
+
+# Periodically correct any drift in the incrementally maintained dashboard counters
+start_stats_reconciler(Config.STATS_RECONCILE_INTERVAL)
+
+# Fraud scoring of submitted claims runs off the request path
+start_scoring_workers()
+
 behavior_tracker = UserBehaviorTracker(app)
 
 # Register blueprints
@@ -11,6 +11,78 @@ class Config:
     NEO4J_URI = os.getenv('NEO4J_URI')
     NEO4J_USER = os.getenv('NEO4J_USER')
     NEO4J_PASSWORD = os.getenv('NEO4J_PASSWORD')
+
+    # Neo4j connection pool (shared by every Neo4jConnection in the process)
+    NEO4J_MAX_POOL_SIZE = int(os.getenv('NEO4J_MAX_POOL_SIZE', 50))
+    NEO4J_ACQUISITION_TIMEOUT = float(os.getenv('NEO4J_ACQUISITION_TIMEOUT', 30))  # seconds
+    NEO4J_MAX_CONNECTION_LIFETIME = float(os.getenv('NEO4J_MAX_CONNECTION_LIFETIME', 3600))  # seconds
+    NEO4J_LIVENESS_CHECK_TIMEOUT = float(os.getenv('NEO4J_LIVENESS_CHECK_TIMEOUT', 60))  # seconds
+    NEO4J_FETCH_SIZE = int(os.getenv('NEO4J_FETCH_SIZE', 1000))  # records per network pull when streaming
+    NEO4J_BULK_BATCH_SIZE = int(os.getenv('NEO4J_BULK_BATCH_SIZE', 1000))  # rows per UNWIND transaction
+    NEO4J_BULK_WORKERS = int(os.getenv('NEO4J_BULK_WORKERS', 4))  # concurrent batch transactions
+
+    # Create indexes/constraints and check hot query plans when the app starts
+    NEO4J_SCHEMA_ON_STARTUP = os.getenv('NEO4J_SCHEMA_ON_STARTUP', 'true').lower() == 'true'
+
+    # Admin list endpoints (keyset pagination)
+    ADMIN_PAGE_SIZE = int(os.getenv('ADMIN_PAGE_SIZE', 50))
+    ADMIN_MAX_PAGE_SIZE = int(os.getenv('ADMIN_MAX_PAGE_SIZE', 500))
+
+    # Full recount of the materialized admin dashboard counters
+    STATS_RECONCILE_INTERVAL = int(os.getenv('STATS_RECONCILE_INTERVAL', 900))  # seconds
+
+    # Fraud model used for scoring: the XGBClassifier pickle, or the native booster
+    # exported from it by scripts/export_fraud_model.py (utils/xgb_fraud_model.ubj)
+    FRAUD_MODEL_PATH = os.getenv('FRAUD_MODEL_PATH', 'utils/xgb_fraud_model_gridcv.pkl')
+    # Fraud model files are re-checked for changes (mtime, then content hash) this often
+    MODEL_RELOAD_CHECK_INTERVAL = float(os.getenv('MODEL_RELOAD_CHECK_INTERVAL', 5))  # seconds
+    FRAUD_SCORING_CHUNK_SIZE = int(os.getenv('FRAUD_SCORING_CHUNK_SIZE', 2000))  # claims per batch predict
+    FRAUD_REASON_TOP_K = int(os.getenv('FRAUD_REASON_TOP_K', 3))  # features named in each fraudReason
+    # fraudReason ranks features by approximate (Saabas) contributions; exact TreeSHAP
+    # is about 500x slower (roughly 19 s per 2000-claim chunk on the shipped model)
+    FRAUD_REASON_EXACT_SHAP = os.getenv('FRAUD_REASON_EXACT_SHAP', 'false').lower() == 'true'
+    # Candidate model scored in the background next to production (empty = off)
+    FRAUD_SHADOW_MODEL_PATH = os.getenv('FRAUD_SHADOW_MODEL_PATH', '')
+    SHADOW_QUEUE_SIZE = int(os.getenv('SHADOW_QUEUE_SIZE', 1000))  # frames waiting for the shadow thread
+
+    # Background fraud scoring of submitted claims
+    SCORING_WORKERS = int(os.getenv('SCORING_WORKERS', 2))
+    SCORING_QUEUE_SIZE = int(os.getenv('SCORING_QUEUE_SIZE', 1000))
+    SCORING_RECOVERY_INTERVAL = int(os.getenv('SCORING_RECOVERY_INTERVAL', 60))  # seconds between sweeps for queued jobs
+    SCORING_STALE_AFTER = int(os.getenv('SCORING_STALE_AFTER', 600))  # seconds before a running job is retried
+    SCORING_MAX_WAIT = float(os.getenv('SCORING_MAX_WAIT', 30))  # longest ?wait= on the status endpoint
+
+    # Behaviour tracking sessions (middleware/behavior_tracker.py): 'memory' keeps them
+    # per process, 'sqlite' shares them across worker processes through BEHAVIOR_SESSION_DB
+    BEHAVIOR_SESSION_BACKEND = os.getenv('BEHAVIOR_SESSION_BACKEND', 'memory')
+    BEHAVIOR_SESSION_DB = os.getenv('BEHAVIOR_SESSION_DB', '')  # default logs/behavior_sessions.db
+    BEHAVIOR_MAX_SESSIONS = int(os.getenv('BEHAVIOR_MAX_SESSIONS', 100000))  # least recently used are evicted beyond this
+    BEHAVIOR_SESSION_TTL = int(os.getenv('BEHAVIOR_SESSION_TTL', 3600))  # seconds from a session's first request
+    BEHAVIOR_CLEANUP_INTERVAL = int(os.getenv('BEHAVIOR_CLEANUP_INTERVAL', 300))  # seconds between expiry sweeps
+    # Per-user sketches across sessions: HyperLogLog registers = 2 ** precision, count-min width x depth
+    BEHAVIOR_MAX_USERS = int(os.getenv('BEHAVIOR_MAX_USERS', 20000))  # least recently active are evicted beyond this
+    BEHAVIOR_SKETCH_PRECISION = int(os.getenv('BEHAVIOR_SKETCH_PRECISION', 8))
+    BEHAVIOR_SKETCH_CMS_WIDTH = int(os.getenv('BEHAVIOR_SKETCH_CMS_WIDTH', 128))
+    BEHAVIOR_SKETCH_CMS_DEPTH = int(os.getenv('BEHAVIOR_SKETCH_CMS_DEPTH', 4))
+    BEHAVIOR_LOG_BUFFER_SIZE = int(os.getenv('BEHAVIOR_LOG_BUFFER_SIZE', 10000))  # windows buffered before dropping
+    BEHAVIOR_LOG_FLUSH_SIZE = int(os.getenv('BEHAVIOR_LOG_FLUSH_SIZE', 500))  # buffered windows that trigger a write
+    BEHAVIOR_LOG_FLUSH_INTERVAL = float(os.getenv('BEHAVIOR_LOG_FLUSH_INTERVAL', 1.0))  # seconds between writes
+    BEHAVIOR_LOG_DROP_POLICY = os.getenv('BEHAVIOR_LOG_DROP_POLICY', 'drop_newest')  # or drop_oldest
+    BEHAVIOR_LOG_SEGMENT_BYTES = int(os.getenv('BEHAVIOR_LOG_SEGMENT_BYTES', 64 * 1024 * 1024))  # rotate at this size
+    BEHAVIOR_LOG_SEGMENT_SECONDS = int(os.getenv('BEHAVIOR_LOG_SEGMENT_SECONDS', 3600))  # or after this long
+
+    # Behaviour anomaly scoring: the IsolationForest pickle, or the flat-array export
+    # of it made by scripts/export_anomaly_model.py (routes/models/iso_forest_model.npz)
+    ANOMALY_MODEL_PATH = os.getenv('ANOMALY_MODEL_PATH', 'routes/models/iso_forest_model.pkl')
+    # The flat export is slower than sklearn beyond ~1000 rows; larger batches go to this pickle
+    ANOMALY_FLAT_MAX_ROWS = int(os.getenv('ANOMALY_FLAT_MAX_ROWS', 1000))  # rows per batch scored by the flat export
+    ANOMALY_LARGE_BATCH_MODEL_PATH = os.getenv('ANOMALY_LARGE_BATCH_MODEL_PATH', 'routes/models/iso_forest_model.pkl')
+    ANOMALY_MAX_BATCH_SIZE = int(os.getenv('ANOMALY_MAX_BATCH_SIZE', 10000))  # events per /log/detect-anomaly/batch call
+    # Behaviour windows scored in the background as the tracker produces them
+    ANOMALY_STREAM_ENABLED = os.getenv('ANOMALY_STREAM_ENABLED', 'true').lower() == 'true'
+    ANOMALY_STREAM_QUEUE_SIZE = int(os.getenv('ANOMALY_STREAM_QUEUE_SIZE', 1000))  # windows waiting; more are dropped
+    ANOMALY_STREAM_BATCH_SIZE = int(os.getenv('ANOMALY_STREAM_BATCH_SIZE', 256))  # windows per decision_function call
+    ANOMALY_STREAM_MAX_DELAY = float(os.getenv('ANOMALY_STREAM_MAX_DELAY', 0.5))  # seconds a batch waits to fill
     
     # JWT Authentication
     JWT_SECRET_KEY = os.getenv('JWT_SECRET_KEY')
@@ -1,15 +1,145 @@
+import atexit
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from neo4j import GraphDatabase
 from config import Config
 
+# Process-wide driver registry, keyed by (uri, user). Every Neo4jConnection
+# shares the driver (and therefore the connection pool) for its target.
+_drivers = {}
+_registry_lock = threading.Lock()
+
+
+class PoolMetrics:
+    """Counters for connection acquisition on a shared driver"""
+
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self.acquisitions = 0
+        self.acquire_failures = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+        self._lock = threading.Lock()
+
+    def record(self, wait, failed=False):
+        with self._lock:
+            if failed:
+                self.acquire_failures += 1
+                return
+            self.acquisitions += 1
+            self.total_wait += wait
+            self.max_wait = max(self.max_wait, wait)
+
+    def snapshot(self, pool):
+        in_use, idle = _count_pool_connections(pool)
+        with self._lock:
+            avg_wait = self.total_wait / self.acquisitions if self.acquisitions else 0.0
+            return {
+                'max_size': self.max_size,
+                'in_use': in_use,
+                'idle': idle,
+                'acquisitions': self.acquisitions,
+                'acquire_failures': self.acquire_failures,
+                'avg_wait_ms': round(avg_wait * 1000, 3),
+                'max_wait_ms': round(self.max_wait * 1000, 3)
+            }
+
+
+def _count_pool_connections(pool):
+    """Count in-use and idle connections in the driver's pool"""
+    connections = getattr(pool, 'connections', None)
+    if not connections:
+        return 0, 0
+    in_use = idle = 0
+    for address_connections in list(connections.values()):
+        for connection in list(address_connections):
+            if getattr(connection, 'in_use', False):
+                in_use += 1
+            else:
+                idle += 1
+    return in_use, idle
+
+
+def _instrument_pool(driver, metrics):
+    """Time every connection acquisition made through the driver's pool"""
+    pool = getattr(driver, '_pool', None)
+    acquire = getattr(pool, 'acquire', None)
+    if acquire is None:
+        return
+
+    def timed_acquire(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            connection = acquire(*args, **kwargs)
+        except Exception:
+            metrics.record(0.0, failed=True)
+            raise
+        metrics.record(time.perf_counter() - start)
+        return connection
+
+    pool.acquire = timed_acquire
+
+
+def get_driver(uri=None, user=None, password=None):
+    """Return the shared driver for the target, creating it on first use"""
+    uri = uri or Config.NEO4J_URI
+    user = user or Config.NEO4J_USER
+    key = (uri, user)
+    entry = _drivers.get(key)
+    if entry is not None:
+        return entry[0]
+
+    with _registry_lock:
+        entry = _drivers.get(key)
+        if entry is None:
+            driver = GraphDatabase.driver(
+                uri,
+                auth=(user, password or Config.NEO4J_PASSWORD),
+                max_connection_pool_size=Config.NEO4J_MAX_POOL_SIZE,
+                connection_acquisition_timeout=Config.NEO4J_ACQUISITION_TIMEOUT,
+                max_connection_lifetime=Config.NEO4J_MAX_CONNECTION_LIFETIME,
+                liveness_check_timeout=Config.NEO4J_LIVENESS_CHECK_TIMEOUT
+            )
+            metrics = PoolMetrics(Config.NEO4J_MAX_POOL_SIZE)
+            _instrument_pool(driver, metrics)
+            entry = (driver, metrics)
+            _drivers[key] = entry
+    return entry[0]
+
+
+def pool_metrics():
+    """Return pool metrics for every registered driver"""
+    with _registry_lock:
+        entries = list(_drivers.items())
+    return {
+        uri: metrics.snapshot(getattr(driver, '_pool', None))
+        for (uri, _), (driver, metrics) in entries
+    }
+
+
+def close_driver():
+    """Close every shared driver. Called once at interpreter shutdown."""
+    with _registry_lock:
+        entries = list(_drivers.values())
+        _drivers.clear()
+    for driver, _ in entries:
+        try:
+            driver.close()
+        except Exception as e:
+            print(f"Error closing Neo4j driver: {str(e)}")
+
+
+atexit.register(close_driver)
+
+
 class Neo4jConnection:
     def __init__(self):
-        self.driver = GraphDatabase.driver(
-            Config.NEO4J_URI,
-            auth=(Config.NEO4J_USER, Config.NEO4J_PASSWORD)
-        )
+        self.driver = get_driver()
 
     def close(self):
-        self.driver.close()
+        # The driver is shared across the process; close_driver() owns shutdown.
+        pass
 
     def get_session(self):
         return self.driver.session()
@@ -17,4 +147,75 @@ class Neo4jConnection:
     def execute_query(self, query, parameters=None):
         with self.driver.session() as session:
             result = session.run(query, parameters or {})
-            return list(result)
\ No newline at end of file
+            return list(result)
+
+    def execute_write(self, work, *args, **kwargs):
+        """Run work(tx, *args, **kwargs) in a managed write transaction (retried on transient errors)"""
+        with self.driver.session() as session:
+            return session.execute_write(work, *args, **kwargs)
+
+    def stream_query(self, query, parameters=None, fetch_size=None):
+        """
+        Yield records lazily, pulling them from the server fetch_size at a time.
+        The session stays open until the generator is exhausted or closed.
+        """
+        with self.driver.session(fetch_size=fetch_size or Config.NEO4J_FETCH_SIZE) as session:
+            result = session.run(query, parameters or {})
+            for record in result:
+                yield record
+
+    def write_batches(self, queries, rows, batch_size=None, workers=None, skip=None, on_commit=None,
+                      prepare=None):
+        """
+        Write rows in UNWIND batches. Every query receives the batch as $rows and
+        all queries for a batch run in one explicit write transaction, so a batch
+        either commits completely or not at all.
+
+        :param queries: a Cypher string, or a list of them, each starting with UNWIND $rows.
+        :param rows: list of parameter maps.
+        :param skip: batch indices already committed by an earlier run.
+        :param on_commit: called as on_commit(batch_index, batch_rows) after each commit.
+        :param prepare: called as prepare(batch_rows) in the worker thread before the
+            batch's transaction, for per-row work that should run in parallel.
+        :return: number of rows written by this call.
+        """
+        if isinstance(queries, str):
+            queries = [queries]
+        batch_size = batch_size or Config.NEO4J_BULK_BATCH_SIZE
+        workers = workers or Config.NEO4J_BULK_WORKERS
+        skip = skip or set()
+
+        batches = [
+            (index, rows[start:start + batch_size])
+            for index, start in enumerate(range(0, len(rows), batch_size))
+            if index not in skip
+        ]
+
+        def write_batch(tx, batch):
+            for query in queries:
+                tx.run(query, rows=batch).consume()
+
+        def run_batch(index, batch):
+            if prepare:
+                prepare(batch)
+            with self.driver.session() as session:
+                session.execute_write(write_batch, batch)
+            return index, batch
+
+        written = 0
+        errors = []
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = [executor.submit(run_batch, index, batch) for index, batch in batches]
+            for future in as_completed(futures):
+                # Keep recording the batches that did commit so a resumed run skips them
+                try:
+                    index, batch = future.result()
+                except Exception as e:
+                    errors.append(e)
+                    continue
+                written += len(batch)
+                if on_commit:
+                    on_commit(index, batch)
+        if errors:
+            raise errors[0]
+        return written
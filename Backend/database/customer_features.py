@@ -0,0 +1,133 @@
+"""
+Per-customer fraud features kept on the User node.
+
+The fraud model's history features are aggregates over a customer's graph.
+Instead of traversing for them at scoring time, the write paths that change
+them apply a delta to counters on the User node. Each Claim is written with a
+copy of its owner's counters as they stood when it was filed
+(CLAIM_FEATURES_SET), and scoring reads that copy with FEATURE_PROJECTION, so
+a claim scored again later (a rescore) still gets its history as of filing. A
+rebuild recomputes the counters from the graph:
+
+    python -m database.customer_features --rebuild
+"""
+import argparse
+from database.connection import Neo4jConnection, close_driver
+
+# User counter -> what it counts
+FEATURE_COUNTERS = {
+    'claimCount': 'claims filed',
+    'supplementCount': 'claims added to an already open ClaimManagement case',
+    'addressChangeCount': 'address changes',
+    'policyCount': 'insurance applications',
+}
+
+FEATURE_DELTA_QUERY = """
+MATCH (u:User {email: $email})
+SET """ + ",\n    ".join(
+    f"u.{field} = coalesce(u.{field}, 0) + coalesce($delta.{field}, 0)" for field in FEATURE_COUNTERS
+) + """,
+    u.addressChangedAt = CASE WHEN coalesce($delta.addressChangeCount, 0) > 0
+                              THEN timestamp() ELSE u.addressChangedAt END,
+    u.featuresUpdatedAt = timestamp()
+"""
+
+# Set on the new Claim `c` of User `u` by the claim-filing queries. They run
+# before claim_filed_delta is applied, so the counts exclude the claim itself.
+CLAIM_FEATURES_SET = """
+    c.filed_ts = timestamp(),
+    c.pastClaimsAtFiling = coalesce(u.claimCount, 0),
+    c.supplementsAtFiling = coalesce(u.supplementCount, 0),
+    c.policiesAtFiling = coalesce(u.policyCount, 0),
+    c.addressChangedAt = u.addressChangedAt
+"""
+
+# Model input properties read by the feature pipeline for Claim `c` (its Incident
+# `i`, case `cm`) of User `u`, as of when the claim was filed. addressChangeClaim
+# is the days from the last address change to filing, null if there was none.
+# Claims filed before CLAIM_FEATURES_SET existed count the owner's claims with an
+# earlier incident, and use the current counters for the rest.
+FEATURE_PROJECTION = """u {
+    pastClaims: CASE WHEN c.pastClaimsAtFiling IS NOT NULL THEN c.pastClaimsAtFiling
+                ELSE COUNT { (u)-[:HAS_CLAIMS]->(:ClaimManagement)-[:MANAGES]->(:Claim)
+                             -[:OCCURRED_ON]->(pi:Incident) WHERE pi.date < i.date } END,
+    numberOfSupplements: coalesce(c.supplementsAtFiling, u.supplementCount, 0),
+    numberOfCars: coalesce(c.policiesAtFiling, u.policyCount, 0),
+    addressChangeClaim: CASE WHEN c.filed_ts IS NOT NULL
+                             THEN (c.filed_ts - c.addressChangedAt) / 86400000.0
+                             WHEN u.addressChangedAt < cm.created_ts
+                             THEN (cm.created_ts - u.addressChangedAt) / 86400000.0 END
+}"""
+
+# Address history is not in the graph, so a rebuild keeps the running count
+REBUILD_QUERY = """
+MATCH (u:User)
+CALL {
+    WITH u
+    OPTIONAL MATCH (u)-[:HAS_CLAIMS]->(cm:ClaimManagement)
+    OPTIONAL MATCH (cm)-[:MANAGES]->(c:Claim)
+    WITH u, count(DISTINCT cm) AS cases, count(DISTINCT c) AS claims
+    OPTIONAL MATCH (u)-[:INSURANCE]->(a:Application)
+    WITH u, cases, claims, count(DISTINCT a) AS policies
+    SET u.claimCount = claims,
+        u.supplementCount = CASE WHEN claims > cases THEN claims - cases ELSE 0 END,
+        u.addressChangeCount = coalesce(u.addressChangeCount, 0),
+        u.policyCount = policies,
+        u.featuresUpdatedAt = timestamp()
+} IN TRANSACTIONS OF 1000 ROWS
+"""
+
+
+def claim_filed_delta(attached_to_existing_case=False):
+    delta = {'claimCount': 1}
+    if attached_to_existing_case:
+        delta['supplementCount'] = 1
+    return delta
+
+
+def address_change_delta(old_address, new_address):
+    return {'addressChangeCount': 1 if old_address != new_address else 0}
+
+
+def policy_applied_delta():
+    return {'policyCount': 1}
+
+
+def apply_feature_delta(tx, email, delta):
+    """Add delta to the user's counters inside the caller's transaction or session"""
+    if any(delta.values()):
+        tx.run(FEATURE_DELTA_QUERY, email=email, delta=delta).consume()
+
+
+def record_feature_delta(email, delta, neo4j=None):
+    """Apply delta in its own transaction, for writers that use auto-commit queries"""
+    if not any(delta.values()):
+        return
+    neo4j = neo4j or Neo4jConnection()
+    neo4j.execute_query(FEATURE_DELTA_QUERY, {'email': email, 'delta': delta})
+
+
+def rebuild_customer_features(neo4j=None):
+    """Recompute every user's counters from the graph"""
+    neo4j = neo4j or Neo4jConnection()
+    with neo4j.get_session() as session:
+        session.run(REBUILD_QUERY).consume()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Maintain the per-customer fraud features")
+    parser.add_argument('--rebuild', action='store_true', help="recompute every user's counters")
+    args = parser.parse_args()
+
+    if not args.rebuild:
+        parser.print_help()
+        return
+    try:
+        rebuild_customer_features()
+        print("Customer features rebuilt.")
+    finally:
+        close_driver()
+
+
+if __name__ == '__main__':
+    main()
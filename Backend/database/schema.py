@@ -0,0 +1,228 @@
+"""
+Neo4j schema bootstrap: every index and constraint the hot queries rely on.
+
+Startup (see Config.NEO4J_SCHEMA_ON_STARTUP) only creates what is missing and
+verifies the plans. The backfills walk the whole graph, so they are run from
+the command line, once after upgrading a database written by older code:
+
+    python -m database.schema             # apply, backfill and verify
+    python -m database.schema --apply     # apply only
+    python -m database.schema --backfill  # backfill only
+    python -m database.schema --verify    # verify only
+"""
+import argparse
+import sys
+from database.connection import Neo4jConnection, close_driver
+from utils.fraud_score import backfill_fraud_scores
+
+# (name, label, property) -- property values must be unique per label
+CONSTRAINTS = [
+    ('user_email', 'User', 'email'),
+    ('claim_id', 'Claim', 'id'),
+    ('dashboard_stats_id', 'DashboardStats', 'id'),
+]
+
+# (name, label, property) -- lookup indexes for properties that are not unique
+# in existing data (generated ids may repeat across imports)
+INDEXES = [
+    ('user_customer_id', 'User', 'customerId'),
+    ('application_id', 'Application', 'application_id'),
+    ('application_email', 'Application', 'email'),
+    ('claim_management_id', 'ClaimManagement', 'id'),
+    ('customer_id', 'Customer', 'id'),
+    # Admin list sort keys and filters
+    ('application_created_ts', 'Application', 'created_ts'),
+    ('application_status', 'Application', 'status'),
+    ('application_city', 'Application', 'city'),
+    ('application_vehicle_type', 'Application', 'vehicle_type'),
+    ('claim_management_created_ts', 'ClaimManagement', 'created_ts'),
+    ('claim_management_status', 'ClaimManagement', 'status'),
+    ('claim_management_forgery_score', 'ClaimManagement', 'forgeryScore'),
+    ('claim_management_color_code', 'ClaimManagement', 'colorCode'),
+    ('claim_management_scoring_status', 'ClaimManagement', 'scoringStatus'),
+    ('incident_city', 'Incident', 'city'),
+]
+
+# created_ts (epoch ms) is the keyset sort key for the admin lists. Nodes written
+# before it existed get it derived from their stored timestamp.
+SORT_KEY_BACKFILLS = [
+    """
+    MATCH (a:Application) WHERE a.created_ts IS NULL
+    CALL {
+        WITH a
+        SET a.created_ts = CASE WHEN a.created_at IS NULL THEN 0
+            ELSE datetime(replace(toString(a.created_at), ' ', 'T')).epochMillis END
+    } IN TRANSACTIONS OF 10000 ROWS
+    """,
+    """
+    MATCH (cm:ClaimManagement) WHERE cm.created_ts IS NULL
+    CALL {
+        WITH cm
+        SET cm.created_ts = CASE WHEN cm.last_updated IS NULL THEN 0
+            ELSE datetime(replace(toString(cm.last_updated), ' ', 'T')).epochMillis END
+    } IN TRANSACTIONS OF 10000 ROWS
+    """,
+]
+
+# Queries that must be served by an index, with sample parameters for EXPLAIN
+HOT_QUERIES = {
+    'user_by_email': (
+        "MATCH (u:User {email: $email}) RETURN u",
+        {'email': ''}
+    ),
+    'user_by_customer_id': (
+        "MATCH (u:User {customerId: $customer_id})-[:HAS_CLAIMS]->(cm:ClaimManagement) RETURN cm",
+        {'customer_id': ''}
+    ),
+    'application_by_id': (
+        "MATCH (a:Application {application_id: $application_id}) RETURN a",
+        {'application_id': ''}
+    ),
+    'applications_by_email': (
+        "MATCH (a:Application) WHERE a.email = $email RETURN a",
+        {'email': ''}
+    ),
+    'claim_management_by_id': (
+        "MATCH (cm:ClaimManagement {id: $claim_id}) RETURN cm",
+        {'claim_id': ''}
+    ),
+    'claim_by_id': (
+        "MATCH (c:Claim {id: $claim_id}) RETURN c",
+        {'claim_id': ''}
+    ),
+    'customer_by_id': (
+        "MATCH (cust:Customer {id: $customer_id}) RETURN cust",
+        {'customer_id': ''}
+    ),
+    'policies_page': (
+        "MATCH (a:Application) WHERE a.created_ts <= $before_key "
+        "RETURN a ORDER BY a.created_ts DESC LIMIT 50",
+        {'before_key': 0}
+    ),
+    'claims_page': (
+        "MATCH (cm:ClaimManagement) WHERE cm.created_ts <= $before_key "
+        "RETURN cm ORDER BY cm.created_ts DESC LIMIT 50",
+        {'before_key': 0}
+    ),
+    'claims_by_color': (
+        "MATCH (cm:ClaimManagement) WHERE cm.colorCode = $color_code RETURN cm",
+        {'color_code': ''}
+    ),
+    'claims_by_forgery_score': (
+        "MATCH (cm:ClaimManagement) WHERE cm.forgeryScore <= $before_key "
+        "RETURN cm ORDER BY cm.forgeryScore DESC LIMIT 50",
+        {'before_key': 0}
+    ),
+}
+
+# Plan operators that mean a query walks every node of a label (or the whole graph)
+SCAN_OPERATORS = ('NodeByLabelScan', 'AllNodesScan')
+
+
+class SchemaError(Exception):
+    """Raised when a hot query would not use an index"""
+
+
+def schema_statements():
+    statements = [
+        f"CREATE CONSTRAINT {name} IF NOT EXISTS FOR (n:{label}) REQUIRE n.{prop} IS UNIQUE"
+        for name, label, prop in CONSTRAINTS
+    ]
+    statements += [
+        f"CREATE INDEX {name} IF NOT EXISTS FOR (n:{label}) ON (n.{prop})"
+        for name, label, prop in INDEXES
+    ]
+    return statements
+
+
+def apply_schema(neo4j=None, await_seconds=300):
+    """Create any missing constraints and indexes, then wait for them to come online"""
+    neo4j = neo4j or Neo4jConnection()
+    statements = schema_statements()
+    with neo4j.get_session() as session:
+        for statement in statements:
+            session.run(statement).consume()
+        session.run("CALL db.awaitIndexes($timeout)", timeout=await_seconds).consume()
+    return statements
+
+
+def backfill_sort_keys(neo4j=None):
+    """Derive created_ts on nodes that predate it (no-op once every node has one)"""
+    neo4j = neo4j or Neo4jConnection()
+    with neo4j.get_session() as session:
+        for query in SORT_KEY_BACKFILLS:
+            session.run(query).consume()
+
+
+def _scan_operators(plan):
+    """Collect label/all-node scan operators anywhere in an EXPLAIN plan"""
+    if not plan:
+        return []
+    operator = plan.get('operatorType', '')
+    found = [operator] if operator.split('@')[0] in SCAN_OPERATORS else []
+    for child in plan.get('children', []):
+        found += _scan_operators(child)
+    return found
+
+
+def verify_query_plans(neo4j=None):
+    """EXPLAIN every hot query and raise SchemaError if any still scans a label"""
+    neo4j = neo4j or Neo4jConnection()
+    failures = {}
+    with neo4j.get_session() as session:
+        for name, (query, params) in HOT_QUERIES.items():
+            summary = session.run(f"EXPLAIN {query}", params).consume()
+            scans = _scan_operators(summary.plan)
+            if scans:
+                failures[name] = scans
+    if failures:
+        details = ', '.join(f"{name} ({', '.join(ops)})" for name, ops in failures.items())
+        raise SchemaError(f"Hot queries would scan instead of using an index: {details}")
+
+
+def bootstrap_schema(neo4j=None):
+    """
+    Apply the schema and verify the hot queries; used at application startup.
+    Backfills are not run here: see backfill_schema.
+    """
+    neo4j = neo4j or Neo4jConnection()
+    apply_schema(neo4j)
+    verify_query_plans(neo4j)
+
+
+def backfill_schema(neo4j=None):
+    """Derive created_ts, forgeryScore and colorCode on nodes written before they existed"""
+    neo4j = neo4j or Neo4jConnection()
+    backfill_sort_keys(neo4j)
+    backfill_fraud_scores(neo4j)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Apply and verify the Neo4j schema")
+    parser.add_argument('--apply', action='store_true', help="only create constraints and indexes")
+    parser.add_argument('--backfill', action='store_true',
+                        help="only derive sort keys and fraud scores on older nodes")
+    parser.add_argument('--verify', action='store_true', help="only check hot query plans")
+    args = parser.parse_args()
+
+    neo4j = Neo4jConnection()
+    try:
+        only = args.apply or args.backfill or args.verify
+        if args.apply or not only:
+            for statement in apply_schema(neo4j):
+                print(statement)
+        if args.backfill or not only:
+            backfill_schema(neo4j)
+            print("Backfilled sort keys and fraud scores.")
+        if args.verify or not only:
+            verify_query_plans(neo4j)
+            print(f"All {len(HOT_QUERIES)} hot queries use an index.")
+    except SchemaError as e:
+        print(f"Schema check failed: {str(e)}")
+        sys.exit(1)
+    finally:
+        close_driver()
+
+
+if __name__ == '__main__':
+    main()
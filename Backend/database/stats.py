@@ -0,0 +1,140 @@
+import threading
+import time
+from database.connection import Neo4jConnection
+from utils.fraud_score import is_red, RED
+
+# Counters kept on the single (:DashboardStats {id: 'global'}) node
+STAT_FIELDS = [
+    'total_policies', 'pending_policies', 'active_policies',
+    'total_claims', 'in_progress_claims', 'approved_claims', 'rejected_claims',
+    'total_users', 'fraudulent_claims'
+]
+
+# Status value -> counter it is bucketed under (other statuses only count in the totals)
+POLICY_STATUS_FIELDS = {'PENDING': 'pending_policies', 'ACTIVE': 'active_policies'}
+CLAIM_STATUS_FIELDS = {
+    'In Progress': 'in_progress_claims',
+    'Approved': 'approved_claims',
+    'Rejected': 'rejected_claims'
+}
+
+STATS_DELTA_QUERY = """
+MERGE (s:DashboardStats {id: 'global'})
+SET """ + ",\n    ".join(
+    f"s.{field} = coalesce(s.{field}, 0) + coalesce($delta.{field}, 0)" for field in STAT_FIELDS
+) + """,
+    s.updated_at = datetime()
+"""
+
+RECOUNT_QUERIES = {
+    'policies': """
+    MATCH (u:User)-[:INSURANCE]->(a:Application)
+    RETURN count(a) as total_policies,
+           count(CASE WHEN a.status = 'PENDING' THEN 1 END) as pending_policies,
+           count(CASE WHEN a.status = 'ACTIVE' THEN 1 END) as active_policies
+    """,
+    'claims': """
+    MATCH (u:User)-[:HAS_CLAIMS]->(cm:ClaimManagement)
+    RETURN count(cm) as total_claims,
+           count(CASE WHEN cm.status = 'In Progress' THEN 1 END) as in_progress_claims,
+           count(CASE WHEN cm.status = 'Approved' THEN 1 END) as approved_claims,
+           count(CASE WHEN cm.status = 'Rejected' THEN 1 END) as rejected_claims,
+           count(CASE WHEN cm.colorCode = $red THEN 1 END) as fraudulent_claims
+    """,
+    'users': """
+    MATCH (u:User)
+    RETURN count(u) as total_users
+    """
+}
+
+def policy_created_delta(status):
+    delta = {'total_policies': 1}
+    if status in POLICY_STATUS_FIELDS:
+        delta[POLICY_STATUS_FIELDS[status]] = 1
+    return delta
+
+
+def claim_created_delta(status, red=False):
+    delta = {'total_claims': 1, 'fraudulent_claims': 1 if red else 0}
+    if status in CLAIM_STATUS_FIELDS:
+        delta[CLAIM_STATUS_FIELDS[status]] = 1
+    return delta
+
+
+def status_change_delta(status_fields, old_status, new_status):
+    """Move one count between status buckets"""
+    delta = {}
+    if old_status == new_status:
+        return delta
+    if old_status in status_fields:
+        delta[status_fields[old_status]] = -1
+    if new_status in status_fields:
+        delta[status_fields[new_status]] = delta.get(status_fields[new_status], 0) + 1
+    return delta
+
+
+def fraud_change_delta(old_claim, new_claim):
+    """Adjust the red-claim count when a claim's fraud fields are overwritten"""
+    return {'fraudulent_claims': int(is_red(new_claim)) - int(is_red(old_claim))}
+
+
+def apply_stats_delta(tx, delta):
+    """Add delta to the stats node inside the caller's transaction or session"""
+    if any(delta.values()):
+        tx.run(STATS_DELTA_QUERY, delta=delta).consume()
+
+
+def record_stats_delta(delta, neo4j=None):
+    """Apply delta in its own transaction, for writers that use auto-commit queries"""
+    if not any(delta.values()):
+        return
+    neo4j = neo4j or Neo4jConnection()
+    neo4j.execute_query(STATS_DELTA_QUERY, {'delta': delta})
+
+
+def recount_stats(neo4j=None):
+    """
+    Recompute every counter from the graph and overwrite the stats node.
+    Red claims are counted on the stored colorCode, so claims scored before it
+    existed need backfill_fraud_scores() first (python -m database.schema --backfill).
+    """
+    neo4j = neo4j or Neo4jConnection()
+    stats = {field: 0 for field in STAT_FIELDS}
+    for query in RECOUNT_QUERIES.values():
+        records = neo4j.execute_query(query, {'red': RED})
+        if records:
+            stats.update(dict(records[0]))
+
+    neo4j.execute_query("""
+    MERGE (s:DashboardStats {id: 'global'})
+    SET s += $stats,
+        s.updated_at = datetime(),
+        s.reconciled_at = datetime()
+    """, {'stats': stats})
+    return stats
+
+
+def get_stats(neo4j=None):
+    """Read the materialized counters, recounting once if the node does not exist yet"""
+    neo4j = neo4j or Neo4jConnection()
+    records = neo4j.execute_query("MATCH (s:DashboardStats {id: 'global'}) RETURN s")
+    if not records:
+        return recount_stats(neo4j)
+    node = records[0]['s']
+    return {field: node.get(field, 0) or 0 for field in STAT_FIELDS}
+
+
+def start_stats_reconciler(interval):
+    """Recount the stats node every interval seconds on a daemon thread"""
+    def reconcile():
+        while True:
+            time.sleep(interval)
+            try:
+                recount_stats()
+            except Exception as e:
+                print(f"Stats reconciliation failed: {str(e)}")
+
+    thread = threading.Thread(target=reconcile)
+    thread.daemon = True
+    thread.start()
+    return thread
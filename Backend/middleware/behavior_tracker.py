@@ -4,30 +4,61 @@ import threading
 import uuid
 import ipaddress
 from datetime import datetime
-import json
 import os
 from functools import wraps
-from collections import defaultdict
+from config import Config
+from middleware.session_backends import create_session_backend
+from middleware.log_writer import BehaviorLogWriter
+from middleware.log_segments import SegmentedLogStore
+from utils.anomaly_stream import AnomalyStream
 
 class UserBehaviorTracker:
     """
     Middleware for capturing user behavior metrics for anomaly detection
     """
-    write_lock = threading.Lock()  # Lock for thread-safe logging
 
     def __init__(self, app=None):
         self.app = app
-        self.session_data = defaultdict(dict)
-        self.session_apis = defaultdict(set)
-        self.session_timestamps = defaultdict(list)
-        self.session_start_times = {}
-        self.session_ips = defaultdict(set)
-        self.active_users = defaultdict(set)
 
         # Set up logs directory and file
         self.logs_dir = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'logs')
         os.makedirs(self.logs_dir, exist_ok=True)
-        self.log_file = os.path.join(self.logs_dir, 'behavior_logs.jsonl')
+
+        # Per-process memory, or SQLite shared by every worker on the host
+        self.sessions = create_session_backend(
+            Config.BEHAVIOR_SESSION_BACKEND,
+            path=Config.BEHAVIOR_SESSION_DB or os.path.join(self.logs_dir, 'behavior_sessions.db'),
+            max_sessions=Config.BEHAVIOR_MAX_SESSIONS,
+            ttl=Config.BEHAVIOR_SESSION_TTL,
+            max_users=Config.BEHAVIOR_MAX_USERS,
+            sketch_shape=(Config.BEHAVIOR_SKETCH_PRECISION, Config.BEHAVIOR_SKETCH_CMS_WIDTH,
+                          Config.BEHAVIOR_SKETCH_CMS_DEPTH)
+        )
+        # Rotated, compressed and indexed segments under logs/behavior
+        self.log_store = SegmentedLogStore(
+            os.path.join(self.logs_dir, 'behavior'),
+            max_bytes=Config.BEHAVIOR_LOG_SEGMENT_BYTES,
+            max_age=Config.BEHAVIOR_LOG_SEGMENT_SECONDS
+        )
+        legacy_log = os.path.join(self.logs_dir, 'behavior_logs.jsonl')
+        if os.path.exists(legacy_log):
+            self.log_store.adopt(legacy_log)
+        # Windows are written by a background thread; requests only append to its buffer
+        self.log_writer = BehaviorLogWriter(
+            self.log_store,
+            max_buffer=Config.BEHAVIOR_LOG_BUFFER_SIZE,
+            flush_size=Config.BEHAVIOR_LOG_FLUSH_SIZE,
+            flush_interval=Config.BEHAVIOR_LOG_FLUSH_INTERVAL,
+            drop_policy=Config.BEHAVIOR_LOG_DROP_POLICY
+        )
+
+        # Windows are scored off the request path; flags land in anomaly_stream.flags
+        self.anomaly_stream = AnomalyStream(
+            maxsize=Config.ANOMALY_STREAM_QUEUE_SIZE,
+            batch_size=Config.ANOMALY_STREAM_BATCH_SIZE,
+            max_delay=Config.ANOMALY_STREAM_MAX_DELAY,
+            max_flags=Config.BEHAVIOR_MAX_SESSIONS
+        ) if Config.ANOMALY_STREAM_ENABLED else None
 
         if app is not None:
             self.init_app(app)
@@ -35,6 +66,7 @@ class UserBehaviorTracker:
     def init_app(self, app):
         """Initialize with Flask app"""
         self.app = app
+        app.extensions['behavior_tracker'] = self
         app.before_request(self.start_timer)
         app.after_request(self.log_request)
 
@@ -52,12 +84,6 @@ class UserBehaviorTracker:
             token = auth_header.split(' ')[1]
             g.session_id = token
 
-            if token not in self.session_start_times:
-                self.session_start_times[token] = time.time()
-
-            user_ip = request.remote_addr
-            self.session_ips[token].add(user_ip)
-
             user_email = getattr(g, 'current_user_email', None)
             if not user_email and request.endpoint:
                 view_func = current_app.view_functions.get(request.endpoint)
@@ -65,11 +91,20 @@ class UserBehaviorTracker:
                     from utils.auth import get_user_from_token
                     user_email = get_user_from_token(token)
 
-            if user_email:
-                self.active_users[token].add(user_email)
+            # Recorded with the rest of the request in log_request
+            g.behavior_user = user_email
+
+            # Verdict on an earlier window of this session, for views to act on
+            g.behavior_anomaly = self.anomaly_flag(token)
         else:
+            # Never seen again, so it can't fill a window; nothing is stored for it
             g.session_id = f"temp-{uuid.uuid4()}"
-            self.session_start_times[g.session_id] = time.time()
+
+    def anomaly_flag(self, session_id):
+        """{'score', 'flagged_at'} if the session's latest scored window was anomalous"""
+        if self.anomaly_stream is None:
+            return None
+        return self.anomaly_stream.flag(session_id)
 
     def log_request(self, response):
         """Log request details"""
@@ -81,38 +116,52 @@ class UserBehaviorTracker:
         if not session_id:
             return response
 
-        path = request.path
-        self.session_apis[session_id].add(path)
-        self.session_timestamps[session_id].append(time.time())
+        if session_id.startswith('temp-'):
+            return response
 
-        if len(self.session_timestamps[session_id]) >= 5:
-            self.calculate_and_log_metrics(session_id)
+        # Everything this request contributes, applied in one backend call
+        try:
+            window = self.sessions.record_request(
+                session_id, g.start_time, request.path, time.time(),
+                ip=request.remote_addr, user=getattr(g, 'behavior_user', None)
+            )
+        except Exception as e:
+            print(f"Behavior session update failed: {str(e)}")
+            return response
 
-        return response
+        if window:
+            self.calculate_and_log_metrics(window)
 
-    def calculate_and_log_metrics(self, session_id):
-        """Calculate and log behavior metrics"""
-        timestamps = self.session_timestamps[session_id]
-        apis = self.session_apis[session_id]
+        return response
 
+    def calculate_and_log_metrics(self, window):
+        """Calculate and log behavior metrics for a window taken from the session backend"""
+        session_id = window['session_id']
+        timestamps = window['timestamps']
         if len(timestamps) < 2:
             return
 
+        unique_apis = window['unique_apis']
+        users = len(window['users'])
+        ip = window['ip']
+        # Across all of the user's sessions when the user is known, else this session alone
+        user_summary = window.get('user_summary') or {}
+        num_sessions = user_summary.get('sessions', 1)
+        num_unique_apis = user_summary.get('unique_apis', unique_apis)
+
         seq_length = len(timestamps)
-        unique_apis = len(apis)
 
         time_diffs = [timestamps[i] - timestamps[i-1] for i in range(1, len(timestamps))]
         inter_api_duration = sum(time_diffs) / len(time_diffs) if time_diffs else 0
-        session_duration = (timestamps[-1] - self.session_start_times[session_id]) / 60
+        session_duration = (timestamps[-1] - window['start_time']) / 60
         api_uniqueness = unique_apis / seq_length if seq_length else 0
-        num_users = len(self.active_users[session_id]) if session_id in self.active_users else 1
+        num_users = users if users else 1
 
         ip_type_default = 1
         ip_type_google_bot = 0
         ip_type_private_ip = 0
 
-        if self.session_ips[session_id]:
-            ip = list(self.session_ips[session_id])[0]
+        if ip:
             try:
                 ip_obj = ipaddress.ip_address(ip)
                 if ip_obj.is_private:
@@ -134,9 +183,9 @@ class UserBehaviorTracker:
             api_uniqueness,
             seq_length,
             session_duration,
-            1,
+            num_sessions,
             num_users,
-            unique_apis,
+            num_unique_apis,
             ip_type_default, ip_type_google_bot, ip_type_private_ip,
             source_f,
             behavior_encoded
@@ -150,41 +199,32 @@ class UserBehaviorTracker:
                 'api_access_uniqueness': api_uniqueness,
                 'sequence_length': seq_length,
                 'vsession_duration': session_duration,
-                'num_sessions': 1,
+                'num_sessions': num_sessions,
                 'num_users': num_users,
-                'num_unique_apis': unique_apis,
+                'num_unique_apis': num_unique_apis,
                 'ip_type_default': ip_type_default,
                 'ip_type_google_bot': ip_type_google_bot,
                 'ip_type_private_ip': ip_type_private_ip,
                 'source_F': source_f,
                 'behavior_encoded': behavior_encoded
             },
-            'sample': sample
+            'sample': sample,
+            'user': user_summary or None
         }
 
-        # Thread-safe append to file
-        with self.write_lock:
-            with open(self.log_file, 'a') as f:
-                f.write(json.dumps(log_data) + '\n')
+        if self.anomaly_stream is not None:
+            self.anomaly_stream.submit(session_id, sample)
 
-        self.session_timestamps[session_id] = []
+        self.log_writer.submit(log_data)
 
-    def cleanup_expired_sessions(self, check_interval=300):
-        """Clean up expired sessions periodically"""
+    def cleanup_expired_sessions(self, check_interval=None):
+        """Expire sessions past their TTL periodically, logging any partial window"""
         while True:
-            time.sleep(check_interval)
-            current_time = time.time()
-            for session_id in list(self.session_start_times.keys()):
-                if current_time - self.session_start_times[session_id] > 3600:
-                    if self.session_timestamps[session_id]:
-                        self.calculate_and_log_metrics(session_id)
-
-                    for d in [
-                        self.session_data,
-                        self.session_apis,
-                        self.session_timestamps,
-                        self.session_start_times,
-                        self.session_ips,
-                        self.active_users
-                    ]:
-                        d.pop(session_id, None)
+            time.sleep(check_interval or Config.BEHAVIOR_CLEANUP_INTERVAL)
+            try:
+                for window in self.sessions.expire(time.time()):
+                    self.calculate_and_log_metrics(window)
+                    if self.anomaly_stream is not None:
+                        self.anomaly_stream.forget(window['session_id'])
+            except Exception as e:
+                print(f"Behavior session cleanup failed: {str(e)}")
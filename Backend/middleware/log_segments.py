@@ -0,0 +1,271 @@
+"""
+Segmented, compressed storage for behaviour logs.
+
+Records are appended to an active segment, a plain JSONL file named after
+the time it was opened and the writing process:
+
+    logs/behavior/segment-20250301T101500-4242.jsonl
+
+When the segment reaches max_bytes or max_age seconds, it is closed and sealed
+on a background thread. Sealing gzips it to .jsonl.gz and writes a sidecar
+.index.json with the record count, the first and last record timestamps, and
+the session ids in it. Then the raw file is removed. Segments left raw by a
+process that died are sealed by the next process to start.
+
+read_behavior_logs() streams only the segments whose index overlaps the
+requested time window and contains the requested session, plus the raw
+segments still being written. From the shell:
+
+    python -m middleware.log_segments --session <id> --start 2025-03-01T10:00 --end 2025-03-01T12:00
+"""
+import argparse
+import gzip
+import json
+import os
+import shutil
+import threading
+import time
+from datetime import datetime
+
+SEGMENT_PREFIX = 'segment-'
+RAW_SUFFIX = '.jsonl'
+SEALED_SUFFIX = '.jsonl.gz'
+INDEX_SUFFIX = '.index.json'
+
+DEFAULT_DIRECTORY = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                                 'logs', 'behavior')
+
+
+def _new_index():
+    return {'records': 0, 'start': None, 'end': None, 'sessions': set()}
+
+
+def _index_record(index, record):
+    index['records'] += 1
+    timestamp = record.get('timestamp')
+    if timestamp:
+        if index['start'] is None or timestamp < index['start']:
+            index['start'] = timestamp
+        if index['end'] is None or timestamp > index['end']:
+            index['end'] = timestamp
+    if record.get('session_id'):
+        index['sessions'].add(record['session_id'])
+
+
+def _read_lines(f):
+    for line in f:
+        if not line.strip():
+            continue
+        try:
+            yield json.loads(line)
+        except ValueError:
+            continue  # a line cut short by a crash, or still being written
+
+
+def _writer_alive(stem):
+    """Whether the process that named this segment is still running"""
+    pid = stem.rsplit('-', 1)[-1]
+    if not pid.isdigit() or int(pid) == os.getpid():
+        return False
+    try:
+        os.kill(int(pid), 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        return True
+    return True
+
+
+def seal_segment(directory, stem, index=None):
+    """Compress a raw segment and write its index; the index is built by scanning if not given"""
+    raw_path = os.path.join(directory, stem + RAW_SUFFIX)
+    if index is None:
+        index = _new_index()
+        with open(raw_path) as f:
+            for record in _read_lines(f):
+                _index_record(index, record)
+
+    tmp_suffix = f'.{os.getpid()}.tmp'
+    sealed_path = os.path.join(directory, stem + SEALED_SUFFIX)
+    with open(raw_path, 'rb') as src, gzip.open(sealed_path + tmp_suffix, 'wb') as dst:
+        shutil.copyfileobj(src, dst)
+    os.replace(sealed_path + tmp_suffix, sealed_path)
+
+    index_path = os.path.join(directory, stem + INDEX_SUFFIX)
+    with open(index_path + tmp_suffix, 'w') as f:
+        json.dump(dict(index, segment=stem + SEALED_SUFFIX, sessions=sorted(index['sessions'])), f)
+    os.replace(index_path + tmp_suffix, index_path)
+
+    try:
+        os.remove(raw_path)
+    except FileNotFoundError:
+        pass  # sealed concurrently by another process
+
+
+class SegmentedLogStore:
+    """Append-only segment writer; used from a single writer thread"""
+
+    def __init__(self, directory=DEFAULT_DIRECTORY, max_bytes=64 * 1024 * 1024, max_age=3600):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.counters = {'records': 0, 'segments_opened': 0, 'segments_sealed': 0, 'seal_errors': 0}
+        self._file = None
+        self._stem = None
+        self._opened_at = 0
+        self._bytes = 0
+        self._index = None
+        os.makedirs(directory, exist_ok=True)
+        self.seal_orphans()
+
+    def adopt(self, path):
+        """Move an existing JSONL log (e.g. the old behavior_logs.jsonl) in as a segment to be sealed"""
+        stem = f"{SEGMENT_PREFIX}00000000T000000-{os.path.basename(path).split('.')[0]}"
+        try:
+            os.replace(path, os.path.join(self.directory, stem + RAW_SUFFIX))
+        except FileNotFoundError:
+            return  # adopted by another process
+        self._seal_in_background(stem, None)
+
+    def seal_orphans(self):
+        """Seal raw segments whose writing process is gone"""
+        for name in sorted(os.listdir(self.directory)):
+            if name.startswith(SEGMENT_PREFIX) and name.endswith(RAW_SUFFIX):
+                stem = name[:-len(RAW_SUFFIX)]
+                if not _writer_alive(stem):
+                    self._seal_in_background(stem, None)
+
+    def append(self, records):
+        if self._file is None or self._bytes >= self.max_bytes or \
+                time.time() - self._opened_at >= self.max_age:
+            self._rotate()
+        lines = ''.join(json.dumps(record) + '\n' for record in records)
+        self._file.write(lines)
+        self._file.flush()
+        self._bytes += len(lines)
+        for record in records:
+            _index_record(self._index, record)
+        self.counters['records'] += len(records)
+
+    def close(self):
+        """Close and seal the active segment (synchronously: called at shutdown)"""
+        if self._file is None:
+            return
+        self._file.close()
+        stem, index = self._stem, self._index
+        self._file = None
+        self._seal(stem, index)
+
+    def stats(self):
+        return dict(self.counters, active_segment=self._stem, active_bytes=self._bytes,
+                    max_bytes=self.max_bytes, max_age=self.max_age)
+
+    def _rotate(self):
+        if self._file is not None:
+            self._file.close()
+            self._seal_in_background(self._stem, self._index)
+        self._stem = f"{SEGMENT_PREFIX}{datetime.now().strftime('%Y%m%dT%H%M%S')}-{os.getpid()}"
+        self._file = open(os.path.join(self.directory, self._stem + RAW_SUFFIX), 'a')
+        self._opened_at = time.time()
+        self._bytes = 0
+        self._index = _new_index()
+        self.counters['segments_opened'] += 1
+
+    def _seal_in_background(self, stem, index):
+        thread = threading.Thread(target=self._seal, args=(stem, index))
+        thread.daemon = True
+        thread.start()
+
+    def _seal(self, stem, index):
+        try:
+            seal_segment(self.directory, stem, index)
+            self.counters['segments_sealed'] += 1
+        except FileNotFoundError:
+            pass  # sealed by another process
+        except Exception as e:
+            self.counters['seal_errors'] += 1
+            print(f"Sealing behavior log segment {stem} failed: {str(e)}")
+
+
+def _as_iso(value):
+    if value is None or isinstance(value, str):
+        return value
+    return value.isoformat()
+
+
+def list_segments(directory=DEFAULT_DIRECTORY):
+    """[(stem, index or None)] oldest first; index is None for raw segments still being written"""
+    segments = {}
+    for name in os.listdir(directory):
+        if not name.startswith(SEGMENT_PREFIX):
+            continue
+        if name.endswith(INDEX_SUFFIX):
+            stem = name[:-len(INDEX_SUFFIX)]
+            with open(os.path.join(directory, name)) as f:
+                segments[stem] = json.load(f)
+        elif name.endswith(RAW_SUFFIX):
+            segments.setdefault(name[:-len(RAW_SUFFIX)], None)
+    return sorted(segments.items())
+
+
+def read_behavior_logs(start=None, end=None, session_id=None, directory=DEFAULT_DIRECTORY):
+    """
+    Stream records with start <= timestamp <= end (datetimes or ISO strings,
+    either may be None) for session_id if given, opening only the sealed
+    segments whose index can contain a match.
+    """
+    start, end = _as_iso(start), _as_iso(end)
+    for stem, index in list_segments(directory):
+        if index is not None:
+            if start and (index['end'] is None or index['end'] < start):
+                continue
+            if end and (index['start'] is None or index['start'] > end):
+                continue
+            if session_id and session_id not in index['sessions']:
+                continue
+            opener = gzip.open(os.path.join(directory, index['segment']), 'rt')
+        else:
+            try:
+                opener = open(os.path.join(directory, stem + RAW_SUFFIX))
+            except FileNotFoundError:
+                # Sealed since it was listed: the .gz is in place before the raw file goes
+                try:
+                    opener = gzip.open(os.path.join(directory, stem + SEALED_SUFFIX), 'rt')
+                except FileNotFoundError:
+                    continue
+
+        with opener as f:
+            for record in _read_lines(f):
+                timestamp = record.get('timestamp') or ''
+                if start and timestamp < start:
+                    continue
+                if end and timestamp > end:
+                    continue
+                if session_id and record.get('session_id') != session_id:
+                    continue
+                yield record
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Read behaviour log records from the segmented store")
+    parser.add_argument('--directory', default=DEFAULT_DIRECTORY)
+    parser.add_argument('--start', help="ISO timestamp, inclusive")
+    parser.add_argument('--end', help="ISO timestamp, inclusive")
+    parser.add_argument('--session', help="only this session id")
+    parser.add_argument('--list', action='store_true', help="list segments and their indexes instead")
+    args = parser.parse_args()
+
+    if args.list:
+        for stem, index in list_segments(args.directory):
+            if index is None:
+                print(f"{stem}  (active)")
+            else:
+                print(f"{stem}  {index['records']} records  {index['start']} .. {index['end']}  "
+                      f"{len(index['sessions'])} sessions")
+        return
+    for record in read_behavior_logs(args.start, args.end, args.session, args.directory):
+        print(json.dumps(record))
+
+
+if __name__ == '__main__':
+    main()
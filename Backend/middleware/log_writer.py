@@ -0,0 +1,106 @@
+"""
+Asynchronous, batched writer for behaviour logs.
+
+Request threads call submit(), which appends the record to a deque: no lock,
+no serialization, no file I/O. A dedicated daemon thread wakes every
+flush_interval seconds, or as soon as flush_size records are waiting. It then
+hands everything buffered to the sink (see middleware/log_segments.py) in one
+append() call.
+The buffer holds at most max_buffer records. When it is full, drop_policy
+decides what is lost:
+
+    drop_newest   the record being submitted is discarded (default)
+    drop_oldest   the oldest buffered record is discarded to make room
+
+Either way the loss is counted. close() flushes what is buffered and closes
+the sink; it is registered with atexit so a normal shutdown loses nothing.
+"""
+import atexit
+import threading
+from collections import deque
+
+DROP_POLICIES = ('drop_newest', 'drop_oldest')
+
+
+class BehaviorLogWriter:
+    """Bounded in-memory buffer of log records drained to a sink by one thread"""
+
+    def __init__(self, sink, max_buffer=10000, flush_size=500, flush_interval=1.0,
+                 drop_policy='drop_newest'):
+        if drop_policy not in DROP_POLICIES:
+            raise ValueError(f"drop_policy must be one of {', '.join(DROP_POLICIES)}")
+        self.sink = sink
+        self.max_buffer = max_buffer
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+        self.drop_policy = drop_policy
+        self.buffer = deque()
+        # Request threads update these without a lock, so under contention they may undercount
+        self.counters = {'submitted': 0, 'dropped': 0, 'written': 0, 'batches': 0, 'errors': 0}
+        self._wake = threading.Event()
+        self._closed = False
+        self._write_lock = threading.Lock()
+        self._thread = threading.Thread(target=self._work)
+        self._thread.daemon = True
+        self._thread.start()
+        atexit.register(self.close)
+
+    def submit(self, record):
+        """Buffer one JSON-serializable record; never blocks. Returns False if it was dropped."""
+        if self._closed:
+            return False
+        if len(self.buffer) >= self.max_buffer:
+            self.counters['dropped'] += 1
+            if self.drop_policy == 'drop_newest':
+                return False
+            try:
+                self.buffer.popleft()
+            except IndexError:
+                pass
+        self.buffer.append(record)
+        self.counters['submitted'] += 1
+        if len(self.buffer) >= self.flush_size:
+            self._wake.set()
+        return True
+
+    def flush(self):
+        """Write everything buffered now, from the calling thread"""
+        with self._write_lock:
+            batch = []
+            while True:
+                try:
+                    batch.append(self.buffer.popleft())
+                except IndexError:
+                    break
+            if not batch:
+                return 0
+            try:
+                self.sink.append(batch)
+            except Exception as e:
+                self.counters['errors'] += 1
+                print(f"Behavior log write failed, {len(batch)} records lost: {str(e)}")
+                return 0
+            self.counters['written'] += len(batch)
+            self.counters['batches'] += 1
+            return len(batch)
+
+    def close(self, timeout=5):
+        """Stop accepting records, flush the buffer and stop the writer thread"""
+        if self._closed:
+            return
+        self._closed = True
+        self._wake.set()
+        self._thread.join(timeout)
+        self.flush()
+        with self._write_lock:
+            self.sink.close()
+
+    def stats(self):
+        return dict(self.counters, buffered=len(self.buffer), max_buffer=self.max_buffer,
+                    drop_policy=self.drop_policy, storage=self.sink.stats())
+
+    def _work(self):
+        while not self._closed:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            self.flush()
@@ -0,0 +1,309 @@
+"""
+Session-state backends for UserBehaviorTracker.
+
+The tracker makes one backend call per request, record_request(), which
+applies everything the request contributes (path, timestamp, IP, user) in a
+single step. Once a session has window_size timestamps, the call also takes
+the window and returns it. A window is a dict:
+
+    {'session_id', 'start_time', 'timestamps', 'unique_apis', 'users', 'ip',
+     'user_summary'}
+
+Requests with a known user also update that user's UserSketch (see
+middleware/sketches.py): distinct sessions, APIs and IPs plus per-endpoint
+counts across all of the user's sessions, in constant memory per user. A
+window taken on such a request carries the sketch's summary as
+'user_summary'; other windows carry None. At most max_users sketches are
+kept; the least recently active users are evicted.
+
+expire() removes sessions past their TTL and returns their partial windows.
+
+    memory   SessionStore in this process (one worker, or per-worker state)
+    sqlite   one SQLite database in WAL mode shared by every worker process
+             on the host, so a user's requests are counted together whichever
+             worker serves them
+
+Select one with BEHAVIOR_SESSION_BACKEND.
+"""
+import os
+import sqlite3
+import threading
+from collections import OrderedDict
+
+from middleware.session_store import SessionStore
+from middleware.sketches import UserSketch
+
+
+class MemorySessionBackend:
+    """Process-local sessions in a bounded SessionStore"""
+
+    def __init__(self, max_sessions=100000, ttl=3600, max_users=20000, sketch_shape=(8, 128, 4)):
+        self.store = SessionStore(max_sessions=max_sessions, ttl=ttl)
+        self.max_users = max_users
+        self.sketch_shape = sketch_shape
+        self.user_sketches = OrderedDict()
+        self.users_evicted = 0
+
+    def record_request(self, session_id, started_at, path, timestamp, ip=None, user=None, window_size=5):
+        store = self.store
+        session = store.start(session_id, started_at)
+        with store.lock:
+            store.record(session, path, timestamp, ip, user)
+            sketch = None
+            if user:
+                sketch = self._user_sketch(user)
+                sketch.record(session_id, path, ip)
+            if len(session.timestamps) < window_size:
+                return None
+            window = self._take_window(session, store.take_timestamps(session))
+            window['user_summary'] = sketch.summary(path) if sketch else None
+            return window
+
+    def _user_sketch(self, user):
+        sketch = self.user_sketches.get(user)
+        if sketch is not None:
+            self.user_sketches.move_to_end(user)
+            return sketch
+        sketch = self.user_sketches[user] = UserSketch(*self.sketch_shape)
+        while len(self.user_sketches) > self.max_users:
+            self.user_sketches.popitem(last=False)
+            self.users_evicted += 1
+        return sketch
+
+    def user_summary(self, user, paths=()):
+        """The user's sketch summary with per-path request estimates, or None if unknown"""
+        with self.store.lock:
+            sketch = self.user_sketches.get(user)
+            if sketch is None:
+                return None
+            return dict(sketch.summary(), paths={path: sketch.endpoints.estimate(path) for path in paths})
+
+    def expire(self, now):
+        with self.store.lock:
+            return [dict(self._take_window(session, session.timestamps), user_summary=None)
+                    for session in self.store.expire(now)]
+
+    def stats(self):
+        with self.store.lock:
+            users = len(self.user_sketches)
+        return dict(self.store.stats(), backend='memory', users=users, max_users=self.max_users,
+                    users_evicted=self.users_evicted,
+                    user_sketch_bytes=users * UserSketch.size(*self.sketch_shape))
+
+    @staticmethod
+    def _take_window(session, timestamps):
+        return {
+            'session_id': session.session_id,
+            'start_time': session.start_time,
+            'timestamps': timestamps,
+            'unique_apis': len(session.apis),
+            'users': sorted(session.users),
+            'ip': next(iter(session.ips), None)
+        }
+
+
+SQLITE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    session_id TEXT PRIMARY KEY,
+    start_time REAL NOT NULL,
+    expires_at REAL NOT NULL,
+    last_seen REAL NOT NULL,
+    first_ip TEXT
+);
+CREATE INDEX IF NOT EXISTS sessions_expires_at ON sessions (expires_at);
+CREATE INDEX IF NOT EXISTS sessions_last_seen ON sessions (last_seen);
+CREATE TABLE IF NOT EXISTS session_apis (
+    session_id TEXT NOT NULL REFERENCES sessions (session_id) ON DELETE CASCADE,
+    path TEXT NOT NULL,
+    PRIMARY KEY (session_id, path)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS session_users (
+    session_id TEXT NOT NULL REFERENCES sessions (session_id) ON DELETE CASCADE,
+    email TEXT NOT NULL,
+    PRIMARY KEY (session_id, email)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS session_timestamps (
+    session_id TEXT NOT NULL REFERENCES sessions (session_id) ON DELETE CASCADE,
+    ts REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS session_timestamps_session ON session_timestamps (session_id);
+CREATE TABLE IF NOT EXISTS user_sketches (
+    email TEXT PRIMARY KEY,
+    sketch BLOB NOT NULL,
+    last_seen REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS user_sketches_last_seen ON user_sketches (last_seen);
+"""
+
+UPSERT_SESSION = """
+INSERT INTO sessions (session_id, start_time, expires_at, last_seen, first_ip)
+VALUES (?, ?, ?, ?, ?)
+ON CONFLICT (session_id) DO UPDATE SET
+    last_seen = excluded.last_seen,
+    first_ip = coalesce(sessions.first_ip, excluded.first_ip)
+"""
+
+
+class SQLiteSessionBackend:
+    """
+    Sessions in a SQLite database shared across worker processes. Each request
+    is one short write transaction (BEGIN IMMEDIATE), so taking a window is
+    atomic even when two workers serve the same session at once. The entry cap
+    is enforced by the expiry sweep, evicting the least recently seen sessions.
+    User sketches are read, updated and written back in the same transaction,
+    so every worker's requests land in one sketch per user.
+    """
+
+    def __init__(self, path, max_sessions=100000, ttl=3600, max_users=20000, sketch_shape=(8, 128, 4),
+                 busy_timeout=5.0):
+        self.path = path
+        self.max_sessions = max_sessions
+        self.ttl = ttl
+        self.max_users = max_users
+        self.sketch_shape = sketch_shape
+        self.busy_timeout = busy_timeout
+        self.counters = {'evicted': 0, 'expired': 0, 'users_evicted': 0}
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._connection().executescript(SQLITE_SCHEMA)
+
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            # Autocommit mode; transactions are opened explicitly
+            conn = sqlite3.connect(self.path, timeout=self.busy_timeout, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            conn.execute('PRAGMA foreign_keys=ON')
+            self._local.conn = conn
+        return conn
+
+    def _transaction(self, fn, *args):
+        conn = self._connection()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            result = fn(conn, *args)
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        conn.execute('COMMIT')
+        return result
+
+    def record_request(self, session_id, started_at, path, timestamp, ip=None, user=None, window_size=5):
+        return self._transaction(self._record, session_id, started_at, path, timestamp, ip, user, window_size)
+
+    def _record(self, conn, session_id, started_at, path, timestamp, ip, user, window_size):
+        conn.execute(UPSERT_SESSION, (session_id, started_at, started_at + self.ttl, timestamp, ip))
+        conn.execute('INSERT OR IGNORE INTO session_apis (session_id, path) VALUES (?, ?)', (session_id, path))
+        if user:
+            conn.execute('INSERT OR IGNORE INTO session_users (session_id, email) VALUES (?, ?)',
+                         (session_id, user))
+        conn.execute('INSERT INTO session_timestamps (session_id, ts) VALUES (?, ?)', (session_id, timestamp))
+        sketch = self._update_user_sketch(conn, user, session_id, path, ip, timestamp) if user else None
+        pending = conn.execute('SELECT count(*) FROM session_timestamps WHERE session_id = ?',
+                               (session_id,)).fetchone()[0]
+        if pending < window_size:
+            return None
+        window = self._take_window(conn, session_id)
+        window['user_summary'] = sketch.summary(path) if sketch else None
+        return window
+
+    def _load_sketch(self, conn, user):
+        row = conn.execute('SELECT sketch FROM user_sketches WHERE email = ?', (user,)).fetchone()
+        if row is None:
+            return None
+        try:
+            return UserSketch.from_bytes(row[0], *self.sketch_shape)
+        except ValueError:
+            return None  # stored with a different sketch shape; start over
+
+    def _update_user_sketch(self, conn, user, session_id, path, ip, timestamp):
+        sketch = self._load_sketch(conn, user) or UserSketch(*self.sketch_shape)
+        sketch.record(session_id, path, ip)
+        conn.execute(
+            'INSERT INTO user_sketches (email, sketch, last_seen) VALUES (?, ?, ?) '
+            'ON CONFLICT (email) DO UPDATE SET sketch = excluded.sketch, last_seen = excluded.last_seen',
+            (user, sketch.to_bytes(), timestamp)
+        )
+        return sketch
+
+    def user_summary(self, user, paths=()):
+        """The user's sketch summary with per-path request estimates, or None if unknown"""
+        sketch = self._load_sketch(self._connection(), user)
+        if sketch is None:
+            return None
+        return dict(sketch.summary(), paths={path: sketch.endpoints.estimate(path) for path in paths})
+
+    @staticmethod
+    def _take_window(conn, session_id):
+        start_time, first_ip = conn.execute(
+            'SELECT start_time, first_ip FROM sessions WHERE session_id = ?', (session_id,)
+        ).fetchone()
+        timestamps = [row[0] for row in conn.execute(
+            'SELECT ts FROM session_timestamps WHERE session_id = ? ORDER BY ts', (session_id,)
+        )]
+        unique_apis = conn.execute('SELECT count(*) FROM session_apis WHERE session_id = ?',
+                                   (session_id,)).fetchone()[0]
+        users = [row[0] for row in conn.execute(
+            'SELECT email FROM session_users WHERE session_id = ? ORDER BY email', (session_id,)
+        )]
+        conn.execute('DELETE FROM session_timestamps WHERE session_id = ?', (session_id,))
+        return {
+            'session_id': session_id,
+            'start_time': start_time,
+            'timestamps': timestamps,
+            'unique_apis': unique_apis,
+            'users': users,
+            'ip': first_ip,
+            'user_summary': None
+        }
+
+    def expire(self, now):
+        """Remove expired sessions (returning their partial windows), then evict down to the cap"""
+        return self._transaction(self._expire, now)
+
+    def _expire(self, conn, now):
+        expired = [row[0] for row in conn.execute(
+            'SELECT session_id FROM sessions WHERE expires_at <= ?', (now,)
+        )]
+        windows = [self._take_window(conn, session_id) for session_id in expired]
+        conn.execute('DELETE FROM sessions WHERE expires_at <= ?', (now,))
+        self.counters['expired'] += len(expired)
+
+        excess = conn.execute('SELECT count(*) FROM sessions').fetchone()[0] - self.max_sessions
+        if excess > 0:
+            conn.execute(
+                'DELETE FROM sessions WHERE session_id IN '
+                '(SELECT session_id FROM sessions ORDER BY last_seen LIMIT ?)', (excess,)
+            )
+            self.counters['evicted'] += excess
+
+        excess_users = conn.execute('SELECT count(*) FROM user_sketches').fetchone()[0] - self.max_users
+        if excess_users > 0:
+            conn.execute(
+                'DELETE FROM user_sketches WHERE email IN '
+                '(SELECT email FROM user_sketches ORDER BY last_seen LIMIT ?)', (excess_users,)
+            )
+            self.counters['users_evicted'] += excess_users
+        return windows
+
+    def stats(self):
+        conn = self._connection()
+        sessions = conn.execute('SELECT count(*) FROM sessions').fetchone()[0]
+        users = conn.execute('SELECT count(*) FROM user_sketches').fetchone()[0]
+        page_count = conn.execute('PRAGMA page_count').fetchone()[0]
+        page_size = conn.execute('PRAGMA page_size').fetchone()[0]
+        return dict(self.counters, backend='sqlite', path=self.path, sessions=sessions,
+                    max_sessions=self.max_sessions, ttl=self.ttl, approx_bytes=page_count * page_size,
+                    users=users, max_users=self.max_users)
+
+
+def create_session_backend(name, path=None, max_sessions=100000, ttl=3600, max_users=20000,
+                           sketch_shape=(8, 128, 4)):
+    if name == 'memory':
+        return MemorySessionBackend(max_sessions=max_sessions, ttl=ttl, max_users=max_users,
+                                    sketch_shape=sketch_shape)
+    if name == 'sqlite':
+        return SQLiteSessionBackend(path, max_sessions=max_sessions, ttl=ttl, max_users=max_users,
+                                    sketch_shape=sketch_shape)
+    raise ValueError(f"Unknown behaviour session backend: {name}")
@@ -0,0 +1,156 @@
+"""
+Bounded in-memory store of behaviour-tracking sessions.
+
+Each session is one SessionState. The store keeps at most max_sessions of them
+in LRU order (an OrderedDict), evicting the least recently used session when
+a new one would exceed the cap. Expiry is driven by a min-heap of
+(expires_at, session_id): a sweep pops only the sessions that are due, so it
+costs O(log n) per expired session instead of a scan of every session. Heap
+entries for sessions that were evicted or removed are skipped when popped.
+
+All access goes through the store's lock; callers that read a SessionState
+hold `store.lock` while they do, and change it only through store.record()
+and store.take_timestamps(). Each SessionState keeps a running estimate of
+its own size, and the store keeps the total of its sessions' estimates, so
+stats() does not have to measure every session.
+"""
+import heapq
+import sys
+import threading
+from collections import OrderedDict
+
+
+class SessionState:
+    """Everything the tracker knows about one session"""
+    __slots__ = ('session_id', 'start_time', 'expires_at', 'apis', 'timestamps', 'ips', 'users', 'nbytes')
+
+    def __init__(self, session_id, start_time, ttl):
+        self.session_id = session_id
+        self.start_time = start_time
+        self.expires_at = start_time + ttl
+        self.apis = set()
+        self.timestamps = []
+        self.ips = set()
+        self.users = set()
+        self.nbytes = sys.getsizeof(session_id) + self._container_bytes()
+
+    def _container_bytes(self):
+        return sum(sys.getsizeof(container) for container in (self.apis, self.timestamps, self.ips, self.users))
+
+    def record(self, path, timestamp, ip=None, user=None):
+        """Add one request's path, timestamp, IP and user; returns the change in nbytes"""
+        before = self._container_bytes()
+        added = sys.getsizeof(timestamp)
+        self.timestamps.append(timestamp)
+        for container, item in ((self.apis, path), (self.ips, ip), (self.users, user)):
+            if item and item not in container:
+                container.add(item)
+                added += sys.getsizeof(item)
+        delta = self._container_bytes() - before + added
+        self.nbytes += delta
+        return delta
+
+    def take_timestamps(self):
+        """Return the timestamps and start a new list; returns (timestamps, change in nbytes)"""
+        timestamps = self.timestamps
+        self.timestamps = []
+        delta = (sys.getsizeof(self.timestamps) - sys.getsizeof(timestamps)
+                 - sum(sys.getsizeof(item) for item in timestamps))
+        self.nbytes += delta
+        return timestamps, delta
+
+
+class SessionStore:
+    """Capped LRU of SessionState with heap-based expiry"""
+
+    def __init__(self, max_sessions=100000, ttl=3600):
+        self.max_sessions = max_sessions
+        self.ttl = ttl
+        self.lock = threading.RLock()
+        self._sessions = OrderedDict()
+        self._expiry = []
+        self.counters = {'created': 0, 'evicted': 0, 'expired': 0}
+        self._bytes = 0  # sum of nbytes over the stored sessions
+
+    def start(self, session_id, now):
+        """The session's state, created if new; marks it most recently used"""
+        with self.lock:
+            state = self._sessions.get(session_id)
+            if state is not None:
+                self._sessions.move_to_end(session_id)
+                return state
+
+            state = SessionState(session_id, now, self.ttl)
+            self._sessions[session_id] = state
+            self._bytes += state.nbytes
+            heapq.heappush(self._expiry, (state.expires_at, session_id))
+            self.counters['created'] += 1
+            while len(self._sessions) > self.max_sessions:
+                _, evicted = self._sessions.popitem(last=False)
+                self._bytes -= evicted.nbytes
+                self.counters['evicted'] += 1
+            self._compact()
+            return state
+
+    def get(self, session_id):
+        with self.lock:
+            state = self._sessions.get(session_id)
+            if state is not None:
+                self._sessions.move_to_end(session_id)
+            return state
+
+    def pop(self, session_id):
+        with self.lock:
+            state = self._sessions.pop(session_id, None)
+            if state is not None:
+                self._bytes -= state.nbytes
+            return state
+
+    def record(self, state, path, timestamp, ip=None, user=None):
+        """SessionState.record(), keeping the store's byte count in step"""
+        with self.lock:
+            delta = state.record(path, timestamp, ip, user)
+            if self._sessions.get(state.session_id) is state:
+                self._bytes += delta
+
+    def take_timestamps(self, state):
+        """SessionState.take_timestamps(), keeping the store's byte count in step"""
+        with self.lock:
+            timestamps, delta = state.take_timestamps()
+            if self._sessions.get(state.session_id) is state:
+                self._bytes += delta
+            return timestamps
+
+    def expire(self, now):
+        """Remove and return every session whose TTL has passed"""
+        expired = []
+        with self.lock:
+            while self._expiry and self._expiry[0][0] <= now:
+                expires_at, session_id = heapq.heappop(self._expiry)
+                state = self._sessions.get(session_id)
+                # Skip entries left behind by evicted, removed or recreated sessions
+                if state is None or state.expires_at != expires_at:
+                    continue
+                del self._sessions[session_id]
+                self._bytes -= state.nbytes
+                expired.append(state)
+            self.counters['expired'] += len(expired)
+        return expired
+
+    def _compact(self):
+        # Evictions leave stale heap entries; rebuild once they dominate the heap
+        if len(self._expiry) > 2 * self.max_sessions:
+            self._expiry = [(state.expires_at, session_id) for session_id, state in self._sessions.items()]
+            heapq.heapify(self._expiry)
+
+    def __len__(self):
+        with self.lock:
+            return len(self._sessions)
+
+    def stats(self):
+        """Size, approximate memory (from the running byte count) and eviction/expiry counts"""
+        with self.lock:
+            stats = dict(self.counters, sessions=len(self._sessions), max_sessions=self.max_sessions,
+                         heap_entries=len(self._expiry), ttl=self.ttl)
+            stats['approx_bytes'] = sys.getsizeof(self._sessions) + sys.getsizeof(self._expiry) + self._bytes
+        return stats
@@ -0,0 +1,130 @@
+"""
+Fixed-size probabilistic sketches for per-user behaviour aggregation.
+
+HyperLogLog estimates how many distinct values were added (standard error
+about 1.04 / sqrt(2 ** precision)). CountMinSketch estimates how often each
+key was added, never under-counting. UserSketch bundles the ones kept per
+user:
+- distinct sessions (tokens)
+- distinct APIs
+- distinct IPs
+- per-endpoint request counts
+
+Its size depends only on the configured precision and dimensions, not on
+how active the user is. Every sketch serializes to bytes, so a shared
+session backend can store it.
+"""
+import math
+from array import array
+from hashlib import blake2b
+
+
+def _hash64(value):
+    return int.from_bytes(blake2b(value.encode(), digest_size=8).digest(), 'big')
+
+
+class HyperLogLog:
+    def __init__(self, precision=8, registers=None):
+        self.precision = precision
+        self.m = 1 << precision
+        self.registers = bytearray(registers) if registers is not None else bytearray(self.m)
+
+    def add(self, value):
+        h = _hash64(value)
+        index = h >> (64 - self.precision)
+        rest = h & ((1 << (64 - self.precision)) - 1)
+        rank = (64 - self.precision) - rest.bit_length() + 1
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+
+    def count(self):
+        m = self.m
+        alpha = {16: 0.673, 32: 0.697, 64: 0.709}.get(m, 0.7213 / (1 + 1.079 / m))
+        estimate = alpha * m * m / sum(2.0 ** -r for r in self.registers)
+        zeros = self.registers.count(0)
+        if estimate <= 2.5 * m and zeros:
+            estimate = m * math.log(m / zeros)  # linear counting for small cardinalities
+        return int(round(estimate))
+
+    def merge(self, other):
+        self.registers = bytearray(max(a, b) for a, b in zip(self.registers, other.registers))
+
+    def to_bytes(self):
+        return bytes(self.registers)
+
+
+class CountMinSketch:
+    def __init__(self, width=128, depth=4, counters=None):
+        if depth > 8:
+            raise ValueError("depth is limited to 8 rows")
+        self.width = width
+        self.depth = depth
+        self.counters = array('I', counters if counters is not None else bytes(4 * width * depth))
+
+    def _cells(self, key):
+        digest = blake2b(key.encode(), digest_size=4 * self.depth).digest()
+        for row in range(self.depth):
+            column = int.from_bytes(digest[4 * row:4 * row + 4], 'big') % self.width
+            yield row * self.width + column
+
+    def add(self, key, count=1):
+        for cell in self._cells(key):
+            self.counters[cell] = min(self.counters[cell] + count, 0xFFFFFFFF)
+
+    def estimate(self, key):
+        return min(self.counters[cell] for cell in self._cells(key))
+
+    def to_bytes(self):
+        return self.counters.tobytes()
+
+
+class UserSketch:
+    """Constant-size aggregate of everything one user did, across all their sessions"""
+
+    def __init__(self, precision=8, cms_width=128, cms_depth=4, data=None):
+        m = 1 << precision
+        if data is None:
+            self.requests = 0
+            self.sessions = HyperLogLog(precision)
+            self.apis = HyperLogLog(precision)
+            self.ips = HyperLogLog(precision)
+            self.endpoints = CountMinSketch(cms_width, cms_depth)
+        else:
+            if len(data) != self.size(precision, cms_width, cms_depth):
+                raise ValueError("Sketch was serialized with a different shape")
+            self.requests = int.from_bytes(data[:8], 'big')
+            self.sessions = HyperLogLog(precision, data[8:8 + m])
+            self.apis = HyperLogLog(precision, data[8 + m:8 + 2 * m])
+            self.ips = HyperLogLog(precision, data[8 + 2 * m:8 + 3 * m])
+            self.endpoints = CountMinSketch(cms_width, cms_depth, data[8 + 3 * m:])
+
+    def record(self, session_id, path, ip=None):
+        self.requests += 1
+        self.sessions.add(session_id)
+        self.apis.add(path)
+        if ip:
+            self.ips.add(ip)
+        self.endpoints.add(path)
+
+    def summary(self, path=None):
+        summary = {
+            'requests': self.requests,
+            'sessions': max(1, self.sessions.count()),
+            'unique_apis': max(1, self.apis.count()),
+            'unique_ips': self.ips.count(),
+        }
+        if path is not None:
+            summary['path_requests'] = self.endpoints.estimate(path)
+        return summary
+
+    def to_bytes(self):
+        return (self.requests.to_bytes(8, 'big') + self.sessions.to_bytes() + self.apis.to_bytes()
+                + self.ips.to_bytes() + self.endpoints.to_bytes())
+
+    @staticmethod
+    def size(precision=8, cms_width=128, cms_depth=4):
+        return 8 + 3 * (1 << precision) + 4 * cms_width * cms_depth
+
+    @classmethod
+    def from_bytes(cls, data, precision=8, cms_width=128, cms_depth=4):
+        return cls(precision, cms_width, cms_depth, data=data)
@@ -1,4 +1,6 @@
 from database.connection import Neo4jConnection
+from database.stats import apply_stats_delta, policy_created_delta
+from database.customer_features import apply_feature_delta, policy_applied_delta
 from datetime import datetime
 import json
 
@@ -57,6 +59,7 @@ class Application:
                 MERGE (vi:VehicleInsurance {name: 'Vehicle Insurance'})
                 CREATE (a:Application)
                 SET a = $application_data
+                SET a.created_ts = timestamp()
                 CREATE (u)-[:INSURANCE]->(a)
                 CREATE (v)-[:HAS_APPLICATION]->(a)
                 MERGE (v)-[:PART_OF]->(vi)
@@ -70,6 +73,8 @@ class Application:
             application_data = result.single()
             if application_data:
                 app = application_data['a']
+                apply_stats_delta(session, policy_created_delta(app["status"]))
+                apply_feature_delta(session, user_email, policy_applied_delta())
                 # Reconstruct the structured data
                 vehicle_details = {
                     "vehicleType": app["vehicle_type"],
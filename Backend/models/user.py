@@ -1,5 +1,6 @@
 from werkzeug.security import generate_password_hash, check_password_hash
 from database.connection import Neo4jConnection
+from database.stats import apply_stats_delta
 from datetime import datetime
 
 class User:
@@ -41,6 +42,7 @@ class User:
                 name=name
             )
             user_data = result.single()['u']
+            apply_stats_delta(session, {'total_users': 1})
             return User(
                 email,
                 password_hash,
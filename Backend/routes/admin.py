@@ -1,8 +1,21 @@
+import json
+import re
 from flask import Blueprint, jsonify, request, send_from_directory, current_app
-from database.connection import Neo4jConnection
+from database.connection import Neo4jConnection, pool_metrics
 from datetime import datetime
 from config import Config
 from neo4j.time import Date, DateTime
+from routes.helper.streaming import stream_json_page, stream_export
+from routes.helper.pagination import (
+    KeysetPage, MAX_SORT_KEY, decode_cursor, parse_limit, parse_date_ms, parse_bool
+)
+from utils.fraud_score import calculate_forgery_score, get_fraud_color_code, RED, GREEN
+from utils.batch_scoring import start_rescore_job, current_rescore_job
+from utils.scoring_queue import scoring_queue
+from database.stats import (
+    get_stats, apply_stats_delta, status_change_delta,
+    POLICY_STATUS_FIELDS, CLAIM_STATUS_FIELDS
+)
 
 admin_bp = Blueprint('admin', __name__)
 neo4j = Neo4jConnection()
@@ -13,108 +26,173 @@ def serialize_neo4j_value(value):
         return value.isoformat()
     return value
 
-def calculate_forgery_score(claim):
+
+@admin_bp.route('/dashboard', methods=['GET'])
+def get_dashboard_stats():
     """
-    Calculate a forgery score based on fraud metrics with None type handling.
+    Dashboard endpoint, served from the materialized DashboardStats node.
     """
-    fraud_prediction = claim.get('fraudPrediction', 0) or 0
-    fraud_probability = claim.get('fraudProbability', 0.0) or 0.0
-    fraud_reason = claim.get('fraudReason', "") or ""
+    stats = get_stats(neo4j)
 
-    # Base score
-    score = fraud_probability * 100
+    total_claims_fraud = stats['total_claims']
+    fraudulent_count = stats['fraudulent_claims']
+    
+    fraud_detection_rate = round((fraudulent_count / total_claims_fraud * 100) if total_claims_fraud > 0 else 0, 2)
 
-    # Add penalty for fraudulent claims
-    if fraud_prediction:
-        score += 20
+    return jsonify({
+        'total_policies': stats['total_policies'],
+        'policy_distribution': {
+            'active': stats['active_policies'],
+            'pending': stats['pending_policies']
+        },
+        'claims_distribution': {
+            'in_progress': stats['in_progress_claims'],
+            'approved': stats['approved_claims'],
+            'rejected': stats['rejected_claims']
+        },
+        'total_users': stats['total_users'],
+        'fraud_detection_rate': fraud_detection_rate
+    })
 
-    # Reduce score if claim seems legitimate
-    if "legitimate" in fraud_reason.lower():
-        score *= 0.8
 
-    return round(score, 2)
+@admin_bp.route('/db/pool', methods=['GET'])
+def get_pool_metrics():
+    """Connection pool metrics for the shared Neo4j driver"""
+    return jsonify(pool_metrics())
 
 
-def get_fraud_color_code(claim):
+@admin_bp.route('/jobs/rescore', methods=['POST'])
+def start_rescore():
     """
-    Determines a color code with None type handling.
+    Rescore every claim with the current fraud model on a background job.
+    Body: {"only_stale": true} to skip claims already scored by this model version.
     """
-    score = calculate_forgery_score(claim)
-    fraud_prediction = claim.get('fraudPrediction', 0) or 0
-    
-    # Use thresholds for color coding
-    if fraud_prediction == 1 or score >= 20:
-        return "#FF0000"  # Red for fraud
-    else:
-        return "#00FF00"  # Green for legit
+    data = request.get_json(silent=True) or {}
+    try:
+        job = start_rescore_job(only_stale=parse_bool(data.get('only_stale', False)))
+    except RuntimeError as e:
+        return jsonify({'error': str(e)}), 409
+    return jsonify(job.to_dict()), 202
 
 
-@admin_bp.route('/dashboard', methods=['GET'])
-def get_dashboard_stats():
-    """
-    Dashboard endpoint with None type handling.
-    """
-    policies_query = """
-    MATCH (u:User)-[:INSURANCE]->(a:Application)
-    RETURN count(a) as total_policies,
-           count(CASE WHEN a.status = 'PENDING' THEN 1 END) as pending_policies,
-           count(CASE WHEN a.status = 'ACTIVE' THEN 1 END) as active_policies
-    """
+@admin_bp.route('/jobs/scoring', methods=['GET'])
+def get_scoring_queue_stats():
+    """Depth and counters of this process's claim-scoring queue"""
+    return jsonify(scoring_queue.stats())
 
-    claims_query = """
-    MATCH (u:User)-[:HAS_CLAIMS]->(cm:ClaimManagement)
-    RETURN count(cm) as total_claims,
-           count(CASE WHEN cm.status = 'In Progress' THEN 1 END) as in_progress_claims,
-           count(CASE WHEN cm.status = 'Approved' THEN 1 END) as approved_claims,
-           count(CASE WHEN cm.status = 'Rejected' THEN 1 END) as rejected_claims
-    """
 
-    users_query = """
-    MATCH (u:User)
-    RETURN count(u) as total_users
-    """
+@admin_bp.route('/jobs/anomaly-stream', methods=['GET'])
+def get_anomaly_stream_stats():
+    """Counters of this process's streaming behaviour-anomaly scorer"""
+    tracker = current_app.extensions.get('behavior_tracker')
+    if tracker is None or tracker.anomaly_stream is None:
+        return jsonify({'error': 'Streaming anomaly scoring is disabled'}), 404
+    return jsonify(tracker.anomaly_stream.stats())
 
-    fraud_query = """
-    MATCH (u:User)-[:HAS_CLAIMS]->(cm:ClaimManagement)
-    RETURN cm.fraudPrediction as fraudPrediction,
-           cm.fraudProbability as fraudProbability,
-           cm.fraudReason as fraudReason
-    """
 
-    policy_stats = neo4j.execute_query(policies_query)[0] if neo4j.execute_query(policies_query) else {}
-    claim_stats = neo4j.execute_query(claims_query)[0] if neo4j.execute_query(claims_query) else {}
-    user_stats = neo4j.execute_query(users_query)[0] if neo4j.execute_query(users_query) else {}
+@admin_bp.route('/behavior/sessions', methods=['GET'])
+def get_behavior_session_stats():
+    """Size, approximate memory and eviction/expiry counts of the behaviour session store"""
+    tracker = current_app.extensions.get('behavior_tracker')
+    if tracker is None:
+        return jsonify({'error': 'Behaviour tracking is not enabled'}), 404
+    return jsonify(tracker.sessions.stats())
 
-    fraud_data = neo4j.execute_query(fraud_query) or []
-    
-    total_claims_fraud = len(fraud_data)
-    fraudulent_count = sum(1 for claim in fraud_data if get_fraud_color_code(claim) == "#FF0000")
-    
-    fraud_detection_rate = round((fraudulent_count / total_claims_fraud * 100) if total_claims_fraud > 0 else 0, 2)
 
-    return jsonify({
-        'total_policies': policy_stats.get('total_policies', 0),
-        'policy_distribution': {
-            'active': policy_stats.get('active_policies', 0),
-            'pending': policy_stats.get('pending_policies', 0)
+@admin_bp.route('/behavior/users/<email>', methods=['GET'])
+def get_behavior_user_summary(email):
+    """
+    Estimated sessions, distinct APIs/IPs and request count for one user across
+    all of their sessions. Query: paths (comma-separated) for per-endpoint estimates.
+    """
+    tracker = current_app.extensions.get('behavior_tracker')
+    if tracker is None:
+        return jsonify({'error': 'Behaviour tracking is not enabled'}), 404
+    paths = [p for p in (request.args.get('paths') or '').split(',') if p]
+    summary = tracker.sessions.user_summary(email, paths)
+    if summary is None:
+        return jsonify({'error': 'No behaviour recorded for this user'}), 404
+    return jsonify(summary)
+
+
+@admin_bp.route('/behavior/log-writer', methods=['GET'])
+def get_behavior_log_writer_stats():
+    """Buffer depth and write/drop counts of the behaviour log writer"""
+    tracker = current_app.extensions.get('behavior_tracker')
+    if tracker is None:
+        return jsonify({'error': 'Behaviour tracking is not enabled'}), 404
+    return jsonify(tracker.log_writer.stats())
+
+
+@admin_bp.route('/jobs/rescore', methods=['GET'])
+def get_rescore_progress():
+    """Progress of the running or last rescoring job"""
+    job = current_rescore_job()
+    if job is None:
+        return jsonify({'error': 'No rescoring job has been started'}), 404
+    return jsonify(job.to_dict())
+
+
+def parse_addons(addons_value):
+    """Safely parse addons from Neo4j value"""
+    if isinstance(addons_value, str):
+        try:
+            return json.loads(addons_value)
+        except json.JSONDecodeError:
+            return []
+    elif isinstance(addons_value, (list, tuple)):
+        return list(addons_value)
+    return []
+
+
+def format_policy(policy):
+    """Shape a policy record from Neo4j into the admin API representation"""
+    # Serialize all values to handle Neo4j specific types
+    serialized_policy = {k: serialize_neo4j_value(v) for k, v in policy.items()}
+
+    return {
+        'id': serialized_policy.get('policy_id', 'N/A'),
+        'vehicleDetails': {
+            'type': serialized_policy.get('vehicle_type', 'N/A'),
+            'registrationNumber': serialized_policy.get('registration_number', 'N/A'),
+            'make': serialized_policy.get('make', 'N/A'),
+            'model': serialized_policy.get('model', 'N/A'),
+            'year': int(serialized_policy.get('year', 0))
         },
-        'claims_distribution': {
-            'in_progress': claim_stats.get('in_progress_claims', 0),
-            'approved': claim_stats.get('approved_claims', 0),
-            'rejected': claim_stats.get('rejected_claims', 0)
+        'personalInfo': {
+            'fullName': serialized_policy.get('applicant_name', 'N/A'),
+            'mobile': serialized_policy.get('mobile', 'N/A'),
+            'email': serialized_policy.get('email', 'N/A'),
+            'address': serialized_policy.get('address', 'N/A'),
+            'city': serialized_policy.get('city', 'N/A'),
+            'state': serialized_policy.get('state', 'N/A'),
+            'customerId': serialized_policy.get('customer_id', 'N/A'),
+            'panNumber': serialized_policy.get('pan_number', 'N/A'),
+            'occupation': serialized_policy.get('occupation', 'N/A'),
+            'education': serialized_policy.get('education', 'N/A'),
+            'dateOfBirth': serialized_policy.get('date_of_birth', 'N/A')
         },
-        'total_users': user_stats.get('total_users', 0),
-        'fraud_detection_rate': fraud_detection_rate
-    })
+        'policyDetails': {
+            'idv': float(serialized_policy.get('idv', 0.0)),
+            'ncb': float(serialized_policy.get('ncb', 0.0)),
+            'csl': float(serialized_policy.get('csl', 0.0)),
+            'umbrellaLimit': float(serialized_policy.get('umbrella_limit', 0.0)),
+            'totalInsuranceAmount': float(serialized_policy.get('total_amount', 0.0)),
+            'addOns': parse_addons(serialized_policy.get('addons')),
+            'premium': float(serialized_policy.get('premium', 0.0))
+        },
+        'status': serialized_policy.get('status', 'N/A'),
+        'timestamps': {
+            'created': serialized_policy.get('created_at', 'N/A'),
+            'updated': serialized_policy.get('updated_at', 'N/A')
+        },
+        'predicted_label': serialized_policy.get('predicted_label', 'N/A'),
+        'confidence': float(serialized_policy.get('confidence') or 0.0)
+    }
 
 
-@admin_bp.route('/policies', methods=['GET'])
-def get_all_policies():
-    """
-    Policies endpoint with None type handling and proper serialization
-    """
-    query = """
-    MATCH (u:User)-[:INSURANCE]->(a:Application)
+# Everything after a page of (u, a) rows has been picked: joins and projection
+POLICY_PROJECTION = """
     OPTIONAL MATCH (u)-[:HAS_BANKING_DETAILS]->(b:BankingDetails)
     OPTIONAL MATCH (u)-[:HAS_DETAILS]->(o:OtherDetails)
     OPTIONAL MATCH (u)-[:HAS_DOC]->(d:Document)
@@ -141,84 +219,159 @@ def get_all_policies():
            a.state as state,
            a.created_at as created_at,
            a.updated_at as updated_at,
+           a.created_ts as created_ts,
+           elementId(a) as row_key,
            b.panNumber as pan_number,
            o.occupation as occupation,
            o.education_level as education,
            o.dob as date_of_birth,
            d.predicted_label as predicted_label,
            d.confidence as confidence
-    ORDER BY a.created_at DESC
-    """
-
-    policies = neo4j.execute_query(query) or []
-    formatted_policies = []
-
-    def parse_addons(addons_value):
-        """Safely parse addons from Neo4j value"""
-        if isinstance(addons_value, str):
-            try:
-                import json
-                return json.loads(addons_value)
-            except json.JSONDecodeError:
-                return []
-        elif isinstance(addons_value, (list, tuple)):
-            return list(addons_value)
-        return []
-
-    for policy in policies:
-        # Serialize all values to handle Neo4j specific types
-        serialized_policy = {k: serialize_neo4j_value(v) for k, v in policy.items()}
-        
-        formatted_policy = {
-            'id': serialized_policy.get('policy_id', 'N/A'),
-            'vehicleDetails': {
-                'type': serialized_policy.get('vehicle_type', 'N/A'),
-                'registrationNumber': serialized_policy.get('registration_number', 'N/A'),
-                'make': serialized_policy.get('make', 'N/A'),
-                'model': serialized_policy.get('model', 'N/A'),
-                'year': int(serialized_policy.get('year', 0))
-            },
-            'personalInfo': {
-                'fullName': serialized_policy.get('applicant_name', 'N/A'),
-                'mobile': serialized_policy.get('mobile', 'N/A'),
-                'email': serialized_policy.get('email', 'N/A'),
-                'address': serialized_policy.get('address', 'N/A'),
-                'city': serialized_policy.get('city', 'N/A'),
-                'state': serialized_policy.get('state', 'N/A'),
-                'customerId': serialized_policy.get('customer_id', 'N/A'),
-                'panNumber': serialized_policy.get('pan_number', 'N/A'),
-                'occupation': serialized_policy.get('occupation', 'N/A'),
-                'education': serialized_policy.get('education', 'N/A'),
-                'dateOfBirth': serialized_policy.get('date_of_birth', 'N/A')
-            },
-            'policyDetails': {
-                'idv': float(serialized_policy.get('idv', 0.0)),
-                'ncb': float(serialized_policy.get('ncb', 0.0)),
-                'csl': float(serialized_policy.get('csl', 0.0)),
-                'umbrellaLimit': float(serialized_policy.get('umbrella_limit', 0.0)),
-                'totalInsuranceAmount': float(serialized_policy.get('total_amount', 0.0)),
-                'addOns': parse_addons(serialized_policy.get('addons')),
-                'premium': float(serialized_policy.get('premium', 0.0))
-            },
-            'status': serialized_policy.get('status', 'N/A'),
-            'timestamps': {
-                'created': serialized_policy.get('created_at', 'N/A'),
-                'updated': serialized_policy.get('updated_at', 'N/A')
-            },
-            'predicted_label': serialized_policy.get('predicted_label', 'N/A'),
-            'confidence': float(serialized_policy.get('confidence') or 0.0)
-        }
-        formatted_policies.append(formatted_policy)
-
-    return jsonify(formatted_policies)
+"""
 
-@admin_bp.route('/claims', methods=['GET'])
-def get_all_claims():
+
+def build_policy_filters(args):
     """
-    Fetches all claims with safe None type handling.
+    Cypher predicates on (u, a) for the policy list filters:
+    status, city, vehicle_type, from (inclusive) and to (exclusive) on created_ts.
     """
-    query = """
-    MATCH (u:User)-[:HAS_CLAIMS]->(cm:ClaimManagement)
+    clauses, params = [], {}
+    for arg, prop in (('status', 'status'), ('city', 'city'), ('vehicle_type', 'vehicle_type')):
+        if args.get(arg):
+            clauses.append(f"a.{prop} = ${arg}")
+            params[arg] = args.get(arg)
+    from_ts = parse_date_ms(args.get('from'), 'from')
+    to_ts = parse_date_ms(args.get('to'), 'to')
+    if from_ts is not None:
+        clauses.append("a.created_ts >= $from_ts")
+        params['from_ts'] = from_ts
+    if to_ts is not None:
+        clauses.append("a.created_ts < $to_ts")
+        params['to_ts'] = to_ts
+    return clauses, params
+
+
+def policies_query(clauses, paged=True, columns=None):
+    """
+    Policy list query. Paged queries are newest first, ties broken by
+    elementId (application_id is not unique), and take
+    $before_key/$before_id/$limit; unpaged (export) queries are left unordered
+    so the server can stream them without sorting the whole book, and return
+    only the given columns.
+    """
+    if not paged:
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        return f"""
+    MATCH (u:User)-[:INSURANCE]->(a:Application)
+    {where}
+    {select_projection(POLICY_PROJECTION, columns)}
+    """
+    clauses = clauses + [
+        "a.created_ts <= $before_key",
+        "(a.created_ts < $before_key OR elementId(a) < $before_id)"
+    ]
+    return f"""
+    MATCH (u:User)-[:INSURANCE]->(a:Application)
+    WHERE {' AND '.join(clauses)}
+    WITH u, a
+    ORDER BY a.created_ts DESC, elementId(a) DESC
+    LIMIT $limit
+    {POLICY_PROJECTION}
+    ORDER BY created_ts DESC, row_key DESC
+    """
+
+
+def stream_page(clauses, params, query, count_query, sort_field, id_field, formatter):
+    """Run one keyset page of a list query and stream it with its next cursor"""
+    limit = parse_limit(request.args.get('limit'))
+    before_key, before_id = decode_cursor(request.args.get('cursor'))
+    page_params = dict(
+        params,
+        limit=limit,
+        before_key=MAX_SORT_KEY if before_key is None else before_key,
+        before_id='' if before_id is None else before_id
+    )
+
+    total = None
+    if parse_bool(request.args.get('include_total')):
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        total = neo4j.execute_query(count_query.format(where=where), params)[0]['total']
+
+    page = KeysetPage(limit, sort_field, id_field)
+    records = page.track(neo4j.stream_query(query, page_params))
+
+    def trailer():
+        result = {'next_cursor': page.next_cursor()}
+        if total is not None:
+            result['total'] = total
+        return result
+
+    return stream_json_page((formatter(record) for record in records), trailer)
+
+
+@admin_bp.route('/policies', methods=['GET'])
+def get_all_policies():
+    """
+    Keyset-paginated policies, newest first.
+
+    Query parameters: limit, cursor (next_cursor of the previous page),
+    status, city, vehicle_type, from, to, include_total.
+    """
+    try:
+        clauses, params = build_policy_filters(request.args)
+        return stream_page(
+            clauses, params,
+            policies_query(clauses),
+            """
+            MATCH (u:User)-[:INSURANCE]->(a:Application)
+            {where}
+            RETURN count(a) as total
+            """,
+            'created_ts', 'row_key', format_policy
+        )
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+
+def format_claim(claim):
+    """Shape a claim record from Neo4j into the admin API representation"""
+    # Serialize all values to handle Neo4j specific types
+    serialized_claim = {k: serialize_neo4j_value(v) for k, v in claim.items()}
+    # Stored at scoring time; only claims never scored or backfilled fall back to computing it
+    color_code = serialized_claim.get('color_code') or get_fraud_color_code(serialized_claim)
+
+    claim_details = {
+        'claimManagementId': serialized_claim.get('claim_management_id', 'N/A'),
+        'claimType': serialized_claim.get('claim_type', 'N/A'),
+        'status': serialized_claim.get('status', 'Unknown'),
+        'lastUpdated': serialized_claim.get('submission_date', 'N/A'),
+        'probability': float(0.0 if serialized_claim.get('fraudProbability') is None else serialized_claim.get('fraudProbability')) * 100,
+        'fraudPrediction': serialized_claim.get('fraudPrediction', 0),
+        'fraudReason': serialized_claim.get('fraudReason', 'Not specified'),
+        'claimId': serialized_claim.get('claim_id', 'N/A'),
+        'severity': serialized_claim.get('severity', 'Unknown'),
+        'vehicleAmount': float(serialized_claim.get('vehicle_amount', 0.0)),
+        'totalAmount': float(serialized_claim.get('total_amount', 0.0)),
+        'propertyAmount': float(serialized_claim.get('property_amount', 0.0)),
+        'injuryAmount': float(serialized_claim.get('injury_amount', 0.0)),
+        'claimDetailType': serialized_claim.get('claim_detail_type', 'N/A'),
+        'incident': {
+            'date': serialized_claim.get('incident_date', 'N/A'),
+            'city': serialized_claim.get('incident_city', 'Unknown'),
+            'location': serialized_claim.get('incident_location', 'Unknown')
+        },
+        'customerId': serialized_claim.get('customer_id', 'N/A'),
+        'forgeryScore': serialized_claim.get('forgery_score'),
+        'colorCode': color_code
+    }
+
+    return {
+        'userName': serialized_claim.get('user_name', 'Unknown'),
+        'claimDetails': claim_details
+    }
+
+
+CLAIM_PROJECTION = """
     OPTIONAL MATCH (cm)-[:MANAGES]->(c:Claim)
     OPTIONAL MATCH (c)-[:FILED_BY]->(cust:Customer)
     OPTIONAL MATCH (c)-[:OCCURRED_ON]->(i:Incident)
@@ -227,9 +380,13 @@ def get_all_claims():
            cm.claim_type as claim_type,
            cm.status as status,
            cm.last_updated as submission_date,
+           cm.created_ts as created_ts,
+           elementId(cm) as row_key,
            cm.fraudProbability as fraudProbability,
            cm.fraudPrediction as fraudPrediction,
            cm.fraudReason as fraudReason,
+           cm.forgeryScore as forgery_score,
+           cm.colorCode as color_code,
            c.id as claim_id,
            c.severity as severity,
            c.vehicle_amount as vehicle_amount,
@@ -241,46 +398,222 @@ def get_all_claims():
            i.date as incident_date,
            i.city as incident_city,
            i.location as incident_location
+"""
+
+
+def build_claim_filters(args):
+    """
+    Cypher predicates on (u, cm) for the claim list filters: status,
+    color (red/green), city (incident city), vehicle_type (of the claimant's
+    policies), from (inclusive) and to (exclusive) on created_ts.
+    """
+    clauses, params = [], {}
+    if args.get('status'):
+        clauses.append("cm.status = $status")
+        params['status'] = args.get('status')
+    color = (args.get('color') or '').lower()
+    if color in ('red', RED.lower()):
+        clauses.append("cm.colorCode = $color_code")
+        params['color_code'] = RED
+    elif color in ('green', GREEN.lower()):
+        clauses.append("cm.colorCode = $color_code")
+        params['color_code'] = GREEN
+    elif color:
+        raise ValueError('color must be red or green')
+    if args.get('city'):
+        clauses.append(
+            "EXISTS { MATCH (cm)-[:MANAGES]->(:Claim)-[:OCCURRED_ON]->(fi:Incident) WHERE fi.city = $city }"
+        )
+        params['city'] = args.get('city')
+    if args.get('vehicle_type'):
+        clauses.append(
+            "EXISTS { MATCH (u)-[:INSURANCE]->(fa:Application) WHERE fa.vehicle_type = $vehicle_type }"
+        )
+        params['vehicle_type'] = args.get('vehicle_type')
+    from_ts = parse_date_ms(args.get('from'), 'from')
+    to_ts = parse_date_ms(args.get('to'), 'to')
+    if from_ts is not None:
+        clauses.append("cm.created_ts >= $from_ts")
+        params['from_ts'] = from_ts
+    if to_ts is not None:
+        clauses.append("cm.created_ts < $to_ts")
+        params['to_ts'] = to_ts
+    return clauses, params
+
+
+# sort query parameter -> (ClaimManagement property, RETURN alias), both descending.
+# Claims without the property can't be placed in the order, so they are left
+# out of that sort's pages and its total alike.
+CLAIM_SORTS = {
+    'created': ('created_ts', 'created_ts'),
+    'forgery_score': ('forgeryScore', 'forgery_score'),
+}
+
+
+def claims_query(clauses, paged=True, sort='created', columns=None):
+    """
+    Claim list query. Paged queries are ordered by the sort key (newest or
+    highest score first), ties broken by elementId, and take
+    $before_key/$before_id/$limit; unpaged (export) queries are left unordered
+    and return only the given columns.
+    """
+    if not paged:
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        return f"""
+    MATCH (u:User)-[:HAS_CLAIMS]->(cm:ClaimManagement)
+    {where}
+    {select_projection(CLAIM_PROJECTION, columns)}
+    """
+    prop, alias = CLAIM_SORTS[sort]
+    clauses = clauses + [
+        f"cm.{prop} <= $before_key",
+        f"(cm.{prop} < $before_key OR elementId(cm) < $before_id)"
+    ]
+    return f"""
+    MATCH (u:User)-[:HAS_CLAIMS]->(cm:ClaimManagement)
+    WHERE {' AND '.join(clauses)}
+    WITH u, cm
+    ORDER BY cm.{prop} DESC, elementId(cm) DESC
+    LIMIT $limit
+    {CLAIM_PROJECTION}
+    ORDER BY {alias} DESC, row_key DESC
     """
 
-    claims = neo4j.execute_query(query) or []
-    formatted_claims = []
-
-    for claim in claims:
-        # Serialize all values to handle Neo4j specific types
-        serialized_claim = {k: serialize_neo4j_value(v) for k, v in claim.items()}
-        color_code = get_fraud_color_code(serialized_claim)
-
-        claim_details = {
-            'claimManagementId': serialized_claim.get('claim_management_id', 'N/A'),
-            'claimType': serialized_claim.get('claim_type', 'N/A'),
-            'status': serialized_claim.get('status', 'Unknown'),
-            'lastUpdated': serialized_claim.get('submission_date', 'N/A'),
-            'probability': float(0.0 if serialized_claim.get('fraudProbability') is None else serialized_claim.get('fraudProbability')) * 100,
-            'fraudPrediction': serialized_claim.get('fraudPrediction', 0),
-            'fraudReason': serialized_claim.get('fraudReason', 'Not specified'),
-            'claimId': serialized_claim.get('claim_id', 'N/A'),
-            'severity': serialized_claim.get('severity', 'Unknown'),
-            'vehicleAmount': float(serialized_claim.get('vehicle_amount', 0.0)),
-            'totalAmount': float(serialized_claim.get('total_amount', 0.0)),
-            'propertyAmount': float(serialized_claim.get('property_amount', 0.0)),
-            'injuryAmount': float(serialized_claim.get('injury_amount', 0.0)),
-            'claimDetailType': serialized_claim.get('claim_detail_type', 'N/A'),
-            'incident': {
-                'date': serialized_claim.get('incident_date', 'N/A'),
-                'city': serialized_claim.get('incident_city', 'Unknown'),
-                'location': serialized_claim.get('incident_location', 'Unknown')
-            },
-            'customerId': serialized_claim.get('customer_id', 'N/A'),
-            'colorCode': color_code
-        }
-
-        formatted_claims.append({
-            'userName': serialized_claim.get('user_name', 'Unknown'),
-            'claimDetails': claim_details
-        })
 
-    return jsonify(formatted_claims)
+@admin_bp.route('/claims', methods=['GET'])
+def get_all_claims():
+    """
+    Keyset-paginated claims, newest first or (sort=forgery_score) riskiest first;
+    the forgery_score sort and its total only include claims that have a score.
+
+    Query parameters: limit, cursor (next_cursor of the previous page), sort,
+    status, color, city, vehicle_type, from, to, include_total.
+    """
+    try:
+        sort = request.args.get('sort') or 'created'
+        if sort not in CLAIM_SORTS:
+            raise ValueError(f"sort must be one of {', '.join(CLAIM_SORTS)}")
+        clauses, params = build_claim_filters(request.args)
+        clauses.append(f"cm.{CLAIM_SORTS[sort][0]} IS NOT NULL")
+        return stream_page(
+            clauses, params,
+            claims_query(clauses, sort=sort),
+            """
+            MATCH (u:User)-[:HAS_CLAIMS]->(cm:ClaimManagement)
+            {where}
+            RETURN count(cm) as total
+            """,
+            CLAIM_SORTS[sort][1], 'row_key', format_claim
+        )
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+
+def projection_fields(projection):
+    """(expression, alias) pairs of a list projection's RETURN, in order"""
+    return re.findall(r'(\S+) as (\w+)', projection)
+
+
+def select_projection(projection, columns=None):
+    """
+    The projection with its RETURN cut down to the given aliases, so unused
+    fields are never read from the store. The OPTIONAL MATCHes are kept as
+    they are: they decide how many rows each claim or policy produces.
+    """
+    if columns is None:
+        return projection
+    joins, _ = projection.split('RETURN', 1)
+    fields = ",\n           ".join(
+        f"{expr} as {alias}" for expr, alias in projection_fields(projection) if alias in columns
+    )
+    return f"{joins}RETURN {fields}\n"
+
+
+# row_key (elementId) is only the keyset tiebreak of the list pages, not data
+POLICY_EXPORT_COLUMNS = [alias for _, alias in projection_fields(POLICY_PROJECTION) if alias != 'row_key']
+CLAIM_EXPORT_COLUMNS = [alias for _, alias in projection_fields(CLAIM_PROJECTION) if alias != 'row_key']
+
+# Claims scored before forgeryScore/colorCode were stored get both computed
+# from the fraud fields at export time
+CLAIM_SCORE_COLUMNS = ('forgery_score', 'color_code')
+CLAIM_SCORE_INPUTS = ('color_code', 'fraudPrediction', 'fraudProbability', 'fraudReason')
+
+
+def export_claim_row(record):
+    row = {k: serialize_neo4j_value(v) for k, v in record.items()}
+    if 'color_code' in row and row['color_code'] is None:
+        row['forgery_score'] = calculate_forgery_score(row)
+        row['color_code'] = get_fraud_color_code(row)
+    return row
+
+
+def export_claim_fields(columns):
+    """Columns to fetch for a claim export: the requested ones plus the score inputs they need"""
+    if not any(col in columns for col in CLAIM_SCORE_COLUMNS):
+        return columns
+    return columns + [col for col in CLAIM_SCORE_INPUTS if col not in columns]
+
+
+def export_response(name, available_columns, build_query, params, to_row, fields=None):
+    """
+    Validate format/columns/gzip query parameters and stream the export.
+    build_query gets the columns to RETURN (fields(columns) when given, for
+    rows that are derived from other fields); rows come straight off a lazy
+    cursor, so memory stays flat for any size.
+    """
+    fmt = (request.args.get('format') or 'ndjson').lower()
+    if fmt not in ('ndjson', 'csv'):
+        raise ValueError('format must be ndjson or csv')
+
+    columns = available_columns
+    if request.args.get('columns'):
+        columns = [col.strip() for col in request.args.get('columns').split(',') if col.strip()]
+        unknown = [col for col in columns if col not in available_columns]
+        if unknown:
+            raise ValueError(f"Unknown columns: {', '.join(unknown)}")
+
+    query = build_query(fields(columns) if fields else columns)
+    rows = (to_row(record) for record in neo4j.stream_query(query, params))
+    return stream_export(rows, columns, fmt, parse_bool(request.args.get('gzip')), name)
+
+
+@admin_bp.route('/export/policies', methods=['GET'])
+def export_policies():
+    """
+    Stream the policy book as NDJSON or CSV.
+
+    Query parameters: format (ndjson|csv), columns (comma-separated), gzip,
+    and the /admin/policies filters.
+    """
+    try:
+        clauses, params = build_policy_filters(request.args)
+        return export_response(
+            'policies', POLICY_EXPORT_COLUMNS,
+            lambda columns: policies_query(clauses, paged=False, columns=columns), params,
+            lambda record: {k: serialize_neo4j_value(v) for k, v in record.items()}
+        )
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+
+@admin_bp.route('/export/claims', methods=['GET'])
+def export_claims():
+    """
+    Stream the claim book as NDJSON or CSV.
+
+    Query parameters: format (ndjson|csv), columns (comma-separated), gzip,
+    and the /admin/claims filters.
+    """
+    try:
+        clauses, params = build_claim_filters(request.args)
+        return export_response(
+            'claims', CLAIM_EXPORT_COLUMNS,
+            lambda columns: claims_query(clauses, paged=False, columns=columns), params,
+            export_claim_row, fields=export_claim_fields
+        )
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
 
 @admin_bp.route('/documents/<policy_id>', methods=['GET'])
 def get_documents(policy_id):
@@ -343,15 +676,23 @@ def update_policy_status(policy_id):
             
         query = """
         MATCH (a:Application {application_id: $policy_id})
+        WITH a, a.status AS old_status, EXISTS { (:User)-[:INSURANCE]->(a) } AS counted
         SET a.status = $status,
             a.updated_at = datetime()
-        RETURN a
+        RETURN a, old_status, counted
         """
-        
-        result = neo4j.execute_query(query, parameters={
-            "policy_id": policy_id,
-            "status": new_status
-        })
+
+        def update_status(tx):
+            records = list(tx.run(query, policy_id=policy_id, status=new_status))
+            # Move the policy between dashboard status buckets in the same transaction
+            for record in records:
+                if record['counted']:
+                    apply_stats_delta(tx, status_change_delta(
+                        POLICY_STATUS_FIELDS, record['old_status'], new_status
+                    ))
+            return records
+
+        result = neo4j.execute_write(update_status)
         
         if not result:
             return jsonify({'error': 'Policy not found'}), 404
@@ -374,14 +715,22 @@ def update_claim_status(claim_id):
             
         query = """
         MATCH (cm:ClaimManagement {id: $claim_id})
+        WITH cm, cm.status AS old_status, EXISTS { (:User)-[:HAS_CLAIMS]->(cm) } AS counted
         SET cm.status = $status
-        RETURN cm
+        RETURN cm, old_status, counted
         """
-        
-        result = neo4j.execute_query(query, parameters={
-            "claim_id": claim_id,
-            "status": new_status
-        })
+
+        def update_status(tx):
+            records = list(tx.run(query, claim_id=claim_id, status=new_status))
+            # Move the claim between dashboard status buckets in the same transaction
+            for record in records:
+                if record['counted']:
+                    apply_stats_delta(tx, status_change_delta(
+                        CLAIM_STATUS_FIELDS, record['old_status'], new_status
+                    ))
+            return records
+
+        result = neo4j.execute_write(update_status)
         
         if not result:
             return jsonify({'error': 'Claim not found'}), 404
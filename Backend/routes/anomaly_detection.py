@@ -1,63 +1,126 @@
 from flask import Blueprint, jsonify, request, current_app
 import joblib
-import pandas as pd
-import numpy as np
-import pickle
-import os
 import json
-from datetime import datetime, timedelta
+from config import Config
+from utils.anomaly_features import (
+    ANOMALY_MODEL_PATH, ANOMALY_ARTIFACTS_PATH, ANOMALY_THRESHOLD, CompiledPreprocessor
+)
+from utils.isolation_forest import load_anomaly_model
 
 log_bp = Blueprint('log', __name__)
-# Load artifacts
-model = joblib.load('routes/models/iso_forest_model.pkl')
-artifacts = joblib.load('routes/models/preprocessing_artifacts.pkl')
+# Load artifacts. A missing or incompatible model must not stop the app from
+# starting: the endpoints answer 503 and the tracker's stream stays unscored.
+model = artifacts = preprocessor = None
+load_error = None
+try:
+    model = load_anomaly_model(ANOMALY_MODEL_PATH)
+    artifacts = joblib.load(ANOMALY_ARTIFACTS_PATH)
+    preprocessor = CompiledPreprocessor(artifacts)
+except Exception as e:
+    model = artifacts = preprocessor = None
+    load_error = str(e)
+    print(f"Anomaly model failed to load: {load_error}")
+
+
+def _model_unavailable():
+    return jsonify({'error': f'Anomaly model is not loaded: {load_error}'}), 503
+
 
 @log_bp.route('/detect-anomaly', methods=['POST'])
 def detect_anomaly():
+    if preprocessor is None:
+        return _model_unavailable()
     try:
         # 1. Get data from request
         data = request.json
-        
-        # 2. Create DataFrame
-        input_df = pd.DataFrame([data])
-        
-        # 3. Preprocessing
-        # Handle behavior
-        input_df['behavior'] = input_df['behavior'].apply(
-            lambda x: x if x in artifacts['common_behaviors'] else 'Other'
-        )
-        input_df['behavior_encoded'] = input_df['behavior'].map(
-            artifacts['freq_map']
-        ).fillna(artifacts['freq_map']['Other'])
-        
-        # Handle behavior_type
-        input_df['behavior_type'] = input_df['behavior_type'].map(
-            artifacts['behavior_type_map']
-        )
-        
-        # Handle numerical features scaling
-        num_features = ['inter_api_access_duration(sec)', 'sequence_length(count)',
-                       'vsession_duration(min)', 'num_sessions', 'num_users',
-                       'num_unique_apis']
-        input_df[num_features] = artifacts['scaler'].transform(input_df[num_features])
-        
-        # 4. Create final feature set
-        final_features = pd.DataFrame(columns=artifacts['feature_columns'])
-        for col in final_features.columns:
-            if col in input_df.columns:
-                final_features[col] = input_df[col]
-            else:
-                final_features[col] = 0  # For one-hot encoded columns not present
-        
-        # 5. Predict anomaly score
-        score = model.decision_function(final_features.values)[0]
-        is_anomaly = score < -0.43  # Use your calculated threshold
-        
+
+        # 2. Preprocess into one feature row
+        features = preprocessor.vectorize(data)
+
+        # 3. Predict anomaly score
+        score = model.decision_function(features)[0]
+        is_anomaly = score < ANOMALY_THRESHOLD
+
         return jsonify({
             'anomaly': bool(is_anomaly),
             'score': float(score),
-            'threshold': -0.43
+            'threshold': ANOMALY_THRESHOLD
         })
     
     except Exception as e:
-        return jsonify({'error': str(e)}), 400
\ No newline at end of file
+        return jsonify({'error': str(e)}), 400
+
+
+class BatchTooLarge(Exception):
+    pass
+
+
+def _batch_events():
+    """
+    Events from a JSON array body, or an NDJSON body (one event per line).
+    Returns (events, {index: error}) for NDJSON lines that are not valid JSON.
+    """
+    if request.mimetype in ('application/x-ndjson', 'application/jsonl'):
+        lines = [line for line in request.get_data(as_text=True).splitlines() if line.strip()]
+        if len(lines) > Config.ANOMALY_MAX_BATCH_SIZE:
+            raise BatchTooLarge(len(lines))
+        events, errors = [], {}
+        for index, line in enumerate(lines):
+            try:
+                events.append(json.loads(line))
+            except ValueError as e:
+                events.append(None)
+                errors[index] = f"Invalid JSON: {str(e)}"
+        return events, errors
+
+    events = request.get_json()
+    if not isinstance(events, list):
+        raise ValueError('Expected a JSON array of events or an NDJSON body')
+    if len(events) > Config.ANOMALY_MAX_BATCH_SIZE:
+        raise BatchTooLarge(len(events))
+    return events, {}
+
+
+@log_bp.route('/detect-anomaly/batch', methods=['POST'])
+def detect_anomaly_batch():
+    """
+    Score many behaviour events in one call. Results come back in request order;
+    an event that can't be scored gets {'error': ...} without failing the batch.
+    """
+    if preprocessor is None:
+        return _model_unavailable()
+    try:
+        events, parse_errors = _batch_events()
+    except BatchTooLarge as e:
+        return jsonify({
+            'error': f'Batch of {e.args[0]} events exceeds the limit of {Config.ANOMALY_MAX_BATCH_SIZE}'
+        }), 413
+    except Exception as e:
+        return jsonify({'error': str(e)}), 400
+
+    try:
+        features, errors = preprocessor.vectorize_many(events)
+        errors.update(parse_errors)
+        scores = iter(model.decision_function(features) if len(features) else [])
+
+        results = []
+        anomalies = 0
+        for index in range(len(events)):
+            if index in errors:
+                results.append({'error': errors[index]})
+                continue
+            score = float(next(scores))
+            is_anomaly = score < ANOMALY_THRESHOLD
+            anomalies += is_anomaly
+            results.append({'anomaly': is_anomaly, 'score': score})
+
+        return jsonify({
+            'results': results,
+            'count': len(events),
+            'anomalies': anomalies,
+            'errors': len(errors),
+            'threshold': ANOMALY_THRESHOLD
+        })
+
+    except Exception as e:
+        return jsonify({'error': str(e)}), 400
@@ -7,6 +7,8 @@ from models.user import User
 from utils.auth import get_user_from_token
 from models.applications import Application
 from database.connection import Neo4jConnection
+from database.stats import record_stats_delta, policy_created_delta
+from database.customer_features import record_feature_delta, policy_applied_delta
 import uuid
 
 apply_bp = Blueprint('apply', __name__)
@@ -115,6 +117,7 @@ def update_application():
 
                     user_result = neo4j.execute_query(create_user_query, user_data)
                     print(user_result)
+                    record_stats_delta({'total_users': 1}, neo4j)
 
                 application_data = {
                     "application_id": data.get("application_id", "Unknown"),
@@ -148,6 +151,7 @@ def update_application():
                     MATCH (u:User {email: $email})
                     CREATE (a:Application)
                     SET a = $application_data
+                    SET a.created_ts = timestamp()
                     MERGE (cm:ClaimManagement {id: $management_id})
                     CREATE (u)-[:INSURANCE]->(a)
                     MERGE (cm)-[:LINKED_TO]->(a)
@@ -160,6 +164,8 @@ def update_application():
                 })
                 if not result:
                     return jsonify({'error': 'Failed to update application or link nodes'}), 500
+                record_stats_delta(policy_created_delta(application_data['status']), neo4j)
+                record_feature_delta(email, policy_applied_delta(), neo4j)
 
                 return jsonify({
                     'message': 'Application updated and linked successfully',
@@ -1,9 +1,13 @@
 import datetime
 from flask import Blueprint, request, jsonify
 from database.connection import Neo4jConnection
+from database.stats import record_stats_delta, claim_created_delta
+from database.customer_features import record_feature_delta, claim_filed_delta, CLAIM_FEATURES_SET
 from utils.auth import token_required
 import uuid
-from utils.detector import predict_from_neo4j, analyze_fraud_and_save
+from utils.scoring_queue import scoring_queue, QUEUE_SCORING_SET
+from config import Config
+from utils.fraud_score import fraud_score_fields
 from werkzeug.security import generate_password_hash
 from utils.auth import generate_strong_password
 claims_bp = Blueprint('claims', __name__)
@@ -32,6 +36,9 @@ def create_claim(current_user_email):
             id: $management_id,
             status: 'In Progress',
             last_updated: $created_date,
+            created_ts: timestamp(),
+            forgeryScore: $forgery_score,
+            colorCode: $color_code,
             incident_type: $incident_type
         }),
         (c:Claim {
@@ -60,7 +67,9 @@ def create_claim(current_user_email):
         (u)-[:HAS_CLAIMS]->(cm),
         (cm)-[:MANAGES]->(c),
         (c)-[:OCCURRED_ON]->(i)
-    RETURN c.id as claim_id, cm.id as management_id
+    SET """ + QUEUE_SCORING_SET + """
+    SET """ + CLAIM_FEATURES_SET + """
+    RETURN c.id as claim_id, cm.id as management_id, cm.scoringStatus as scoring_status
     """
 
     # Query to attach a claim to an existing ClaimManagement node
@@ -92,7 +101,9 @@ def create_claim(current_user_email):
         }),
         (cm)-[:MANAGES]->(c),
         (c)-[:OCCURRED_ON]->(i)
-    RETURN c.id as claim_id, cm.id as management_id
+    SET """ + QUEUE_SCORING_SET + """
+    SET """ + CLAIM_FEATURES_SET + """
+    RETURN c.id as claim_id, cm.id as management_id, cm.scoringStatus as scoring_status
     """
 
     params = {
@@ -119,6 +130,8 @@ def create_claim(current_user_email):
         'police_report': data['police_report_available'],
         'authorities_contacted': data['authorities_contacted'],
         'description': data['description'],
+        # Unscored until analyze_fraud_and_save stores the real values
+        **fraud_score_fields({})
     }
 
     try:
@@ -131,17 +144,59 @@ def create_claim(current_user_email):
         else:
             # Create new ClaimManagement node and attach claim
             result = neo4j.execute_query(create_query, params)
-
-        # Call fraud detection and analysis functions
-        predict_from_neo4j(customer_id=current_user_email)
-        analyze_fraud_and_save(result[0]['management_id'])
-
-        return jsonify({'claim_id': result[0]['claim_id']}), 201
+            if result:
+                record_stats_delta(claim_created_delta('In Progress'), neo4j)
+        if result:
+            record_feature_delta(current_user_email, claim_filed_delta(bool(existing_cm)), neo4j)
+
+        # Fraud detection runs on the scoring workers; poll /claims/<management_id>/scoring
+        scoring_queue.submit(result[0]['management_id'])
+
+        return jsonify({
+            'claim_id': result[0]['claim_id'],
+            'management_id': result[0]['management_id'],
+            'scoring_status': result[0]['scoring_status']
+        }), 201
     except Exception as e:
         print(f"Error occurred: {e}")
         return jsonify({'error': 'Failed to process the claim.'}), 500
 
 
+@claims_bp.route('/<management_id>/scoring', methods=['GET'])
+@token_required
+def get_scoring_status(current_user_email, management_id):
+    """
+    Fraud-scoring status of a submitted claim. Pass ?wait=<seconds> to hold the
+    request until this worker finishes the job (bounded by SCORING_MAX_WAIT).
+    """
+    try:
+        wait = float(request.args.get('wait', 0))
+    except ValueError:
+        return jsonify({'error': 'wait must be a number of seconds'}), 400
+    if wait > 0:
+        scoring_queue.wait(management_id, min(wait, Config.SCORING_MAX_WAIT))
+
+    query = """
+    MATCH (u:User {email: $email})-[:HAS_CLAIMS]->(cm:ClaimManagement {id: $management_id})
+    RETURN cm.scoringStatus as scoring_status,
+           cm.scoringError as scoring_error,
+           cm.scoringQueuedAt as queued_at,
+           cm.scoringFinishedAt as finished_at
+    """
+    result = neo4j.execute_query(query, {'email': current_user_email, 'management_id': management_id})
+    if not result:
+        return jsonify({'error': 'Claim not found'}), 404
+
+    record = result[0]
+    return jsonify({
+        'management_id': management_id,
+        'scoring_status': record['scoring_status'] or 'completed',
+        'scoring_error': record['scoring_error'],
+        'queued_at': record['queued_at'],
+        'finished_at': record['finished_at']
+    }), 200
+
+
 @claims_bp.route('/view', methods=['GET'])
 @token_required
 def get_claims(current_user_email):
@@ -256,6 +311,7 @@ def update_claim():
                 }
 
                 user_result = session.execute_query(create_user_query, user_data)
+                record_stats_delta({'total_users': 1}, neo4j)
             # Check if the user has a policy
             policy_check_query = """
             MATCH (u:User {email: $email})-[:INSURANCE]->(a:Application)
@@ -277,6 +333,9 @@ def update_claim():
                     id: $management_id,
                     status: 'In Progress',
                     last_updated: $created_date,
+                    created_ts: timestamp(),
+                    forgeryScore: $forgery_score,
+                    colorCode: $color_code,
                     incident_type: $incident_type
                 }),
                 (c:Claim {
@@ -305,6 +364,7 @@ def update_claim():
                 (u)-[:HAS_CLAIMS]->(cm),
                 (cm)-[:MANAGES]->(c),
                 (c)-[:OCCURRED_ON]->(i)
+            SET """ + CLAIM_FEATURES_SET + """
             RETURN c.id as claim_id, cm.id as management_id
             """
 
@@ -331,13 +391,16 @@ def update_claim():
                 'bodily_injuries': data.get('bodily_injuries', 'Unknown'),
                 'police_report': data.get('police_report', 'Unknown'),
                 'authorities_contacted': data.get('authorities_contacted', 'Unknown'),
-                'description': data.get('incident_description', 'Unknown')
+                'description': data.get('incident_description', 'Unknown'),
+                **fraud_score_fields({})
             }
 
             result = session.execute_query(query, params)
 
             if not result:
                 return jsonify({'error': 'Failed to create claim or link nodes'}), 500
+            record_stats_delta(claim_created_delta('In Progress'), neo4j)
+            record_feature_delta(email, claim_filed_delta(), neo4j)
 
             return jsonify({
                 'claim_id': result[0]['claim_id'],
@@ -0,0 +1,87 @@
+import base64
+import json
+from datetime import datetime, timezone
+from config import Config
+
+
+def encode_cursor(sort_key, item_id):
+    """Opaque keyset cursor for the last row of a page"""
+    raw = json.dumps([sort_key, item_id]).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii')
+
+
+def decode_cursor(cursor):
+    """Return (sort_key, id) from a cursor, or (None, None) when there is none"""
+    if not cursor:
+        return None, None
+    try:
+        sort_key, item_id = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+    except (ValueError, TypeError):
+        raise ValueError('Invalid cursor')
+    if isinstance(sort_key, bool) or not isinstance(sort_key, (int, float)):
+        raise ValueError('Invalid cursor')
+    return sort_key, str(item_id)
+
+
+def parse_limit(value):
+    """Page size from the query string, clamped to Config.ADMIN_MAX_PAGE_SIZE"""
+    if value is None:
+        return Config.ADMIN_PAGE_SIZE
+    try:
+        limit = int(value)
+    except ValueError:
+        raise ValueError('limit must be an integer')
+    if limit < 1:
+        raise ValueError('limit must be positive')
+    return min(limit, Config.ADMIN_MAX_PAGE_SIZE)
+
+
+def parse_date_ms(value, name):
+    """ISO date or datetime from the query string as epoch milliseconds (UTC unless given)"""
+    if not value:
+        return None
+    try:
+        parsed = datetime.fromisoformat(value)
+    except ValueError:
+        raise ValueError(f'{name} must be an ISO date')
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return int(parsed.timestamp() * 1000)
+
+
+def parse_bool(value):
+    return str(value).lower() in ('1', 'true', 'yes')
+
+
+# Sort key larger than any created_ts or forgery score, used when no cursor is given
+MAX_SORT_KEY = 2 ** 53 - 1
+
+
+class KeysetPage:
+    """
+    Follows records of one page as they stream past and builds the cursor for
+    the next page. Rows are counted per distinct id because OPTIONAL MATCHes can
+    return several rows for one paged node. id_field must be unique per node
+    (the list queries use elementId): ties on the sort key are broken by it, and
+    rows sharing a key and an id would be skipped or repeated across pages.
+    """
+
+    def __init__(self, limit, sort_field, id_field):
+        self.limit = limit
+        self.sort_field = sort_field
+        self.id_field = id_field
+        self.seen = 0
+        self.last_key = None
+
+    def track(self, records):
+        for record in records:
+            key = (record[self.sort_field], record[self.id_field])
+            if key != self.last_key:
+                self.seen += 1
+                self.last_key = key
+            yield record
+
+    def next_cursor(self):
+        if self.seen < self.limit or self.last_key is None:
+            return None
+        return encode_cursor(*self.last_key)
@@ -0,0 +1,86 @@
+import csv
+import io
+import json
+import zlib
+from flask import Response, current_app, stream_with_context
+
+
+def stream_json_page(items, trailer):
+    """
+    Stream a page as {"items": [...], ...trailer} where trailer() is called after
+    the last item has been sent, so it can report a cursor computed while streaming.
+    """
+    def generate():
+        dumps = current_app.json.dumps
+        yield '{"items":['
+        first = True
+        for item in items:
+            if not first:
+                yield ','
+            first = False
+            yield dumps(item)
+        yield ']'
+        for key, value in trailer().items():
+            yield f',{dumps(key)}:{dumps(value)}'
+        yield '}'
+
+    return Response(stream_with_context(generate()), mimetype='application/json')
+
+
+def _csv_value(value):
+    if value is None:
+        return ''
+    if isinstance(value, (list, dict)):
+        return json.dumps(value, default=str)
+    return value
+
+
+def _encode_rows(rows, columns, fmt, chunk_rows):
+    """Yield text chunks of NDJSON or CSV, chunk_rows records at a time"""
+    buffer = io.StringIO()
+    writer = None
+    if fmt == 'csv':
+        writer = csv.writer(buffer)
+        writer.writerow(columns)
+    pending = 0
+    for row in rows:
+        if writer:
+            writer.writerow([_csv_value(row.get(col)) for col in columns])
+        else:
+            buffer.write(json.dumps({col: row.get(col) for col in columns}, default=str))
+            buffer.write('\n')
+        pending += 1
+        if pending >= chunk_rows:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+            pending = 0
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def _gzip_chunks(chunks):
+    compressor = zlib.compressobj(wbits=31)  # gzip container
+    for chunk in chunks:
+        data = compressor.compress(chunk.encode('utf-8'))
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def stream_export(rows, columns, fmt, compress, filename, chunk_rows=500):
+    """
+    Stream dict rows as an NDJSON or CSV download, optionally gzipped on the fly.
+    Memory use is bounded by one chunk of rows whatever the size of the export.
+    """
+    chunks = _encode_rows(rows, columns, fmt, chunk_rows)
+    mimetype = 'text/csv' if fmt == 'csv' else 'application/x-ndjson'
+    filename = f"{filename}.{fmt}"
+    if compress:
+        chunks = _gzip_chunks(chunks)
+        mimetype = 'application/gzip'
+        filename += '.gz'
+
+    response = Response(stream_with_context(chunks), mimetype=mimetype)
+    response.headers['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
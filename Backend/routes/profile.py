@@ -4,6 +4,7 @@ import os
 import uuid
 from database.connection import Neo4jConnection
 from utils.auth import token_required
+from database.customer_features import apply_feature_delta, address_change_delta
 
 # Initialize Blueprint
 profile_bp = Blueprint('profile', __name__)
@@ -189,12 +190,16 @@ def update_address(current_user_email):
         with neo4j.get_session() as session:
             result = session.run("""
                 MATCH (u:User {email: $email})
+                WITH u, u.address AS old_address
                 SET u.address = $address
-                RETURN u
+                RETURN u, old_address
             """, email=current_user_email, address=data.get('address'))
+            record = result.single()
+            apply_feature_delta(session, current_user_email,
+                                address_change_delta(record['old_address'], data.get('address')))
             
             # Convert Neo4j node to dictionary and serialize DateTime fields
-            user_data = dict_from_node(result.single()['u'])
+            user_data = dict_from_node(record['u'])
             serialized_user = {k: serialize_neo4j_data(v) for k, v in user_data.items()}
             
             return jsonify({
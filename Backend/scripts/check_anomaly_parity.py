@@ -0,0 +1,142 @@
+import os
+import sys
+import time
+import argparse
+from itertools import islice
+from os.path import dirname
+
+# Add the Backend directory to Python path so we can import from database package
+backend_dir = dirname(dirname(__file__))
+sys.path.append(backend_dir)
+
+import joblib
+import numpy as np
+
+from utils.anomaly_features import (
+    ANOMALY_MODEL_PATH, ANOMALY_ARTIFACTS_PATH, CompiledPreprocessor, common_behaviors,
+    pandas_feature_frame
+)
+from utils.isolation_forest import load_anomaly_model
+from middleware.log_segments import DEFAULT_DIRECTORY, read_behavior_logs
+
+
+def _behavior_type(artifacts):
+    # Older artifacts map behavior_type; current ones don't use it at all
+    return next(iter(artifacts.get('behavior_type_map') or ['default']))
+
+
+def sample_events(artifacts):
+    """Hand-written events: known, unknown and missing-frequency behaviours, partial and string inputs"""
+    behavior_type = _behavior_type(artifacts)
+    common = sorted(common_behaviors(artifacts), key=str) or ['Other']
+    numeric = {
+        'inter_api_access_duration(sec)': 0.42, 'sequence_length(count)': 12,
+        'vsession_duration(min)': 3.5, 'num_sessions': 1, 'num_users': 1, 'num_unique_apis': 6,
+    }
+    events = [
+        dict(numeric, behavior=common[0], behavior_type=behavior_type),
+        dict(numeric, behavior='never-seen-agent', behavior_type='not-a-type',
+             api_access_uniqueness=0.5, ip_type_default=1, source_F=0),
+        dict(numeric, behavior='Other', behavior_type=behavior_type, ip_type_private_ip=1,
+             ip_type_google_bot=0, ip_type_default=0),
+        dict({k: str(v) for k, v in numeric.items()}, behavior=common[-1], behavior_type=behavior_type,
+             api_access_uniqueness='0.25'),
+        dict(numeric, behavior=common[len(common) // 2], behavior_type=behavior_type),
+        dict(numeric, behavior=common[0]),
+        dict({k: v * 1000 for k, v in numeric.items()}, behavior=common[0], behavior_type=behavior_type,
+             unrelated_field='ignored'),
+    ]
+    return events
+
+
+def logged_events(artifacts, limit):
+    """Behaviour-log windows as API events: the sample is already in feature_columns order"""
+    behavior_type = _behavior_type(artifacts)
+    events = []
+    for entry in islice(read_behavior_logs(), limit):
+        event = dict(zip(artifacts['feature_columns'], entry['sample']))
+        event.update(behavior='Other', behavior_type=behavior_type)
+        events.append(event)
+    return events
+
+
+def compare(model, artifacts, preprocessor, events, tolerance):
+    """Return (event index, max feature diff, score diff) for every mismatching event"""
+    mismatches = []
+    for index, event in enumerate(events):
+        expected = pandas_feature_frame(artifacts, dict(event)).values.astype(float)
+        actual = preprocessor.vectorize(dict(event))
+        feature_diff = float(np.nanmax(np.abs(expected - actual)))
+        same_nans = np.array_equal(np.isnan(expected), np.isnan(actual))
+        score_diff = abs(float(model.decision_function(expected)[0]) - float(model.decision_function(actual)[0]))
+        if not same_nans or feature_diff > tolerance or score_diff > tolerance:
+            mismatches.append((index, feature_diff, score_diff))
+
+    # The batch path must produce the same rows as scoring one event at a time
+    matrix, errors = preprocessor.vectorize_many([dict(event) for event in events])
+    singles = np.vstack([preprocessor.vectorize(dict(event)) for event in events])
+    if errors or matrix.shape != singles.shape:
+        mismatches.append(('batch', float('nan'), float('nan')))
+    else:
+        batch_diff = float(np.max(np.abs(model.decision_function(matrix) - model.decision_function(singles))))
+        if batch_diff > tolerance:
+            mismatches.append(('batch', float(np.max(np.abs(matrix - singles))), batch_diff))
+    return mismatches
+
+
+def _time(fn, events, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for event in events:
+            fn(dict(event))
+    return (time.perf_counter() - start) / (repeat * len(events))
+
+
+def benchmark(model, artifacts, preprocessor, events, repeat):
+    pandas_path = _time(lambda e: pandas_feature_frame(artifacts, e), events, repeat)
+    compiled = _time(preprocessor.vectorize, events, repeat)
+    scoring = _time(lambda e: model.decision_function(preprocessor.vectorize(e)), events, repeat)
+    print(f"DataFrame preprocessing: {pandas_path * 1e6:.1f} us/event")
+    print(f"Compiled preprocessing:  {compiled * 1e6:.1f} us/event")
+    print(f"Compiled + decision_function: {scoring * 1e6:.1f} us/event")
+
+    start = time.perf_counter()
+    for _ in range(repeat):
+        features, _ = preprocessor.vectorize_many(events)
+        model.decision_function(features)
+    batch = (time.perf_counter() - start) / (repeat * len(events))
+    print(f"Batch of {len(events)} (one decision_function call): {batch * 1e6:.1f} us/event")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Check that the compiled anomaly preprocessor (single and batch) matches the DataFrame pipeline"
+    )
+    parser.add_argument('--from-log', type=int, default=0, metavar='N',
+                        help="also compare the first N logged behaviour windows")
+    parser.add_argument('--tolerance', type=float, default=1e-9)
+    parser.add_argument('--benchmark', type=int, default=0, metavar='REPEAT',
+                        help="time both pipelines over the events REPEAT times")
+    args = parser.parse_args()
+
+    model = load_anomaly_model(ANOMALY_MODEL_PATH)
+    artifacts = joblib.load(ANOMALY_ARTIFACTS_PATH)
+    preprocessor = CompiledPreprocessor(artifacts)
+
+    events = sample_events(artifacts)
+    if args.from_log and os.path.isdir(DEFAULT_DIRECTORY):
+        events += logged_events(artifacts, args.from_log)
+
+    mismatches = compare(model, artifacts, preprocessor, events, args.tolerance)
+    for index, feature_diff, score_diff in mismatches:
+        print(f"event {index}: max |feature diff| = {feature_diff:.2e}, |score diff| = {score_diff:.2e}")
+    print(f"{len(events)} events, {len(mismatches)} mismatching")
+
+    if args.benchmark:
+        benchmark(model, artifacts, preprocessor, events, args.benchmark)
+
+    if mismatches:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+import sys
+import math
+import time
+import argparse
+from itertools import islice
+from os.path import dirname
+
+# Add the Backend directory to Python path so we can import from database package
+backend_dir = dirname(dirname(__file__))
+sys.path.append(backend_dir)
+
+from utils.detector import PREDICTION_COLUMNS, transform_neo4j_data_for_model
+from utils.features import build_feature_frame, feature_values, CATEGORICAL_SOURCES
+
+# Hand-written records covering the formats and gaps the per-record transform handles
+SAMPLE_RECORDS = [
+    {},
+    {
+        "date": "2025-01-26", "last_updated": "2025-02-03 10:15:00", "created_at": "2024-06-01T08:00:00",
+        "make": "Tata", "location": "MG Road", "sex": "Male", "claim_type": "Theft",
+        "dob": "15/09/1986", "idv": 280000, "total_insurance_amount": 1800000, "ncb": 15,
+        "year": 2021, "police_report": "Yes", "witnesses": 3, "pastClaims": 2
+    },
+    {
+        "date": "2024-12-31", "last_updated": "2025-01-01T00:00:00", "created_at": "2024-12-30",
+        "make": "Honda", "location": "FC Road", "claim_type": "Single Vehicle Collision",
+        "dob": "1990", "idv": "350000.50", "ncb": "20", "total_insurance_amount": "1000000",
+        "year": "2019", "police_report": " yes ", "witnesses": "2", "repNumber": 7, "driverRating": 3
+    },
+    {
+        "date": "not a date", "last_updated": "", "dob": "03-04-2003", "idv": None,
+        "year": "", "police_report": None, "witnesses": None, "make": None
+    },
+    {
+        "date": "2025-03-15", "created_at": "2025-03-01", "location": "Unmapped Street",
+        "ncb": "abc", "total_insurance_amount": 500000, "year": 0, "witnesses": 2.9,
+        "numberOfSupplements": 1, "addressChangeClaim": 1, "numberOfCars": 2
+    },
+    # No created_at or last_updated at all: those columns are entirely missing
+    {
+        "date": "2025-01-01", "make": "Maruti", "sex": "Female", "dob": "01/01/1995",
+        "idv": 450000, "year": 2020, "police_report": "No", "witnesses": 0
+    },
+]
+
+
+def _same(expected, actual):
+    if isinstance(expected, float) and math.isnan(expected):
+        return isinstance(actual, float) and math.isnan(actual)
+    try:
+        return float(expected) == float(actual)
+    except (TypeError, ValueError):
+        return expected == actual
+
+
+def _as_api_record(record):
+    """Stored claims hold neo4j Date/DateTime values; the API path writes ISO strings"""
+    return {k: v.iso_format() if hasattr(v, "iso_format") else v for k, v in record.items()}
+
+
+def compare(records):
+    """
+    Return (column, record index, per-record value, vectorized value) for every
+    mismatch between transform_neo4j_data_for_model and feature_values, which
+    compute the same inputs before they are labelled for the model
+    """
+    frame = feature_values(records)
+    mismatches = []
+    for index, record in enumerate(records):
+        expected = transform_neo4j_data_for_model(record)
+        for column in PREDICTION_COLUMNS:
+            actual = frame[column].iloc[index]
+            if isinstance(actual, float) and math.isnan(actual):
+                # Values outside the vocabulary are missing by design, and
+                # feature_values leaves unknown numbers NaN where the per-record
+                # transform writes 0
+                if column in CATEGORICAL_SOURCES or _same(expected.get(column, 0), 0):
+                    continue
+            if column in CATEGORICAL_SOURCES:
+                want = expected.get(column)
+                want = "Unknown" if want is None else str(want)
+                if want != actual:
+                    mismatches.append((column, index, want, actual))
+            elif not _same(expected.get(column, 0), actual):
+                mismatches.append((column, index, expected.get(column), actual))
+    return mismatches
+
+
+def benchmark(records, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for record in records:
+            transform_neo4j_data_for_model(record)
+    per_record = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for _ in range(repeat):
+        build_feature_frame(records, PREDICTION_COLUMNS)
+    vectorized = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for record in records:
+            build_feature_frame([record], PREDICTION_COLUMNS)
+    single = time.perf_counter() - start
+
+    count = len(records) * repeat
+    print(f"Per-record transform: {per_record / count * 1e6:.1f} us/claim")
+    print(f"Vectorized pipeline:  {vectorized / count * 1e6:.1f} us/claim "
+          f"({len(records)} claims per batch)")
+    print(f"One claim per batch:  {single / count * 1e6:.1f} us/claim")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Check that the vectorized feature pipeline matches transform_neo4j_data_for_model"
+    )
+    parser.add_argument('--from-neo4j', type=int, default=0, metavar='N',
+                        help="also compare the first N stored claims")
+    parser.add_argument('--benchmark', type=int, default=0, metavar='REPEAT',
+                        help="time both pipelines over the sample REPEAT times")
+    args = parser.parse_args()
+
+    records = list(SAMPLE_RECORDS)
+    if args.from_neo4j:
+        from database.connection import close_driver
+        from utils.batch_scoring import iter_claim_records
+        try:
+            records += [_as_api_record(r) for r in islice(iter_claim_records(), args.from_neo4j)]
+        finally:
+            close_driver()
+
+    mismatches = compare(records)
+    for column, index, expected, actual in mismatches:
+        print(f"record {index} {column}: per-record={expected!r} vectorized={actual!r}")
+    print(f"{len(records)} records, {len(mismatches)} mismatching features")
+
+    if args.benchmark:
+        benchmark(records, args.benchmark)
+
+    if mismatches:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+import os
+import sys
+import time
+import argparse
+from os.path import dirname
+
+# Add the Backend directory to Python path so we can import from database package
+backend_dir = dirname(dirname(__file__))
+sys.path.append(backend_dir)
+
+import joblib
+import numpy as np
+
+from utils.anomaly_features import PICKLED_ANOMALY_MODEL_PATH, FLAT_ANOMALY_MODEL_PATH
+from utils.isolation_forest import FlatIsolationForest
+
+BATCH_SIZES = [1, 10, 100, 1000, 2000, 5000, 10000]
+
+
+def export(pickle_path, output_path):
+    flat = FlatIsolationForest.from_sklearn(joblib.load(pickle_path))
+    flat.save(output_path)
+    print(f"Exported {pickle_path} ({os.path.getsize(pickle_path) / 1024:.0f} KB) to {output_path} "
+          f"({os.path.getsize(output_path) / 1024:.0f} KB): {len(flat.roots)} trees, "
+          f"{len(flat.feature)} nodes, max depth {flat.max_depth}")
+
+
+def sample_matrix(flat, rows, seed=0):
+    """
+    Synthetic scaled feature rows: a wide random spread, plus rows that sit exactly
+    on split thresholds so both sides of the <= comparison are exercised
+    """
+    rng = np.random.default_rng(seed)
+    matrix = rng.normal(0, 3, (rows, flat.n_features))
+    matrix[rows // 2:] = rng.uniform(-20, 50, (rows - rows // 2, flat.n_features))
+    splits = np.flatnonzero(np.isfinite(flat.threshold))
+    on_split = rng.choice(splits, rows // 4)
+    matrix[np.arange(len(on_split)), flat.feature[on_split]] = flat.threshold[on_split]
+    return matrix
+
+
+def check_parity(reference, flat, matrix, tolerance):
+    expected = reference.decision_function(matrix)
+    actual = flat.decision_function(matrix)
+    max_diff = float(np.max(np.abs(expected - actual)))
+    label_mismatches = int(np.sum(reference.predict(matrix) != flat.predict(matrix)))
+    print(f"Parity on {len(matrix)} rows: max |score diff| = {max_diff:.2e}, "
+          f"{label_mismatches} label mismatches")
+    return max_diff <= tolerance and label_mismatches == 0
+
+
+def _time(fn, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat
+
+
+def benchmark(models, matrix):
+    for size in BATCH_SIZES:
+        batch = matrix[:size]
+        if len(batch) < size:
+            batch = np.resize(matrix, (size, matrix.shape[1]))
+        repeat = max(3, 2000 // size)
+        timings = ", ".join(
+            f"{name} {_time(lambda: model.decision_function(batch), repeat) * 1e3:.3f} ms"
+            for name, model in models.items()
+        )
+        print(f"batch {size:>5}: {timings}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export the anomaly IsolationForest to flat NumPy arrays")
+    parser.add_argument('--pickle', default=PICKLED_ANOMALY_MODEL_PATH)
+    parser.add_argument('--output', default=FLAT_ANOMALY_MODEL_PATH)
+    parser.add_argument('--rows', type=int, default=10000, help="synthetic rows for the parity check")
+    parser.add_argument('--tolerance', type=float, default=1e-9)
+    parser.add_argument('--benchmark', action='store_true', help="time batch sizes 1 through 10k")
+    parser.add_argument('--skip-export', action='store_true', help="only check an existing export")
+    args = parser.parse_args()
+
+    if not args.skip_export:
+        export(args.pickle, args.output)
+
+    reference = joblib.load(args.pickle)
+    flat = FlatIsolationForest.load(args.output)
+    matrix = sample_matrix(flat, args.rows)
+
+    ok = check_parity(reference, flat, matrix, args.tolerance)
+    if args.benchmark:
+        benchmark({'sklearn': reference, 'flat': flat}, matrix)
+
+    if not ok:
+        print("Flat model does not match the pickled model; do not deploy it.")
+        sys.exit(1)
+    print(f"Set ANOMALY_MODEL_PATH={args.output} to score with the flat model.")
+
+if __name__ == "__main__":
+    main()
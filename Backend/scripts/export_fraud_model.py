@@ -0,0 +1,107 @@
+import os
+import sys
+import time
+import argparse
+from os.path import dirname
+
+# Add the Backend directory to Python path so we can import from database package
+backend_dir = dirname(dirname(__file__))
+sys.path.append(backend_dir)
+
+import joblib
+import numpy as np
+import pandas as pd
+
+from utils.detector import (
+    PICKLED_MODEL_PATH, NATIVE_MODEL_PATH, PREDICTION_COLUMNS, NativeBoosterModel
+)
+from utils.features import get_vocabulary
+
+# Ranges the synthetic sample draws the numeric features from
+NUMERIC_RANGES = {
+    'WeekOfMonth': (0, 6), 'WeekOfMonthClaimed': (0, 6), 'Age': (0, 80), 'RepNumber': (0, 17),
+    'Deductible': (0, 500000), 'DriverRating': (0, 5), 'Year': (2000, 2027),
+}
+
+
+def best_estimator(model):
+    """The fitted XGBClassifier, unwrapped if the pickle is a search object"""
+    return getattr(model, 'best_estimator_', model)
+
+
+def export(pickle_path, output_path):
+    estimator = best_estimator(joblib.load(pickle_path))
+    estimator.get_booster().save_model(output_path)
+    print(f"Exported {pickle_path} ({os.path.getsize(pickle_path) / 1024:.0f} KB) "
+          f"to {output_path} ({os.path.getsize(output_path) / 1024:.0f} KB)")
+
+
+def sample_frame(rows, seed=0):
+    """Synthetic feature rows covering every category in the vocabulary"""
+    rng = np.random.default_rng(seed)
+    vocabulary = get_vocabulary()
+    frame = pd.DataFrame(index=range(rows))
+    for column in PREDICTION_COLUMNS:
+        if column in vocabulary:
+            categories = vocabulary[column]
+            frame[column] = pd.Categorical(rng.choice(categories, rows), categories=categories)
+        else:
+            low, high = NUMERIC_RANGES.get(column, (0, 10))
+            frame[column] = rng.integers(low, high, rows).astype(float)
+    return frame
+
+
+def check_parity(reference, native, frame, tolerance):
+    expected = reference.predict_proba(frame)[:, 1]
+    actual = native.predict_proba(frame)[:, 1]
+    max_diff = float(np.max(np.abs(expected - actual)))
+    label_mismatches = int(np.sum(reference.predict(frame) != native.predict(frame)))
+    print(f"Parity on {len(frame)} rows: max |probability diff| = {max_diff:.2e}, "
+          f"{label_mismatches} label mismatches")
+    return max_diff <= tolerance and label_mismatches == 0
+
+
+def _time(fn, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat
+
+
+def benchmark(models, frame, single_rows):
+    singles = [frame.iloc[[i]] for i in range(min(single_rows, len(frame)))]
+    for name, model in models.items():
+        per_row = _time(lambda: [model.predict_proba(row) for row in singles], 3) / len(singles)
+        batch = _time(lambda: model.predict_proba(frame), 3)
+        print(f"{name:>8}: {per_row * 1e3:.3f} ms per single-row call, "
+              f"{batch * 1e3:.1f} ms per {len(frame)}-row batch ({batch / len(frame) * 1e6:.1f} us/row)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export the fraud model as a native XGBoost booster")
+    parser.add_argument('--pickle', default=PICKLED_MODEL_PATH)
+    parser.add_argument('--output', default=NATIVE_MODEL_PATH)
+    parser.add_argument('--rows', type=int, default=5000, help="synthetic rows for the parity check")
+    parser.add_argument('--tolerance', type=float, default=1e-6)
+    parser.add_argument('--benchmark', action='store_true', help="time single-row and batch scoring")
+    parser.add_argument('--skip-export', action='store_true', help="only check an existing export")
+    args = parser.parse_args()
+
+    if not args.skip_export:
+        export(args.pickle, args.output)
+
+    reference = best_estimator(joblib.load(args.pickle))
+    native = NativeBoosterModel(args.output)
+    frame = sample_frame(args.rows)
+
+    ok = check_parity(reference, native, frame, args.tolerance)
+    if args.benchmark:
+        benchmark({'pickle': reference, 'native': native}, frame, single_rows=200)
+
+    if not ok:
+        print("Native model does not match the pickled model; do not deploy it.")
+        sys.exit(1)
+    print(f"Set FRAUD_MODEL_PATH={args.output} to score with the native model.")
+
+if __name__ == "__main__":
+    main()
@@ -7,12 +7,19 @@ from os.path import dirname
 import secrets
 import string
 import bcrypt
+import json
+import time
+import argparse
 
 # Add the Backend directory to Python path so we can import from database package
 backend_dir = dirname(dirname(__file__))
 sys.path.append(backend_dir)
 
-from database.connection import Neo4jConnection
+from database.connection import Neo4jConnection, close_driver
+from config import Config
+from database.stats import recount_stats
+from database.customer_features import rebuild_customer_features
+from utils.fraud_score import fraud_score_fields
 
 def generate_strong_password():
     # Define character sets for password
@@ -79,279 +86,308 @@ def load_data():
     csv_path = Path(__file__).resolve().parent / 'Data.csv'
     return pd.read_csv(csv_path)
 
-def insert_data(neo4j_connection, data):
-    for _, row in data.iterrows():
-        # Generate and encrypt password for each user
-        password = generate_strong_password()
-        password_hash = encrypt_password(password)
-        
-        # Print the generated password (in real system, would be sent to user securely)
-        print(f"Generated password for {row['email']}: {password}")
-        
-        # Format dates for Neo4j using ISO format strings
-        created_at = datetime.strptime(row['created_at'], '%Y-%m-%dT%H:%M:%S').strftime('%Y-%m-%dT%H:%M:%S')
-        dob = convert_date_format(row['dob'])
-        
-        # Handle incident date and time
-        if pd.notna(row['incident_date']):
-            incident_date = convert_date_format(row['incident_date'])
-            incident_time = row['incident_time']
-            incident_datetime = datetime.strptime(f"{incident_date} {incident_time}", '%Y-%m-%d %H:%M')
-            last_updated = incident_datetime.strftime('%Y-%m-%dT%H:%M:%S')
-        else:
-            incident_date = None
-            incident_time = None
-            last_updated = created_at
-        vehicle_insurance_ids = {}
-        vehicle_type = row['vehicle_type'].lower()
-        if vehicle_type not in vehicle_insurance_ids:
-            vehicle_insurance_ids[vehicle_type] = str(uuid.uuid4())
-
-        # Create User node with basic information
-        create_user = """
-        MERGE (u:User {email: $email})
-        SET u.name = $name,
-            u.mobile = $mobile,
-            u.customerId = $customer_id,
-            u.address = $address,
-            u.created_at = datetime($created_at),
-            u.password_hash = $password_hash
-        """
-        
-        # Create OtherDetails node and link to User
-        create_other_details = """
-        MATCH (u:User {email: $email})
-        CREATE (od:OtherDetails)
-        SET od.dob = date($dob),
-            od.education_level = $education_level,
-            od.hobbies = $hobbies,
-            od.occupation = $occupation,
-            od.relationship = $relationship,
-            od.sex = $sex
-        CREATE (u)-[:HAS_DETAILS]->(od)
-        """
-
-        # Parse addons from CSV
-        try:
-            import json
-            addons_list = json.loads(row['addons']) if pd.notna(row['addons']) else []
-        except (json.JSONDecodeError, TypeError):
-            addons_list = []
-
-        # Create Application node and link to User
-        create_application = """
-        MATCH (u:User {email: $email})
-        CREATE (a:Application {
-            addons: $addons,
-            address: $app_address,
-            applicant_name: $applicant_name,
-            application_id: $application_id,
-            city: $app_city,
-            created_at: datetime($app_created_at),
-            email: $email,
-            idv: $idv,
-            mobile: $app_mobile,
-            make: $make,
-            model: $model,
-            ncb: $ncb,
-            policy_annual_premium: $policy_annual_premium,
-            policy_csl: $policy_csl,
-            registration_number: $registration_number,
-            state: $app_state,
-            status: $status,
-            total_insurance_amount: $total_insurance_amount,
-            umbrella_limit: $umbrella_limit,
-            updated_at: datetime($app_updated_at),
-            year: $year
-        })
-        WITH a, u
-        MERGE (vt:VehicleType { type: $vehicle_type })
-        ON CREATE SET vt.created_at = datetime($app_created_at)
-        CREATE (a)-[:FOR_VEHICLE_TYPE]->(vt)
-        MERGE (vi:VehicleInsurance { id: $vehicle_insurance_id })
-        ON CREATE SET vi.type = $vehicle_type
-        CREATE (vt)-[:HAS_INSURANCE]->(vi)
-        CREATE (u)-[:INSURANCE]->(a)
-        """
-
-        # Create BankingDetails node and link to User
-        create_banking_details = """
-        MATCH (u:User {email: $email})
-        CREATE (bd:BankingDetails {
-            aadharNumber: $aadhar_number,
-            accountNumber: $account_number,
-            ifscCode: $ifsc_code,
-            panNumber: $pan_number
-        })
-        CREATE (u)-[:HAS_BANKING_DETAILS]->(bd)
-        """
-        
-        # Create ClaimManagement node and link to User
-        create_claim_management = """
-        MATCH (u:User {email: $email})
-        CREATE (cm:ClaimManagement {
-            id: $management_id,
-            claim_type: $claim_type,
-            status: 'Pending',
-            last_updated: datetime($last_updated),
-            fraudPrediction: $fraud_prediction,
-            fraudProbability: $fraud_probability,
-            fraudReason: $fraud_reason
-        })
-        CREATE (u)-[:HAS_CLAIMS]->(cm)
-        """
-        
-        # Create Claim node and link to ClaimManagement
-        create_claim = """
-        MATCH (cm:ClaimManagement {id: $management_id})
-        CREATE (c:Claim {
-            id: $claim_id,
-            type: $claim_type,
-            severity: $claim_severity,
-            total_amount: $total_amount,
-            vehicle_amount: $vehicle_amount,
-            property_amount: $property_amount,
-            injury_amount: $injury_amount
-        })
-        CREATE (cm)-[:MANAGES]->(c)
-        """
-        
-        # Create Customer node and link to Claim
-        create_customer = """
-        MATCH (c:Claim {id: $claim_id})
-        CREATE (cust:Customer {id: $customer_node_id})
-        CREATE (c)-[:FILED_BY]->(cust)
-        """
-        
-        # Create Incident node and link to Claim and Customer
-        create_incident = """
-        MATCH (c:Claim {id: $claim_id})
-        MATCH (cust:Customer {id: $customer_node_id})
-        CREATE (i:Incident {
-            id: $incident_id,
-            city: $incident_city,
-            location: $incident_location,
-            date: date($incident_date),
-            time: $incident_time,
-            vehicles_involved: $vehicles_involved,
-            witnesses: $witnesses,
-            police_report: $police_report,
-            bodily_injuries: CASE WHEN $injury_amount > 0 THEN 'Yes' ELSE 'No' END,
-            property_damage: CASE WHEN $property_amount > 0 THEN 'Yes' ELSE 'No' END
-        })
-        CREATE (c)-[:OCCURRED_ON]->(i)
-        CREATE (cust)-[:INVOLVED_IN]->(i)
-        """
+# Policy side of a CSV row: User, OtherDetails, Application and BankingDetails
+INSERT_POLICY_QUERY = """
+UNWIND $rows AS row
+MERGE (u:User {email: row.email})
+SET u.name = row.name,
+    u.mobile = row.mobile,
+    u.customerId = row.customer_id,
+    u.address = row.address,
+    u.created_at = datetime(row.created_at),
+    u.password_hash = row.password_hash
+CREATE (od:OtherDetails)
+SET od.dob = date(row.dob),
+    od.education_level = row.education_level,
+    od.hobbies = row.hobbies,
+    od.occupation = row.occupation,
+    od.relationship = row.relationship,
+    od.sex = row.sex
+CREATE (u)-[:HAS_DETAILS]->(od)
+CREATE (a:Application {
+    addons: row.addons,
+    address: row.address,
+    applicant_name: row.name,
+    application_id: row.application_id,
+    city: row.app_city,
+    created_at: datetime(row.created_at),
+    created_ts: datetime(row.created_at).epochMillis,
+    email: row.email,
+    idv: row.idv,
+    mobile: row.mobile,
+    make: row.make,
+    model: row.model,
+    ncb: row.ncb,
+    policy_annual_premium: row.policy_annual_premium,
+    policy_csl: row.policy_csl,
+    registration_number: row.registration_number,
+    state: row.app_state,
+    status: 'PENDING',
+    total_insurance_amount: row.total_insurance_amount,
+    umbrella_limit: row.umbrella_limit,
+    updated_at: datetime(row.created_at),
+    year: row.year
+})
+WITH u, a, row
+MATCH (vt:VehicleType { type: row.vehicle_type })
+CREATE (a)-[:FOR_VEHICLE_TYPE]->(vt)
+MERGE (vi:VehicleInsurance { id: row.vehicle_insurance_id })
+ON CREATE SET vi.type = row.vehicle_type
+CREATE (vt)-[:HAS_INSURANCE]->(vi)
+CREATE (u)-[:INSURANCE]->(a)
+CREATE (bd:BankingDetails {
+    aadharNumber: row.aadhar_number,
+    accountNumber: row.account_number,
+    ifscCode: row.ifsc_code,
+    panNumber: row.pan_number
+})
+CREATE (u)-[:HAS_BANKING_DETAILS]->(bd)
+"""
+
+# Vehicle types are created once before the parallel batches: concurrent MERGEs
+# on a label without a uniqueness constraint can each create the same node
+CREATE_VEHICLE_TYPES_QUERY = """
+UNWIND $types AS type
+MERGE (vt:VehicleType { type: type.type })
+ON CREATE SET vt.created_at = datetime(type.created_at)
+"""
+
+# Claim side of a CSV row: ClaimManagement, Claim, Customer and Incident
+INSERT_CLAIM_QUERY = """
+UNWIND $rows AS row
+WITH row WHERE row.claim_id IS NOT NULL
+MATCH (u:User {email: row.email})
+CREATE (cm:ClaimManagement {
+    id: row.management_id,
+    claim_type: row.claim_type,
+    status: 'Pending',
+    last_updated: datetime(row.last_updated),
+    created_ts: datetime(row.last_updated).epochMillis,
+    fraudPrediction: row.fraud_prediction,
+    fraudProbability: row.fraud_probability,
+    fraudReason: row.fraud_reason,
+    forgeryScore: row.forgery_score,
+    colorCode: row.color_code
+})
+CREATE (u)-[:HAS_CLAIMS]->(cm)
+CREATE (c:Claim {
+    id: row.claim_id,
+    type: row.claim_type,
+    severity: row.claim_severity,
+    total_amount: row.total_amount,
+    vehicle_amount: row.vehicle_amount,
+    property_amount: row.property_amount,
+    injury_amount: row.injury_amount
+})
+CREATE (cm)-[:MANAGES]->(c)
+CREATE (cust:Customer {id: row.customer_node_id})
+CREATE (c)-[:FILED_BY]->(cust)
+CREATE (i:Incident {
+    id: row.incident_id,
+    city: row.incident_city,
+    location: row.incident_location,
+    date: date(row.incident_date),
+    time: row.incident_time,
+    vehicles_involved: row.vehicles_involved,
+    witnesses: row.witnesses,
+    police_report: row.police_report,
+    bodily_injuries: CASE WHEN row.injury_amount > 0 THEN 'Yes' ELSE 'No' END,
+    property_damage: CASE WHEN row.property_amount > 0 THEN 'Yes' ELSE 'No' END
+})
+CREATE (c)-[:OCCURRED_ON]->(i)
+CREATE (cust)-[:INVOLVED_IN]->(i)
+"""
+
+CHECKPOINT_PATH = Path(__file__).resolve().parent / '.insert_checkpoint.json'
+
+def build_row_params(row):
+    """
+    Turn one CSV row into the parameter map used by the UNWIND queries. The
+    password is hashed later, by hash_passwords in the batch's worker thread.
+    """
+    # Generate a password for each user
+    password = generate_strong_password()
+
+    # Print the generated password (in real system, would be sent to user securely)
+    print(f"Generated password for {row['email']}: {password}")
+
+    # Format dates for Neo4j using ISO format strings
+    created_at = datetime.strptime(row['created_at'], '%Y-%m-%dT%H:%M:%S').strftime('%Y-%m-%dT%H:%M:%S')
+    dob = convert_date_format(row['dob'])
+
+    # Handle incident date and time
+    if pd.notna(row['incident_date']):
+        incident_date = convert_date_format(row['incident_date'])
+        incident_time = row['incident_time']
+        incident_datetime = datetime.strptime(f"{incident_date} {incident_time}", '%Y-%m-%d %H:%M')
+        last_updated = incident_datetime.strftime('%Y-%m-%dT%H:%M:%S')
+    else:
+        incident_date = None
+        incident_time = None
+        last_updated = created_at
+
+    # Parse addons from CSV
+    try:
+        addons_list = json.loads(row['addons']) if pd.notna(row['addons']) else []
+    except (json.JSONDecodeError, TypeError):
+        addons_list = []
+
+    params = {
+        'email': row['email'],
+        'name': row['name'],
+        'mobile': row['mobile'],
+        'customer_id': row['customer_id'],
+        'address': row['address'],
+        'created_at': created_at,
+        'password': password,
+        # OtherDetails
+        'dob': dob,
+        'education_level': row['education_level'],
+        'hobbies': row['hobbies'],
+        'occupation': row['occupation'],
+        'relationship': row['relationship'],
+        'sex': row['sex'],
+        # Application
+        'addons': addons_list,
+        # The timestamp alone repeats for every row built in the same second
+        'application_id': f"APP{datetime.now().strftime('%Y%m%d%H%M%S')}{uuid.uuid4().hex[:8].upper()}",
+        'app_city': row['insurance_city'],
+        'idv': float(row['idv']),
+        'make': row['vehicle_make'],
+        'model': row['vehicle_model'],
+        'ncb': float(row['ncb']),
+        'policy_annual_premium': float(row['policy_annual_premium']),
+        'policy_csl': float(row['policy_csl']),
+        'registration_number': f"MH12{uuid.uuid4().hex[:4].upper()}",
+        'app_state': row['insurance_state'],
+        'total_insurance_amount': float(row['total_insurance_amount']),
+        'umbrella_limit': float(row['umbrella_limit']),
+        'year': int(row['year']),
+        'vehicle_type': row['vehicle_type'].lower(),
+        'vehicle_insurance_id': str(uuid.uuid4()),
+        # BankingDetails
+        'aadhar_number': str(row['aadhar_number']),
+        'account_number': str(row['account_number']),
+        'ifsc_code': row['ifsc_code'],
+        'pan_number': str(row['pan_number']),
+        # Claim side is skipped by INSERT_CLAIM_QUERY when claim_id is null
+        'claim_id': None
+    }
 
-        # Generate IDs
+    if pd.notna(row['claim_type']):
         claim_id = str(uuid.uuid4())
-        management_id = f"management_{row['email']}"
-        customer_node_id = f"customer_{row['email']}"
-        incident_id = f"incident_{claim_id}"
-        
-        # Execute the Cypher queries using execute_query method
-        neo4j_connection.execute_query(create_user, {
-            'email': row['email'],
-            'name': row['name'],
-            'mobile': row['mobile'],
-            'customer_id': row['customer_id'],
-            'address': row['address'],
-            'created_at': created_at,
-            'password_hash': password_hash
+        params.update({
+            'claim_id': claim_id,
+            'management_id': f"management_{row['email']}",
+            'customer_node_id': f"customer_{row['email']}",
+            'incident_id': f"incident_{claim_id}",
+            'claim_type': row['claim_type'],
+            'last_updated': last_updated,
+            'fraud_prediction': int(row['fraudPrediction']),
+            'fraud_probability': float(row['fraud_probability']),
+            'fraud_reason': row['fraudReason'],
+            'claim_severity': row['claim_severity'],
+            'total_amount': float(row['total_amount']),
+            'vehicle_amount': float(row['vehicle_amount']),
+            'property_amount': float(row['property_amount']),
+            'injury_amount': float(row['injury_amount']),
+            'incident_city': row['incident_city'],
+            'incident_location': row['incident_location'],
+            'incident_date': incident_date,
+            'incident_time': incident_time,
+            'vehicles_involved': int(row['vehicles_involved']),
+            'witnesses': int(row['witnesses']),
+            'police_report': row['police_report'] == 'Yes'
         })
+        params.update(fraud_score_fields({
+            'fraudPrediction': params['fraud_prediction'],
+            'fraudProbability': params['fraud_probability'],
+            'fraudReason': params['fraud_reason']
+        }))
 
-        # Execute OtherDetails creation
-        neo4j_connection.execute_query(create_other_details, {
-            'email': row['email'],
-            'dob': dob,
-            'education_level': row['education_level'],
-            'hobbies': row['hobbies'],
-            'occupation': row['occupation'],
-            'relationship': row['relationship'],
-            'sex': row['sex']
-        })
+    return params
 
-        # Execute Application creation
-        neo4j_connection.execute_query(create_application, {
-            'email': row['email'],
-            'addons': addons_list,
-            'app_address': row['address'],
-            'applicant_name': row['name'],
-            'application_id': f"APP{datetime.now().strftime('%Y%m%d%H%M%S')}",
-            'app_city': row['insurance_city'],
-            'app_created_at': created_at,
-            'idv': float(row['idv']),
-            'app_mobile': row['mobile'],
-            'make': row['vehicle_make'],
-            'model': row['vehicle_model'],
-            'ncb': float(row['ncb']),
-            'policy_annual_premium': float(row['policy_annual_premium']),
-            'policy_csl': float(row['policy_csl']),
-            'registration_number': f"MH12{uuid.uuid4().hex[:4].upper()}",
-            'app_state': row['insurance_state'],
-            'status': 'PENDING',
-            'total_insurance_amount': float(row['total_insurance_amount']),
-            'umbrella_limit': float(row['umbrella_limit']),
-            'app_updated_at': created_at,
-            'vehicle_type': row['vehicle_type'].lower(),
-            'year': int(row['year']),
-            'vehicle_type': vehicle_type,
-            'vehicle_insurance_id': vehicle_insurance_ids[vehicle_type]
-        })
+def hash_passwords(batch):
+    """Replace each row's plaintext password with its bcrypt hash (bcrypt releases the GIL)"""
+    for row in batch:
+        row['password_hash'] = encrypt_password(row.pop('password'))
 
-        # Execute BankingDetails creation
-        neo4j_connection.execute_query(create_banking_details, {
-            'email': row['email'],
-            'aadhar_number': str(row['aadhar_number']),
-            'account_number': str(row['account_number']),
-            'ifsc_code': row['ifsc_code'],
-            'pan_number': str(row['pan_number'])
-        })
+def create_vehicle_types(neo4j_connection, rows):
+    """MERGE every vehicle type the rows reference, dated by its earliest row"""
+    earliest = {}
+    for row in rows:
+        if row is not None:
+            vehicle_type = row['vehicle_type']
+            earliest[vehicle_type] = min(earliest.get(vehicle_type, row['created_at']), row['created_at'])
+    types = [{'type': vehicle_type, 'created_at': created_at} for vehicle_type, created_at in earliest.items()]
+    neo4j_connection.execute_query(CREATE_VEHICLE_TYPES_QUERY, {'types': types})
+
+def load_checkpoint(batch_size):
+    """Return the batch indices committed by an earlier run with the same batch size"""
+    if not CHECKPOINT_PATH.exists():
+        return set()
+    with open(CHECKPOINT_PATH) as f:
+        checkpoint = json.load(f)
+    if checkpoint.get('batch_size') != batch_size:
+        print("Checkpoint was written with a different batch size; ignoring it.")
+        return set()
+    return set(checkpoint.get('committed', []))
 
-        # Execute ClaimManagement creation with fraud_probability
-        if pd.notna(row['claim_type']):
-            neo4j_connection.execute_query(create_claim_management, {
-                'email': row['email'],
-                'management_id': management_id,
-                'claim_type': row['claim_type'],
-                'last_updated': last_updated,
-                'fraud_prediction': int(row['fraudPrediction']),
-                'fraud_probability': float(row['fraud_probability']),
-                'fraud_reason': row['fraudReason']
-            })
-
-            neo4j_connection.execute_query(create_claim, {
-                'management_id': management_id,
-                'claim_id': claim_id,
-                'claim_type': row['claim_type'],
-                'claim_severity': row['claim_severity'],
-                'total_amount': float(row['total_amount']),
-                'vehicle_amount': float(row['vehicle_amount']),
-                'property_amount': float(row['property_amount']),
-                'injury_amount': float(row['injury_amount'])
-            })
-
-            neo4j_connection.execute_query(create_customer, {
-                'claim_id': claim_id,
-                'customer_node_id': customer_node_id
-            })
-
-            neo4j_connection.execute_query(create_incident, {
-                'claim_id': claim_id,
-                'customer_node_id': customer_node_id,
-                'incident_id': incident_id,
-                'incident_city': row['incident_city'],
-                'incident_location': row['incident_location'],
-                'incident_date': incident_date,
-                'incident_time': incident_time,
-                'vehicles_involved': int(row['vehicles_involved']),
-                'witnesses': int(row['witnesses']),
-                'police_report': row['police_report'] == 'Yes',
-                'injury_amount': float(row['injury_amount']),
-                'property_amount': float(row['property_amount'])
-            })
+def save_checkpoint(batch_size, committed):
+    with open(CHECKPOINT_PATH, 'w') as f:
+        json.dump({'batch_size': batch_size, 'committed': sorted(committed)}, f)
+
+def insert_data(neo4j_connection, data, batch_size=None, workers=None, resume=True):
+    batch_size = batch_size or Config.NEO4J_BULK_BATCH_SIZE
+    committed = load_checkpoint(batch_size) if resume else set()
+    if committed:
+        print(f"Resuming: skipping {len(committed)} committed batches")
+
+    # Only rows in uncommitted batches need parameters (and new passwords)
+    rows = []
+    for position, (_, row) in enumerate(data.iterrows()):
+        if position // batch_size in committed:
+            rows.append(None)
+        else:
+            rows.append(build_row_params(row))
+
+    pending_rows = sum(1 for row in rows if row is not None)
+    create_vehicle_types(neo4j_connection, rows)
+    start = time.time()
+    progress = {'rows': 0}
+
+    def on_commit(batch_index, batch):
+        committed.add(batch_index)
+        save_checkpoint(batch_size, committed)
+        progress['rows'] += len(batch)
+        elapsed = time.time() - start
+        rate = progress['rows'] / elapsed if elapsed > 0 else 0
+        print(f"Batch {batch_index} committed: {progress['rows']}/{pending_rows} rows, {rate:.1f} rows/sec")
+
+    neo4j_connection.write_batches(
+        [INSERT_POLICY_QUERY, INSERT_CLAIM_QUERY],
+        rows,
+        batch_size=batch_size,
+        workers=workers,
+        skip=committed,
+        on_commit=on_commit,
+        prepare=hash_passwords
+    )
+
+    # Everything is in; the next run should start from scratch
+    CHECKPOINT_PATH.unlink(missing_ok=True)
+
+    # Bulk loads bypass the incremental counters, so rebuild them once at the end
+    recount_stats(neo4j_connection)
+    rebuild_customer_features(neo4j_connection)
 
 def main():
+    parser = argparse.ArgumentParser(description="Load Data.csv into Neo4j")
+    parser.add_argument('--batch-size', type=int, default=Config.NEO4J_BULK_BATCH_SIZE)
+    parser.add_argument('--workers', type=int, default=Config.NEO4J_BULK_WORKERS)
+    parser.add_argument('--fresh', action='store_true', help="ignore any checkpoint from a failed run")
+    args = parser.parse_args()
+
     print("Loading data from CSV...")
     data = load_data()
     
@@ -360,12 +396,13 @@ def main():
     
     try:
         print("Inserting data into Neo4j...")
-        insert_data(neo4j_connection, data)
+        insert_data(neo4j_connection, data, args.batch_size, args.workers, resume=not args.fresh)
         print("Data insertion completed successfully!")
     except Exception as e:
         print(f"Error occurred: {str(e)}")
+        print("Re-run the script to resume from the last committed batch.")
     finally:
-        neo4j_connection.close()
+        close_driver()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
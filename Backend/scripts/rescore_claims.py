@@ -0,0 +1,49 @@
+import sys
+import time
+import argparse
+from os.path import dirname
+
+# Add the Backend directory to Python path so we can import from database package
+backend_dir = dirname(dirname(__file__))
+sys.path.append(backend_dir)
+
+from database.connection import close_driver
+from config import Config
+from utils.batch_scoring import rescore_claims
+from utils.detector import MODEL_SAVE_PATH
+
+def main():
+    parser = argparse.ArgumentParser(description="Rescore ClaimManagement nodes with the fraud model")
+    parser.add_argument('--only-stale', action='store_true',
+                        help="skip claims already scored by the current model version")
+    parser.add_argument('--chunk-size', type=int, default=Config.FRAUD_SCORING_CHUNK_SIZE)
+    parser.add_argument('--workers', type=int, default=Config.NEO4J_BULK_WORKERS)
+    parser.add_argument('--model', default=MODEL_SAVE_PATH, help="model file (relative to Backend)")
+    args = parser.parse_args()
+
+    start = time.time()
+
+    def on_progress(scored, failed, total):
+        elapsed = time.time() - start
+        rate = scored / elapsed if elapsed > 0 else 0
+        print(f"{scored + failed}/{total} claims ({failed} failed), {rate:.1f} claims/sec")
+
+    try:
+        result = rescore_claims(
+            only_stale=args.only_stale,
+            chunk_size=args.chunk_size,
+            workers=args.workers,
+            model_path=args.model,
+            on_progress=on_progress
+        )
+        print(f"Rescored {result['scored']} of {result['total']} claims with model "
+              f"{result['model_version'][:12]} in {time.time() - start:.1f}s")
+        if result['failed']:
+            print("Re-run with --only-stale to retry the failed claims.")
+    except Exception as e:
+        print(f"Error occurred: {str(e)}")
+    finally:
+        close_driver()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,174 @@
+"""
+Feature vectorizer for the behaviour anomaly model.
+
+The preprocessing artifacts (behaviour frequency map, RobustScaler and feature
+column order) are compiled once at load time into a lookup table, column
+positions and full-width center/scale arrays. A behaviour event then becomes a
+single NumPy row with a few dict lookups and two array operations, without
+building a DataFrame.
+
+pandas_feature_frame() is the original per-request DataFrame pipeline; it is
+kept as the reference that scripts/check_anomaly_parity.py compares against.
+"""
+import math
+import numpy as np
+import pandas as pd
+from config import Config
+
+PICKLED_ANOMALY_MODEL_PATH = 'routes/models/iso_forest_model.pkl'
+FLAT_ANOMALY_MODEL_PATH = 'routes/models/iso_forest_model.npz'
+ANOMALY_MODEL_PATH = Config.ANOMALY_MODEL_PATH
+ANOMALY_ARTIFACTS_PATH = 'routes/models/preprocessing_artifacts.pkl'
+ANOMALY_THRESHOLD = -0.43
+
+# Raw numeric inputs the scaler was fitted on, in request-field names, when the
+# artifacts don't list them as scale_cols
+SCALED_FEATURES = ['inter_api_access_duration(sec)', 'sequence_length(count)',
+                   'vsession_duration(min)', 'num_sessions', 'num_users',
+                   'num_unique_apis']
+
+
+def scaled_columns(artifacts):
+    return list(artifacts.get('scale_cols') or SCALED_FEATURES)
+
+
+def common_behaviors(artifacts):
+    """
+    Behaviours encoded by their own frequency. Artifacts without a
+    common_behaviors list use every behaviour freq_map has a frequency for;
+    anything else encodes as 'Other'.
+    """
+    common = artifacts.get('common_behaviors')
+    if common is None:
+        common = [behavior for behavior in artifacts['freq_map'] if behavior != 'Other']
+    return set(common)
+
+
+def _number(value):
+    # pandas turns None into NaN, which the scaler passes through
+    if value is None:
+        return math.nan
+    return float(value)
+
+
+class CompiledPreprocessor:
+    """Preprocessing artifacts compiled into index maps and scaler arrays"""
+
+    def __init__(self, artifacts):
+        self.columns = list(artifacts['feature_columns'])
+        self.width = len(self.columns)
+        position = {column: i for i, column in enumerate(self.columns)}
+
+        # Every scaler input is required, as the DataFrame column selection required it;
+        # position is None for one the model does not use
+        self.scaled = [(column, position.get(column)) for column in scaled_columns(artifacts)]
+
+        # RobustScaler.transform is (x - center_) / scale_; columns it leaves
+        # alone get center 0 and scale 1 so the whole row is one operation
+        scaler = artifacts['scaler']
+        self.center = np.zeros(self.width)
+        self.scale = np.ones(self.width)
+        for index, (column, i) in enumerate(self.scaled):
+            if i is None:
+                continue
+            if scaler.with_centering:
+                self.center[i] = scaler.center_[index]
+            if scaler.with_scaling:
+                self.scale[i] = scaler.scale_[index]
+
+        # Behaviours outside common_behaviors, or without a frequency, encode as 'Other'
+        freq_map = artifacts['freq_map']
+        self.other_value = float(freq_map['Other'])
+        self.behavior_values = {
+            behavior: float(freq_map[behavior]) if behavior in freq_map else self.other_value
+            for behavior in common_behaviors(artifacts)
+        }
+        self.behavior_position = position.get('behavior_encoded')
+        # Only required when there is a map to apply to it; it is not a model input
+        self.requires_behavior_type = 'behavior_type_map' in artifacts
+
+        derived = {column for column, _ in self.scaled} | {'behavior_encoded'}
+        self.passthrough = [(column, i) for column, i in position.items() if column not in derived]
+
+    def _raw_row(self, record):
+        """Unscaled feature values for one event, in feature_columns order"""
+        values = [0.0] * self.width
+        for column, i in self.passthrough:
+            if column in record:
+                values[i] = _number(record[column])
+        for column, i in self.scaled:
+            value = _number(record[column])
+            if i is not None:
+                values[i] = value
+        behavior = record['behavior']
+        if self.requires_behavior_type and 'behavior_type' not in record:
+            raise KeyError('behavior_type')
+        if self.behavior_position is not None:
+            values[self.behavior_position] = self.behavior_values.get(behavior, self.other_value)
+        return values
+
+    def vectorize(self, record):
+        """One event dict -> a 1 x n float row in feature_columns order"""
+        row = np.array([self._raw_row(record)])
+        row -= self.center
+        row /= self.scale
+        return row
+
+    def vectorize_many(self, records):
+        """
+        Events -> (n_valid x n matrix, {index: error}) with the scaler applied to
+        the whole matrix at once. Events that can't be preprocessed or that contain
+        missing values (which the model rejects) are left out of the matrix and
+        reported by their position in records.
+        """
+        rows, errors = [], {}
+        for index, record in enumerate(records):
+            try:
+                rows.append(self._raw_row(record))
+            except (KeyError, TypeError, ValueError, AttributeError) as e:
+                errors[index] = str(e)
+
+        matrix = np.array(rows, dtype=float).reshape(len(rows), self.width)
+        missing = np.isnan(matrix).any(axis=1)
+        if missing.any():
+            valid = [index for index in range(len(records)) if index not in errors]
+            for position in np.flatnonzero(missing):
+                errors[valid[position]] = 'Input contains NaN'
+            matrix = matrix[~missing]
+        return self.scale_samples(matrix), errors
+
+    def scale_samples(self, samples):
+        """Raw rows already in feature_columns order (the tracker's samples) -> scaled matrix"""
+        matrix = np.array(samples, dtype=float).reshape(len(samples), self.width)
+        matrix -= self.center
+        matrix /= self.scale
+        return matrix
+
+
+def pandas_feature_frame(artifacts, data):
+    """The original DataFrame preprocessing for one event (parity reference)"""
+    input_df = pd.DataFrame([data])
+    common = common_behaviors(artifacts)
+
+    input_df['behavior'] = input_df['behavior'].apply(
+        lambda x: x if x in common else 'Other'
+    )
+    input_df['behavior_encoded'] = input_df['behavior'].map(
+        artifacts['freq_map']
+    ).fillna(artifacts['freq_map']['Other'])
+
+    if 'behavior_type_map' in artifacts:
+        input_df['behavior_type'] = input_df['behavior_type'].map(
+            artifacts['behavior_type_map']
+        )
+
+    scaled = scaled_columns(artifacts)
+    input_df[scaled] = artifacts['scaler'].transform(input_df[scaled])
+
+    final_features = pd.DataFrame(columns=artifacts['feature_columns'])
+    for col in final_features.columns:
+        if col in input_df.columns:
+            final_features[col] = input_df[col]
+        else:
+            final_features[col] = 0
+    return final_features
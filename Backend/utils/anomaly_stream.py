@@ -0,0 +1,143 @@
+"""
+Streaming anomaly scoring of behaviour windows.
+
+UserBehaviorTracker hands every window's feature sample to an AnomalyStream.
+The request thread only pays for a put_nowait on a bounded queue: when the
+queue is full the sample is dropped and counted. A daemon thread drains the
+queue in micro-batches, scores each batch with one decision_function call on
+the IsolationForest the /log blueprint already loaded, and keeps the latest
+verdict per session in memory for later requests to act on.
+
+Samples carry a submission sequence number. forget() remembers the sequence
+reached when a session was dropped, so a verdict for one of its samples that
+was still queued (or being scored) then is discarded instead of re-creating
+the flag. The queue is FIFO, so that mark is cleared once a later sample has
+been processed.
+
+Sessions that leave the tracker by LRU eviction are never forgotten, so at
+most max_flags flags are kept, least recently flagged evicted first.
+"""
+import queue
+import threading
+import time
+from collections import OrderedDict
+
+
+class AnomalyStream:
+    """Bounded sample queue scored in micro-batches by a background thread"""
+
+    def __init__(self, maxsize=1000, batch_size=256, max_delay=0.5, max_flags=100000):
+        self.queue = queue.Queue(maxsize=maxsize)
+        self.batch_size = batch_size
+        self.max_delay = max_delay
+        self.max_flags = max_flags
+        self.flags = OrderedDict()
+        self.forgotten = {}  # session_id -> last sequence submitted before forget()
+        self._sequence = 0
+        self.counters = {'enqueued': 0, 'dropped': 0, 'scored': 0, 'flagged': 0, 'batches': 0, 'unscored': 0,
+                         'flags_evicted': 0}
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def submit(self, session_id, sample):
+        """Queue one window's raw sample (feature_columns order); never blocks"""
+        self._ensure_started()
+        # Numbered and queued under the lock, so queue order is sequence order
+        with self._lock:
+            self._sequence += 1
+            try:
+                self.queue.put_nowait((session_id, sample, self._sequence))
+            except queue.Full:
+                self.counters['dropped'] += 1
+                return False
+            self.counters['enqueued'] += 1
+        return True
+
+    def flag(self, session_id):
+        """Latest verdict for a session flagged anomalous, or None"""
+        with self._lock:
+            return self.flags.get(session_id)
+
+    def forget(self, session_id):
+        """Drop a session's flag, including any verdict for samples already queued"""
+        with self._lock:
+            self.flags.pop(session_id, None)
+            self.forgotten[session_id] = self._sequence
+
+    def stats(self):
+        with self._lock:
+            return dict(self.counters, queued=self.queue.qsize(), maxsize=self.queue.maxsize,
+                        flagged_sessions=len(self.flags), max_flags=self.max_flags)
+
+    def _ensure_started(self):
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._work)
+                self._thread.daemon = True
+                self._thread.start()
+
+    def _next_batch(self):
+        """Block for one sample, then collect more until the batch is full or max_delay passes"""
+        batch = [self.queue.get()]
+        deadline = time.monotonic() + self.max_delay
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self.queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _work(self):
+        # Imported here: the blueprint module loads the model, and the tracker is
+        # created before the first request needs it
+        from routes.anomaly_detection import model, preprocessor
+        from utils.anomaly_features import ANOMALY_THRESHOLD
+        while True:
+            batch = self._next_batch()
+            if preprocessor is None:
+                # The model failed to load; keep draining so submit() never backs up
+                with self._lock:
+                    self.counters['unscored'] += len(batch)
+                    self._clear_forgotten(batch[-1][2])
+                for _ in batch:
+                    self.queue.task_done()
+                continue
+            try:
+                scores = model.decision_function(preprocessor.scale_samples([s for _, s, _ in batch]))
+                self._record(batch, scores, ANOMALY_THRESHOLD)
+            except Exception as e:
+                print(f"Streaming anomaly scoring failed: {str(e)}")
+                with self._lock:
+                    self._clear_forgotten(batch[-1][2])
+            finally:
+                for _ in batch:
+                    self.queue.task_done()
+
+    def _record(self, batch, scores, threshold):
+        now = time.time()
+        with self._lock:
+            self.counters['batches'] += 1
+            self.counters['scored'] += len(batch)
+            for (session_id, _, sequence), score in zip(batch, scores):
+                if sequence <= self.forgotten.get(session_id, 0):
+                    continue  # submitted before the session was forgotten
+                if score < threshold:
+                    self.counters['flagged'] += 1
+                    self.flags[session_id] = {'score': float(score), 'flagged_at': now}
+                    self.flags.move_to_end(session_id)
+                    if len(self.flags) > self.max_flags:
+                        self.flags.popitem(last=False)
+                        self.counters['flags_evicted'] += 1
+                else:
+                    self.flags.pop(session_id, None)
+            self._clear_forgotten(batch[-1][2])
+
+    def _clear_forgotten(self, sequence):
+        """Drop forget marks that no queued sample can still fall under; called holding the lock"""
+        for session_id in [sid for sid, mark in self.forgotten.items() if mark <= sequence]:
+            del self.forgotten[session_id]
@@ -0,0 +1,211 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from datetime import datetime
+
+from config import Config
+from database.connection import Neo4jConnection
+from utils.detector import (
+    MODEL_SAVE_PATH, PREDICTION_COLUMNS, model_registry,
+    predict_features, save_predictions
+)
+from utils.features import build_feature_frame
+from utils.fraud_score import fraud_score_fields
+from database.customer_features import FEATURE_PROJECTION
+
+# Same claim shape analyze_fraud_and_save scores: the ClaimManagement node merged
+# with its first Claim, that claim's Incident and the owner's stored features.
+# With $model_version set, only claims not yet scored by that version are returned.
+CLAIMS_TO_SCORE_MATCH = """
+MATCH (cm:ClaimManagement)-[:MANAGES]->(c:Claim)-[:OCCURRED_ON]->(i:Incident)
+WHERE $model_version IS NULL OR cm.modelVersion IS NULL OR cm.modelVersion <> $model_version
+"""
+
+CLAIMS_TO_SCORE_QUERY = CLAIMS_TO_SCORE_MATCH + """
+WITH cm, collect({c: c, i: i})[0] AS first
+WITH cm, first.c AS c, first.i AS i
+OPTIONAL MATCH (u:User)-[:HAS_CLAIMS]->(cm)
+WITH cm, c, i, head(collect(""" + FEATURE_PROJECTION + """)) AS f
+RETURN elementId(cm) AS element_id,
+       properties(cm) AS cm,
+       properties(c) AS c,
+       properties(i) AS i,
+       f
+"""
+
+CLAIMS_TO_SCORE_COUNT = CLAIMS_TO_SCORE_MATCH + """
+RETURN count(DISTINCT cm) AS total
+"""
+
+
+def _chunks(records, size):
+    chunk = []
+    for record in records:
+        chunk.append(record)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def merge_claim_record(record):
+    """Merge node properties in RETURN order, as fetch_data_from_neo4j does"""
+    merged = {}
+    for key in ('cm', 'c', 'i', 'f'):
+        merged.update(record[key] or {})
+    return merged
+
+
+def iter_claim_records(neo4j=None, model_version=None):
+    """Stream every scoreable claim as a merged property dict"""
+    neo4j = neo4j or Neo4jConnection()
+    for record in neo4j.stream_query(CLAIMS_TO_SCORE_QUERY, {"model_version": model_version}):
+        yield merge_claim_record(record)
+
+
+def score_chunk(loaded_model, records):
+    """
+    Score a chunk of claim records with one predict and one contribution pass
+    and return the rows to save, each with its rendered fraudReason.
+    """
+    features = build_feature_frame([merge_claim_record(record) for record in records], PREDICTION_COLUMNS)
+    prediction, fraud_prob, fraud_reasons = predict_features(loaded_model.model, features)
+
+    model_fields = loaded_model.prediction_fields()
+    rows = []
+    for index, record in enumerate(records):
+        row = {
+            "element_id": record["element_id"],
+            "prediction": int(prediction[index]),
+            "fraud_prob": float(fraud_prob[index]) if fraud_prob is not None else 0,
+            "fraud_reason": fraud_reasons[index],
+            **model_fields
+        }
+        row.update(fraud_score_fields({
+            "fraudPrediction": row["prediction"],
+            "fraudProbability": row["fraud_prob"],
+            "fraudReason": row["fraud_reason"]
+        }))
+        rows.append(row)
+    return rows
+
+
+def rescore_claims(only_stale=False, chunk_size=None, workers=None, model_path=MODEL_SAVE_PATH,
+                   on_progress=None, neo4j=None):
+    """
+    Rescore ClaimManagement nodes in chunks: stream claims, build one feature
+    frame and run one predict per chunk, and write each chunk back with a single
+    UNWIND transaction while the next chunk is being scored.
+
+    :param only_stale: skip claims already scored by the current model version.
+    :param on_progress: called as on_progress(scored, failed, total) after each chunk.
+    :return: dict with total, scored, failed and the model version used.
+    """
+    neo4j = neo4j or Neo4jConnection()
+    chunk_size = chunk_size or Config.FRAUD_SCORING_CHUNK_SIZE
+    workers = workers or Config.NEO4J_BULK_WORKERS
+
+    # Pin one model version for the whole run, even if the file is replaced midway
+    loaded_model = model_registry.get(model_path)
+    params = {"model_version": loaded_model.version if only_stale else None}
+    total = neo4j.execute_query(CLAIMS_TO_SCORE_COUNT, params)[0]["total"]
+    progress = {"total": total, "scored": 0, "failed": 0, "model_version": loaded_model.version}
+
+    def collect(futures):
+        for future in futures:
+            rows = pending[future]
+            try:
+                future.result()
+                progress["scored"] += len(rows)
+            except Exception as e:
+                progress["failed"] += len(rows)
+                print(f"Error saving {len(rows)} rescored claims: {str(e)}")
+            del pending[future]
+            if on_progress:
+                on_progress(progress["scored"], progress["failed"], total)
+
+    pending = {}
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for records in _chunks(neo4j.stream_query(CLAIMS_TO_SCORE_QUERY, params), chunk_size):
+            rows = score_chunk(loaded_model, records)
+            pending[executor.submit(neo4j.execute_write, save_predictions, rows)] = rows
+            if len(pending) >= workers:
+                done, _ = wait(list(pending), return_when=FIRST_COMPLETED)
+                collect(done)
+        collect(list(pending))
+    return progress
+
+
+class RescoreJob:
+    """A rescoring run on a background thread, with progress for polling"""
+
+    def __init__(self, only_stale=False):
+        self.only_stale = only_stale
+        self.status = 'pending'
+        self.total = None
+        self.scored = 0
+        self.failed = 0
+        self.model_version = None
+        self.error = None
+        self.started_at = None
+        self.finished_at = None
+        self._start = None
+
+    def on_progress(self, scored, failed, total):
+        self.scored, self.failed, self.total = scored, failed, total
+
+    def run(self):
+        self.status = 'running'
+        self.started_at = datetime.now().isoformat()
+        self._start = time.time()
+        try:
+            result = rescore_claims(only_stale=self.only_stale, on_progress=self.on_progress)
+            self.total = result['total']
+            self.model_version = result['model_version']
+            self.status = 'completed'
+        except Exception as e:
+            self.error = str(e)
+            self.status = 'failed'
+            print(f"Rescoring job failed: {str(e)}")
+        finally:
+            self.finished_at = datetime.now().isoformat()
+
+    def to_dict(self):
+        elapsed = time.time() - self._start if self._start else 0
+        return {
+            'status': self.status,
+            'only_stale': self.only_stale,
+            'total': self.total,
+            'scored': self.scored,
+            'failed': self.failed,
+            'claims_per_second': round(self.scored / elapsed, 1) if elapsed > 0 else 0,
+            'model_version': self.model_version,
+            'error': self.error,
+            'started_at': self.started_at,
+            'finished_at': self.finished_at
+        }
+
+
+_current_job = None
+_job_lock = threading.Lock()
+
+
+def start_rescore_job(only_stale=False):
+    """Start a rescoring job on a daemon thread; raises RuntimeError if one is running"""
+    global _current_job
+    with _job_lock:
+        if _current_job is not None and _current_job.status in ('pending', 'running'):
+            raise RuntimeError('A rescoring job is already running')
+        job = RescoreJob(only_stale)
+        _current_job = job
+
+    thread = threading.Thread(target=job.run)
+    thread.daemon = True
+    thread.start()
+    return job
+
+
+def current_rescore_job():
+    """The running or most recently finished rescoring job, if any"""
+    return _current_job
@@ -1,11 +1,20 @@
 import os
+import hashlib
+import threading
+import time
 
+from config import Config
 from database.connection import Neo4jConnection
+from database.stats import apply_stats_delta, fraud_change_delta
+from utils.fraud_score import fraud_score_fields
+from utils.features import build_feature_frame
+from database.customer_features import FEATURE_PROJECTION
+from utils.shadow import shadow_scorer
 os.environ["CUDA_VISIBLE_DEVICES"] = ""  # Ensure GPU is disabled
 
+import numpy as np
 import pandas as pd
 import joblib
-from neo4j import GraphDatabase
 from datetime import datetime
 
 # --- Expected Prediction Feature Order (as used during training) ---
@@ -20,7 +29,173 @@ PREDICTION_COLUMNS = [
     'AddressChange-Claim', 'NumberOfCars', 'Year'
 ]
 
-MODEL_SAVE_PATH = "utils/xgb_fraud_model_gridcv.pkl"
+# The trained model pickle (an XGBClassifier), and its booster exported as a
+# native XGBoost model file by scripts/export_fraud_model.py
+PICKLED_MODEL_PATH = "utils/xgb_fraud_model_gridcv.pkl"
+NATIVE_MODEL_PATH = "utils/xgb_fraud_model.ubj"
+NATIVE_MODEL_SUFFIXES = (".ubj", ".json")
+
+# Model file used for scoring (Config.FRAUD_MODEL_PATH)
+MODEL_SAVE_PATH = Config.FRAUD_MODEL_PATH
+
+DEFAULT_FRAUD_REASON = "Fraud analysis completed. Reasoning not available in this version."
+
+# --- Model Registry ---
+class NativeBoosterModel:
+    """
+    predict/predict_proba over a native XGBoost booster file. Loading it needs
+    only xgboost, not scikit-learn. Feature frames are scored as a float32
+    array of category codes with inplace_predict, which skips the per-call
+    DataFrame and DMatrix handling of XGBClassifier.predict_proba.
+    """
+
+    def __init__(self, path, threshold=0.5):
+        import xgboost
+        self.booster = xgboost.Booster(model_file=path)
+        self.threshold = threshold
+
+    @staticmethod
+    def feature_matrix(df_features):
+        """Category codes and numbers in column order; unknown categories and missing values are NaN"""
+        matrix = np.empty(df_features.shape, dtype=np.float32)
+        for index, (_, column) in enumerate(df_features.items()):
+            if isinstance(column.dtype, pd.CategoricalDtype):
+                codes = column.cat.codes.to_numpy()
+                matrix[:, index] = np.where(codes < 0, np.nan, codes)
+            else:
+                matrix[:, index] = column.to_numpy(dtype=np.float32, na_value=np.nan)
+        return matrix
+
+    def predict_proba(self, df_features):
+        matrix = df_features if isinstance(df_features, np.ndarray) else self.feature_matrix(df_features)
+        positive = np.asarray(self.booster.inplace_predict(matrix), dtype=float).reshape(-1)
+        return np.column_stack([1 - positive, positive])
+
+    def predict(self, df_features):
+        return self.labels(self.predict_proba(df_features)[:, 1])
+
+    def labels(self, fraud_prob):
+        return (fraud_prob > self.threshold).astype(int)
+
+
+def load_model_file(path):
+    """Native booster files load without sklearn; anything else is a joblib pickle"""
+    if path.endswith(NATIVE_MODEL_SUFFIXES):
+        return NativeBoosterModel(path)
+    return joblib.load(path)
+
+
+class LoadedModel:
+    """One deserialized model file and where it came from"""
+
+    def __init__(self, path, model, version, mtime, size, load_seconds):
+        self.path = path
+        self.model = model
+        self.version = version
+        self.mtime = mtime
+        self.size = size
+        self.load_seconds = load_seconds
+        self.loaded_at = datetime.now().isoformat()
+
+    def prediction_fields(self):
+        """Provenance stored with every prediction made by this model"""
+        return {
+            "model_version": self.version,
+            "model_loaded_at": self.loaded_at
+        }
+
+
+def _file_digest(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class ModelRegistry:
+    """
+    Loads each model file once per process. The file is re-stat'ed at most every
+    check_interval seconds; when its mtime or size changes and the content hash
+    differs, the new version is loaded and swapped in, so callers holding the
+    old LoadedModel finish with it while later calls get the new one.
+
+    One thread per path does the checking and loading, outside the registry
+    lock; other callers keep getting the current model meanwhile instead of
+    waiting (only the very first load of a path is waited for). A reload that
+    fails is logged and the current model kept; it is retried after
+    check_interval.
+    """
+
+    def __init__(self, check_interval=None):
+        self.check_interval = Config.MODEL_RELOAD_CHECK_INTERVAL if check_interval is None else check_interval
+        self._models = {}
+        self._checked = {}
+        self._load_locks = {}
+        self._lock = threading.Lock()
+
+    def get(self, path=MODEL_SAVE_PATH):
+        loaded = self._models.get(path)
+        now = time.monotonic()
+        if loaded is not None and now - self._checked.get(path, 0) < self.check_interval:
+            return loaded
+
+        with self._lock:
+            load_lock = self._load_locks.setdefault(path, threading.Lock())
+        # With a model to serve, never wait on another thread's check or reload
+        if not load_lock.acquire(blocking=loaded is None):
+            return loaded
+        try:
+            loaded = self._models.get(path)
+            if loaded is not None and now - self._checked.get(path, 0) < self.check_interval:
+                return loaded  # loaded by the thread we waited for
+            try:
+                return self._refresh(path, loaded, now)
+            except Exception as e:
+                if loaded is None:
+                    raise
+                self._checked[path] = now
+                print(f"Could not reload model {path}, keeping version {loaded.version[:12]}: {str(e)}")
+                return loaded
+        finally:
+            load_lock.release()
+
+    def _refresh(self, path, loaded, now):
+        """Load path if it changed since loaded (or was never loaded); called holding its load lock"""
+        stat = os.stat(path)
+        if loaded is not None and (loaded.mtime, loaded.size) == (stat.st_mtime, stat.st_size):
+            self._checked[path] = now
+            return loaded
+
+        version = _file_digest(path)
+        if loaded is not None and loaded.version == version:
+            # Touched but unchanged: remember the new mtime and keep the model
+            loaded.mtime, loaded.size = stat.st_mtime, stat.st_size
+            self._checked[path] = now
+            return loaded
+
+        start = time.perf_counter()
+        model = load_model_file(path)
+        loaded = LoadedModel(path, model, version, stat.st_mtime, stat.st_size,
+                             time.perf_counter() - start)
+        self._models[path] = loaded
+        self._checked[path] = now
+        print(f"Loaded model {path} version {version[:12]} in {loaded.load_seconds:.3f}s")
+        return loaded
+
+    def status(self):
+        """Loaded versions, for diagnostics"""
+        return {
+            path: {
+                "version": loaded.version,
+                "loaded_at": loaded.loaded_at,
+                "load_seconds": round(loaded.load_seconds, 3)
+            }
+            for path, loaded in list(self._models.items())
+        }
+
+
+model_registry = ModelRegistry()
 
 # --- Neo4j Data Fetching ---
 def fetch_data_from_neo4j(driver, query, params=None):
@@ -47,6 +222,10 @@ def transform_neo4j_data_for_model(neo4j_data: dict) -> dict:
     """
     Map the merged Neo4j node properties into features expected by the model.
     Where data is missing, default values are used.
+
+    Scoring uses the vectorized utils.features.build_feature_frame; this
+    per-record version is kept as the reference for scripts/check_feature_parity.py,
+    which compares it with the feature values before they are labelled.
     """
     transformed = {}
     
@@ -157,25 +336,168 @@ def transform_neo4j_data_for_model(neo4j_data: dict) -> dict:
     
     return transformed
 
+# --- Model Input ---
+def _booster_of(model):
+    """The XGBoost booster behind a served model, if there is one"""
+    if isinstance(model, NativeBoosterModel):
+        return model.booster
+    estimator = getattr(model, "best_estimator_", model)
+    get_booster = getattr(estimator, "get_booster", None)
+    return get_booster() if get_booster else None
+
+
+def feature_contributions(model, df_features, exact=None):
+    """
+    Per-row tree contributions for every feature, plus the bias column.
+    Approximate unless exact (default Config.FRAUD_REASON_EXACT_SHAP) asks for TreeSHAP.
+    """
+    booster = _booster_of(model)
+    if booster is None:
+        return None
+    import xgboost
+    exact = Config.FRAUD_REASON_EXACT_SHAP if exact is None else exact
+    return booster.predict(xgboost.DMatrix(df_features, enable_categorical=True),
+                           pred_contribs=True, approx_contribs=not exact)
+
+
+def _format_feature_value(value):
+    if isinstance(value, float):
+        return "missing" if np.isnan(value) else f"{value:g}"
+    return str(value)
+
+
+def render_fraud_reasons(contributions, df_features, top_k=None):
+    """fraudReason text per row: the top_k features by absolute contribution"""
+    top_k = top_k or Config.FRAUD_REASON_TOP_K
+    columns = list(df_features.columns)
+    # Drop the bias column, then rank features by absolute contribution per row
+    values = np.asarray(contributions)[:, :len(columns)]
+    order = np.argsort(-np.abs(values), axis=1)[:, :top_k]
+
+    reasons = []
+    for row, top in enumerate(order):
+        factors = [
+            f"{columns[i]} = {_format_feature_value(df_features.iloc[row, i])} "
+            f"({'raises' if values[row, i] > 0 else 'lowers'} risk {values[row, i]:+.2f})"
+            for i in top if values[row, i] != 0
+        ]
+        reasons.append("Top factors: " + "; ".join(factors) if factors else DEFAULT_FRAUD_REASON)
+    return reasons
+
+
+def predict_features(model, df_features, with_reasons=True):
+    """
+    One vectorized predict, predict_proba (when available) and contribution
+    pass over every row. Returns (prediction, fraud_prob, fraud_reasons);
+    fraud_reasons is None, and no contributions are computed, without with_reasons.
+    """
+    if isinstance(model, NativeBoosterModel):
+        # Labels come from the probabilities, so the booster runs once
+        fraud_prob = model.predict_proba(df_features)[:, 1]
+        prediction = model.labels(fraud_prob)
+    else:
+        prediction = model.predict(df_features)
+        fraud_prob = model.predict_proba(df_features)[:, 1] if hasattr(model, "predict_proba") else None
+    if not with_reasons:
+        return prediction, fraud_prob, None
+    return prediction, fraud_prob, predict_reasons(model, df_features)
+
+
+def predict_reasons(model, df_features):
+    """fraudReason text per row from the model's feature contributions"""
+    try:
+        contributions = feature_contributions(model, df_features)
+    except Exception as e:
+        print(f"Could not compute feature contributions: {str(e)}")
+        contributions = None
+    if contributions is None:
+        return [DEFAULT_FRAUD_REASON] * len(df_features)
+    return render_fraud_reasons(contributions, df_features)
+
+# --- Persist Fraud Fields ---
+def save_prediction(tx, update_query, params):
+    """
+    Run a fraud-field update query and adjust the dashboard's red-claim count
+    in the same transaction. The query must RETURN the previous fields as `old`
+    and whether the node is counted on the dashboard as `counted`; it receives
+    the derived $forgery_score and $color_code to store with the fields, and
+    $model_version/$model_loaded_at when params carry them.
+    """
+    new_claim = {
+        "fraudPrediction": params["prediction"],
+        "fraudProbability": params["fraud_prob"],
+        "fraudReason": params["fraud_reason"]
+    }
+    params = dict({"model_version": None, "model_loaded_at": None}, **params)
+    params.update(fraud_score_fields(new_claim))
+    records = list(tx.run(update_query, params))
+    for record in records:
+        if record["counted"]:
+            apply_stats_delta(tx, fraud_change_delta(dict(record["old"]), new_claim))
+    return records
+
+SAVE_PREDICTIONS_QUERY = """
+UNWIND $rows AS row
+MATCH (cm:ClaimManagement) WHERE elementId(cm) = row.element_id
+WITH cm, row, cm {.fraudPrediction, .fraudProbability, .fraudReason} AS old,
+     EXISTS { (:User)-[:HAS_CLAIMS]->(cm) } AS counted
+SET cm.fraudPrediction = row.prediction,
+    cm.fraudProbability = row.fraud_prob,
+    cm.fraudReason = row.fraud_reason,
+    cm.forgeryScore = row.forgery_score,
+    cm.colorCode = row.color_code,
+    cm.modelVersion = row.model_version,
+    cm.modelLoadedAt = row.model_loaded_at
+RETURN old, counted, row.prediction AS prediction, row.fraud_prob AS fraud_prob,
+       row.fraud_reason AS fraud_reason
+"""
+
+
+def save_predictions(tx, rows):
+    """
+    Batch form of save_prediction: write many predictions with one UNWIND and
+    apply their combined red-claim delta. Rows are keyed by ClaimManagement
+    elementId and carry the same fields as save_prediction's params.
+    """
+    fraudulent = 0
+    updated = 0
+    for record in tx.run(SAVE_PREDICTIONS_QUERY, rows=rows):
+        updated += 1
+        if record["counted"]:
+            fraudulent += fraud_change_delta(dict(record["old"]), {
+                "fraudPrediction": record["prediction"],
+                "fraudProbability": record["fraud_prob"],
+                "fraudReason": record["fraud_reason"]
+            })["fraudulent_claims"]
+    apply_stats_delta(tx, {"fraudulent_claims": fraudulent})
+    return updated
+
 # --- Store Prediction in ClaimManagement Node ---
-def store_prediction_in_claim_management(driver, customer_id, prediction, fraud_prob, fraud_reason):
+def store_prediction_in_claim_management(driver, customer_id, prediction, fraud_prob, fraud_reason,
+                                         loaded_model=None):
     """
     Update the ClaimManagement node associated with the given customer with the fraud prediction,
-    fraud probability, and fraud reason.
+    fraud probability, and fraud reason, plus the version of the model that made it.
     """
     update_query = """
     MATCH (u:User {customerId: $customer_id})-[:HAS_CLAIMS]->(cm:ClaimManagement)
+    WITH cm, cm {.fraudPrediction, .fraudProbability, .fraudReason} AS old, true AS counted
     SET cm.fraudPrediction = $prediction,
         cm.fraudProbability = $fraud_prob,
-        cm.fraudReason = $fraud_reason
-    RETURN cm
+        cm.fraudReason = $fraud_reason,
+        cm.forgeryScore = $forgery_score,
+        cm.colorCode = $color_code,
+        cm.modelVersion = $model_version,
+        cm.modelLoadedAt = $model_loaded_at
+    RETURN cm, old, counted
     """
     with driver.session() as session:
-        session.run(update_query, {
+        session.execute_write(save_prediction, update_query, {
             "customer_id": customer_id,
             "prediction": int(prediction),
             "fraud_prob": float(fraud_prob),
-            "fraud_reason": fraud_reason
+            "fraud_reason": fraud_reason,
+            **(loaded_model.prediction_fields() if loaded_model else {})
         })
 
 # --- Fraud Analysis ---
@@ -189,30 +511,27 @@ def analyze_fraud_and_save(claim_management_id):
     neo4j_conn = Neo4jConnection()
     query = """
     MATCH (cm:ClaimManagement {id: $claim_management_id})-[:MANAGES]->(c:Claim)-[:OCCURRED_ON]->(i:Incident)
-    RETURN cm, c, i
+    OPTIONAL MATCH (u:User)-[:HAS_CLAIMS]->(cm)
+    RETURN cm, c, i, """ + FEATURE_PROJECTION + """ AS f
     """
     params = {"claim_management_id": claim_management_id}
     df_raw = fetch_data_from_neo4j(neo4j_conn.driver, query, params)
 
     if df_raw.empty:
         print(f"No data fetched for claim management ID {claim_management_id}.")
-        neo4j_conn.driver.close()
         return
 
     neo4j_data = df_raw.iloc[0].to_dict()
-    features_dict = transform_neo4j_data_for_model(neo4j_data)
-
-    # Prepare features for the model
-    df_features = pd.DataFrame([features_dict]).reindex(columns=PREDICTION_COLUMNS, fill_value=0)
-
-    # Convert object columns to categorical for XGBoost
-    for col in df_features.select_dtypes(include='object').columns:
-        df_features[col] = df_features[col].astype('category')
+    df_features = build_feature_frame([neo4j_data], PREDICTION_COLUMNS)
 
-    # Load the model and make predictions
-    model = joblib.load(MODEL_SAVE_PATH)
-    prediction = model.predict(df_features)
-    fraud_prob = model.predict_proba(df_features)[:, 1] if hasattr(model, "predict_proba") else None
+    # Make predictions with the process-wide model
+    loaded_model = model_registry.get(MODEL_SAVE_PATH)
+    # Timed without the reasons, as the shadow model is, so the latencies compare
+    start = time.perf_counter()
+    prediction, fraud_prob, _ = predict_features(loaded_model.model, df_features, with_reasons=False)
+    shadow_scorer.submit([claim_management_id], df_features, loaded_model, prediction, fraud_prob,
+                         time.perf_counter() - start)
+    fraud_reasons = predict_reasons(loaded_model.model, df_features)
 
     print(f"Prediction for {claim_management_id} (0: Not Fraud, 1: Fraud):", prediction[0])
     if fraud_prob is not None:
@@ -221,22 +540,28 @@ def analyze_fraud_and_save(claim_management_id):
     # Update the ClaimManagement node with the fraud reason
     update_query = """
     MATCH (cm:ClaimManagement {id: $claim_management_id})
+    WITH cm, cm {.fraudPrediction, .fraudProbability, .fraudReason} AS old,
+         EXISTS { (:User)-[:HAS_CLAIMS]->(cm) } AS counted
     SET cm.fraudPrediction = $prediction,
         cm.fraudProbability = $fraud_prob,
-        cm.fraudReason = $fraud_reason
+        cm.fraudReason = $fraud_reason,
+        cm.forgeryScore = $forgery_score,
+        cm.colorCode = $color_code,
+        cm.modelVersion = $model_version,
+        cm.modelLoadedAt = $model_loaded_at
+    RETURN old, counted
     """
 
-    fraud_reason = "Fraud analysis completed. Reasoning not available in this version."
+    fraud_reason = fraud_reasons[0]
 
-    neo4j_conn.execute_query(update_query, {
+    neo4j_conn.execute_write(save_prediction, update_query, {
         "claim_management_id": claim_management_id,
         "prediction": int(prediction[0]),
         "fraud_prob": float(fraud_prob[0]) if fraud_prob is not None else 0,
-        "fraud_reason": fraud_reason
+        "fraud_reason": fraud_reason,
+        **loaded_model.prediction_fields()
     })
 
-    neo4j_conn.driver.close()
-
 # --- Prediction Pipeline ---
 def predict_from_neo4j(customer_id, model_path=MODEL_SAVE_PATH):
     # Initialize Neo4j driver
@@ -250,7 +575,8 @@ def predict_from_neo4j(customer_id, model_path=MODEL_SAVE_PATH):
     OPTIONAL MATCH (c)<-[:MANAGES]-(cm:ClaimManagement)
     OPTIONAL MATCH (cust)-[:HAS_BANKING_DETAILS]->(b:BankingDetails)
     OPTIONAL MATCH (cust)-[:HAS_DETAILS]->(o:OtherDetails)
-    RETURN cust, c, cm, i, b, o
+    OPTIONAL MATCH (u:User)-[:HAS_CLAIMS]->(cm)
+    RETURN cust, c, cm, i, b, o, """ + FEATURE_PROJECTION + """ AS f
     """
     
     params = {'customer_id': customer_id}
@@ -259,29 +585,20 @@ def predict_from_neo4j(customer_id, model_path=MODEL_SAVE_PATH):
     
     if df_raw.empty:
         print(f"No data fetched for customer {customer_id}.")
-        neo4j_conn.driver.close()
         return
     
     neo4j_data = df_raw.iloc[0].to_dict()
-    features_dict = transform_neo4j_data_for_model(neo4j_data)
-    
-    # Prepare features for the model
-    df_features = pd.DataFrame([features_dict]).reindex(columns=PREDICTION_COLUMNS, fill_value=0)
+    df_features = build_feature_frame([neo4j_data], PREDICTION_COLUMNS)
     
-    # Convert object columns to categorical for XGBoost
-    for col in df_features.select_dtypes(include='object').columns:
-        df_features[col] = df_features[col].astype('category')
-    
-    # Load the model and make predictions
-    model = joblib.load(model_path)
-    prediction = model.predict(df_features)
-    fraud_prob = model.predict_proba(df_features)[:, 1] if hasattr(model, "predict_proba") else None
+    # Make predictions with the process-wide model
+    loaded_model = model_registry.get(model_path)
+    prediction, fraud_prob, fraud_reasons = predict_features(loaded_model.model, df_features)
     
     print(f"Prediction for {customer_id} (0: Not Fraud, 1: Fraud):", prediction[0])
     if fraud_prob is not None:
         print(f"Fraud Probability: {fraud_prob[0]}")
     
-    fraud_reason = "Fraud analysis completed. Reasoning not available in this version."
+    fraud_reason = fraud_reasons[0]
     
     # Store prediction in ClaimManagement node
     store_prediction_in_claim_management(
@@ -289,7 +606,6 @@ def predict_from_neo4j(customer_id, model_path=MODEL_SAVE_PATH):
         customer_id=customer_id,
         prediction=prediction[0],
         fraud_prob=fraud_prob[0] if fraud_prob is not None else 0,
-        fraud_reason=fraud_reason
-    )
-    
-    neo4j_conn.driver.close()
\ No newline at end of file
+        fraud_reason=fraud_reason,
+        loaded_model=loaded_model
+    )
\ No newline at end of file
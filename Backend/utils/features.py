@@ -0,0 +1,355 @@
+"""
+Columnar feature pipeline for the fraud model.
+
+build_feature_frame() takes a batch of merged claim records (the dicts
+transform_neo4j_data_for_model receives, one per claim; a single claim is a
+batch of one) and produces the model's feature frame with vectorized
+pandas/NumPy operations.
+
+The booster treats 21 of its 28 inputs as categorical, with the codes of the
+training data's labels ("Jan", "Monday", "more than 30", "2 to 4", ...) in
+sorted order. feature_values() computes the inputs as numbers and strings;
+feature_labels() turns every categorical one into its training label: months
+and weekdays by name, the day gaps, vehicle price and age, and the customer
+history counts by the training data's bands (BANDS). Vehicle prices are banded
+as stored. The labels are then encoded against feature_vocabulary.json, which
+lists each feature's training labels in code order, so a value gets the code
+the model was trained with in every request and every batch. Values the model
+never saw (and missing ones) are missing.
+
+Check the vocabulary against the booster's categorical features and splits:
+
+    python -m utils.features --check-model
+"""
+import argparse
+import json
+import os
+import numpy as np
+import pandas as pd
+from datetime import datetime
+from functools import lru_cache
+
+VOCABULARY_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "feature_vocabulary.json")
+
+# Model column -> source property for the string features
+CATEGORICAL_SOURCES = {
+    "Make": "make",
+    "AccidentArea": "location",
+    "Sex": "sex",
+    "MaritalStatus": "maritalStatus",
+    "Fault": "claim_type",
+    "PolicyType": "policyType",
+    "AgentType": "agentType",
+}
+
+# Model column -> source property for numbers copied through as-is (missing is 0)
+PASSTHROUGH_SOURCES = {
+    "RepNumber": "repNumber",
+    "DriverRating": "driverRating",
+    "PastNumberOfClaims": "pastClaims",
+    "NumberOfSuppliments": "numberOfSupplements",
+    "NumberOfCars": "numberOfCars",
+}
+
+MONTH_LABELS = ["Jan", "Feb", "Mar", "Apr", "May", "Jun", "Jul", "Aug", "Sep", "Oct", "Nov", "Dec"]
+DAY_LABELS = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
+
+# Model column -> (lower bounds, labels) of the training data's bands: a value
+# gets the label of the last bound it reaches, and labels[0] below the first
+BANDS = {
+    "VehiclePrice": ([20000, 30000, 40000, 60000, 70000],
+                     ["less than 20000", "20000 to 29000", "30000 to 39000", "40000 to 59000",
+                      "60000 to 69000", "more than 69000"]),
+    "Days:Policy-Accident": ([1, 8, 16, 31], ["none", "1 to 7", "8 to 15", "15 to 30", "more than 30"]),
+    # Days:Policy-Claim has no "1 to 7" band in the training data
+    "Days:Policy-Claim": ([1, 16, 31], ["none", "8 to 15", "15 to 30", "more than 30"]),
+    "AgeOfVehicle": ([2, 3, 4, 5, 6, 7, 8],
+                     ["new", "2 years", "3 years", "4 years", "5 years", "6 years", "7 years", "more than 7"]),
+    "PoliceReportFiled": ([1], ["No", "Yes"]),
+    "WitnessPresent": ([1], ["No", "Yes"]),
+    "PastNumberOfClaims": ([1, 2, 5], ["none", "1", "2 to 4", "more than 4"]),
+    "NumberOfSuppliments": ([1, 3, 6], ["none", "1 to 2", "3 to 5", "more than 5"]),
+    "NumberOfCars": ([2, 3, 5, 9], ["1 vehicle", "2 vehicles", "3 to 4", "5 to 8", "more than 8"]),
+    # Days since the last address change
+    "AddressChange-Claim": ([183, 730, 1461], ["under 6 months", "1 year", "2 to 3 years", "4 to 8 years"]),
+}
+
+# Label of a feature whose input is missing, where the training data had one
+MISSING_LABELS = {
+    "MonthClaimed": "0",
+    "DayOfWeekClaimed": "0",
+    "AddressChange-Claim": "no change",
+}
+
+_TZ_SUFFIX = r"(Z|[+-]\d{2}:?\d{2})$"
+_INT_STRING = r"[+-]?\d+"
+
+
+def load_vocabulary(path=VOCABULARY_PATH):
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_vocabulary(vocabulary, path=VOCABULARY_PATH):
+    with open(path, "w") as f:
+        json.dump(vocabulary, f, indent=2)
+        f.write("\n")
+
+
+_vocabulary = None
+
+
+def get_vocabulary():
+    """The persisted vocabulary, read once per process"""
+    global _vocabulary
+    if _vocabulary is None:
+        _vocabulary = load_vocabulary()
+    return _vocabulary
+
+
+def _column(frame, key):
+    if key in frame.columns:
+        return frame[key]
+    return pd.Series(np.nan, index=frame.index, dtype=object)
+
+
+def _strings(values):
+    """Keep only str values (NaN elsewhere), as an object column usable with .str"""
+    values = values.astype(object)
+    return values.where(values.map(lambda v: isinstance(v, str)))
+
+
+def _text(values):
+    """Stringify temporal values (neo4j Date/DateTime included) for date parsing"""
+    values = values.astype(object)
+    return values.map(lambda v: v if isinstance(v, str) else str(v), na_action="ignore")
+
+
+def _parse_dates(values):
+    """Parse a column of date strings as naive wall-clock times; NaT where unparseable"""
+    # .map on an all-missing column comes back float64, which has no .str
+    text = _text(values).astype(object)
+    text = text.where(text.notna() & (text != ""))
+    if not text.notna().any():
+        return pd.Series(pd.NaT, index=values.index, dtype="datetime64[ns]")
+    text = text.str.replace(_TZ_SUFFIX, "", regex=True)
+    return pd.to_datetime(text, errors="coerce", format="mixed")
+
+
+def _int_values(values):
+    """int(value) semantics: numbers are truncated, only integer strings parse, NaN otherwise"""
+    values = values.astype(object)
+    is_text = values.map(lambda v: isinstance(v, str))
+    text = values.where(is_text).str.strip()
+    parsed_text = pd.to_numeric(text.where(text.str.fullmatch(_INT_STRING, na=False)), errors="coerce")
+    numbers = pd.to_numeric(values.where(~is_text), errors="coerce")
+    return np.trunc(numbers.fillna(parsed_text))
+
+
+def _float_values(values):
+    return pd.to_numeric(values, errors="coerce")
+
+
+def _week_of_month(dates):
+    return (dates.dt.day - 1) // 7 + 1
+
+
+@lru_cache(maxsize=64)
+def _category_codes(categories):
+    """CategoricalDtype and label -> code map for one vocabulary list, built once"""
+    return pd.CategoricalDtype(list(categories)), {label: code for code, label in enumerate(categories)}
+
+
+def encode_categorical(values, categories):
+    """Fixed-vocabulary categorical column of string labels; missing and unseen values are missing"""
+    dtype, codes = _category_codes(tuple(categories))
+    return pd.Categorical.from_codes([codes.get(label, -1) for label in values], dtype=dtype)
+
+
+def _band(values, bounds, labels):
+    """Label of the last lower bound each value reaches (labels[0] below them all); NaN stays missing"""
+    numbers = values.to_numpy(dtype=float)
+    banded = np.asarray(labels, dtype=object)[np.searchsorted(bounds, numbers, side="right")]
+    banded[np.isnan(numbers)] = np.nan
+    return pd.Series(banded, index=values.index, dtype=object)
+
+
+def _lookup(values, labels, first):
+    """labels[value - first] for whole-number values in range; missing elsewhere"""
+    numbers = values.to_numpy(dtype=float) - first
+    known = (numbers >= 0) & (numbers < len(labels))
+    looked_up = np.full(len(numbers), np.nan, dtype=object)
+    looked_up[known] = np.asarray(labels, dtype=object)[numbers[known].astype(int)]
+    return pd.Series(looked_up, index=values.index, dtype=object)
+
+
+def feature_values(records, current_year=None):
+    """
+    The model's inputs for a batch of merged claim records before they are
+    labelled: numbers as transform_neo4j_data_for_model computes them, except
+    that unknown dates, day gaps, prices and vehicle years stay NaN instead of
+    becoming 0, and the raw strings of the CATEGORICAL_SOURCES features.
+    """
+    frame = pd.DataFrame(list(records))
+    # Columns are collected first: inserting them into a frame one by one costs
+    # more than computing them for a single claim
+    out = {}
+    current_year = current_year or datetime.now().year
+
+    incident = _parse_dates(_column(frame, "date"))
+    claimed = _parse_dates(_column(frame, "last_updated"))
+    bound = _parse_dates(_column(frame, "created_at"))
+
+    out["Month"] = incident.dt.month
+    out["WeekOfMonth"] = _week_of_month(incident).fillna(0)
+    out["DayOfWeek"] = incident.dt.weekday
+    out["DayOfWeekClaimed"] = claimed.dt.weekday
+    out["MonthClaimed"] = claimed.dt.month
+    out["WeekOfMonthClaimed"] = _week_of_month(claimed).fillna(0)
+    out["Days:Policy-Accident"] = (incident - bound).dt.days
+    out["Days:Policy-Claim"] = (claimed - bound).dt.days
+
+    birth_year = _int_values(_strings(_column(frame, "dob")).str.split("/").str[-1])
+    out["Age"] = (current_year - birth_year).fillna(0)
+
+    out["VehiclePrice"] = _float_values(_column(frame, "idv"))
+    deductible = (
+        _float_values(_column(frame, "total_insurance_amount")) * _float_values(_column(frame, "ncb")) / 100
+    )
+    out["Deductible"] = deductible.fillna(0)
+
+    year = _int_values(_column(frame, "year"))
+    year = year.where(year != 0)
+    out["AgeOfVehicle"] = current_year - year
+    out["Year"] = year.fillna(current_year)
+
+    police_report = _column(frame, "police_report").fillna("No").astype(str)
+    out["PoliceReportFiled"] = (police_report.str.strip().str.lower() == "yes").astype(int)
+    out["WitnessPresent"] = _int_values(_column(frame, "witnesses")).fillna(0)
+
+    for name, source in PASSTHROUGH_SOURCES.items():
+        out[name] = _float_values(_column(frame, source)).fillna(0)
+    # Days from the last address change to the claim; NaN when there was none
+    out["AddressChange-Claim"] = _float_values(_column(frame, "addressChangeClaim"))
+
+    out = {name: values.astype(float) for name, values in out.items()}
+    for name, source in CATEGORICAL_SOURCES.items():
+        values = _column(frame, source)
+        out[name] = values.astype(str).where(values.notna())
+    return pd.DataFrame(out, index=frame.index)
+
+
+def feature_labels(values):
+    """The training-data label of every categorical feature, from a feature_values frame"""
+    labels = {}
+    for suffix in ("", "Claimed"):
+        labels[f"Month{suffix}"] = _lookup(values[f"Month{suffix}"], MONTH_LABELS, 1)
+        labels[f"DayOfWeek{suffix}"] = _lookup(values[f"DayOfWeek{suffix}"], DAY_LABELS, 0)
+    for name, (bounds, band_labels) in BANDS.items():
+        labels[name] = _band(values[name], bounds, band_labels)
+    for name, label in MISSING_LABELS.items():
+        labels[name] = labels[name].fillna(label)
+    for name in CATEGORICAL_SOURCES:
+        labels[name] = values[name]
+    return labels
+
+
+def emitted_labels():
+    """Every label feature_labels() can produce for the features it derives"""
+    emitted = {}
+    for suffix in ("", "Claimed"):
+        emitted[f"Month{suffix}"] = set(MONTH_LABELS)
+        emitted[f"DayOfWeek{suffix}"] = set(DAY_LABELS)
+    for name, (_, band_labels) in BANDS.items():
+        emitted[name] = set(band_labels)
+    for name, label in MISSING_LABELS.items():
+        emitted[name].add(label)
+    return emitted
+
+
+def build_feature_frame(records, columns=None, vocabulary=None):
+    """
+    Vectorized equivalent of transform_neo4j_data_for_model for a batch of
+    merged claim records (or a single one), returned as the model's feature
+    frame: categorical features encoded through the vocabulary, the rest float.
+    """
+    if columns is None:
+        from utils.detector import PREDICTION_COLUMNS
+        columns = PREDICTION_COLUMNS
+    vocabulary = vocabulary or get_vocabulary()
+    values = feature_values(records)
+    labels = feature_labels(values)
+
+    data = {}
+    for column in columns:
+        if column in labels:
+            data[column] = encode_categorical(labels[column], vocabulary.get(column, []))
+        elif column in values:
+            data[column] = values[column]
+        else:
+            data[column] = 0.0
+    return pd.DataFrame(data, index=values.index)
+
+
+def check_vocabulary(booster, vocabulary=None):
+    """
+    Problems with the vocabulary for a booster: categorical features it does
+    not cover, labels the pipeline emits that it lacks, and splits on codes
+    beyond its labels.
+    """
+    vocabulary = vocabulary or get_vocabulary()
+    names = booster.feature_names
+    categorical = {name for name, kind in zip(names, booster.feature_types) if kind == "c"}
+    problems = [f"{name}: categorical in the model but not in the vocabulary"
+                for name in sorted(categorical - set(vocabulary))]
+    for name, labels in sorted(emitted_labels().items()):
+        missing = sorted(labels - set(vocabulary.get(name, [])))
+        if name in vocabulary and missing:
+            problems.append(f"{name}: the pipeline emits {', '.join(missing)}, not in the vocabulary")
+
+    model = json.loads(booster.save_raw("json"))
+    highest = {}
+    for tree in model["learner"]["gradient_booster"]["model"]["trees"]:
+        for node, start, size in zip(tree["categories_nodes"], tree["categories_segments"],
+                                     tree["categories_sizes"]):
+            if size:
+                name = names[tree["split_indices"][node]]
+                highest[name] = max(highest.get(name, 0), max(tree["categories"][start:start + size]))
+    for name, code in sorted(highest.items()):
+        if name in vocabulary and code >= len(vocabulary[name]):
+            problems.append(f"{name}: the model splits on code {code}, the vocabulary has "
+                            f"{len(vocabulary[name])} labels")
+    return problems
+
+
+def _booster(path):
+    from utils.detector import NativeBoosterModel, load_model_file
+    model = load_model_file(path)
+    if isinstance(model, NativeBoosterModel):
+        return model.booster
+    return getattr(model, "best_estimator_", model).get_booster()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Inspect the fraud model's category vocabulary")
+    parser.add_argument("--check-model", nargs="?", const="", metavar="PATH",
+                        help="check the vocabulary against a model file (default: the scoring model)")
+    args = parser.parse_args()
+
+    vocabulary = get_vocabulary()
+    if args.check_model is None:
+        for name, categories in vocabulary.items():
+            print(f"{name}: {len(categories)} categories")
+        return
+
+    from config import Config
+    problems = check_vocabulary(_booster(args.check_model or Config.FRAUD_MODEL_PATH), vocabulary)
+    for problem in problems:
+        print(problem)
+    if problems:
+        raise SystemExit(1)
+    print("Vocabulary matches the model's categorical features.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+from database.connection import Neo4jConnection
+
+RED = "#FF0000"    # Red for fraud
+GREEN = "#00FF00"  # Green for legit
+
+
+def calculate_forgery_score(claim):
+    """
+    Calculate a forgery score based on fraud metrics with None type handling.
+    """
+    fraud_prediction = claim.get('fraudPrediction', 0) or 0
+    fraud_probability = claim.get('fraudProbability', 0.0) or 0.0
+    fraud_reason = claim.get('fraudReason', "") or ""
+
+    # Base score
+    score = fraud_probability * 100
+
+    # Add penalty for fraudulent claims
+    if fraud_prediction:
+        score += 20
+
+    # Reduce score if claim seems legitimate
+    if "legitimate" in fraud_reason.lower():
+        score *= 0.8
+
+    return round(score, 2)
+
+
+def get_fraud_color_code(claim):
+    """
+    Determines a color code with None type handling.
+    """
+    score = calculate_forgery_score(claim)
+    fraud_prediction = claim.get('fraudPrediction', 0) or 0
+    
+    # Use thresholds for color coding
+    if fraud_prediction == 1 or score >= 20:
+        return RED
+    else:
+        return GREEN
+
+
+def is_red(claim):
+    """True when the claim would be flagged red on the admin views"""
+    return get_fraud_color_code(claim) == RED
+
+
+def fraud_score_fields(claim):
+    """The forgery score and colour stored on ClaimManagement alongside the fraud fields"""
+    return {
+        "forgery_score": calculate_forgery_score(claim),
+        "color_code": get_fraud_color_code(claim)
+    }
+
+
+def backfill_fraud_scores(neo4j=None, batch_size=None):
+    """
+    Store forgeryScore/colorCode on ClaimManagement nodes written before they
+    were persisted. Returns the number of nodes updated.
+    """
+    neo4j = neo4j or Neo4jConnection()
+    rows = [
+        dict(fraud_score_fields(record), element_id=record["element_id"])
+        for record in neo4j.stream_query("""
+        MATCH (cm:ClaimManagement)
+        WHERE cm.forgeryScore IS NULL OR cm.colorCode IS NULL
+        RETURN elementId(cm) as element_id,
+               cm.fraudPrediction as fraudPrediction,
+               cm.fraudProbability as fraudProbability,
+               cm.fraudReason as fraudReason
+        """)
+    ]
+    if not rows:
+        return 0
+    return neo4j.write_batches("""
+    UNWIND $rows AS row
+    MATCH (cm:ClaimManagement) WHERE elementId(cm) = row.element_id
+    SET cm.forgeryScore = row.forgery_score,
+        cm.colorCode = row.color_code
+    """, rows, batch_size=batch_size)
@@ -0,0 +1,199 @@
+"""
+In-process fraud-scoring queue.
+
+Claim submission marks the ClaimManagement node `scoringStatus = 'queued'` in
+the same write that creates the claim and then hands the id to this queue, so
+the HTTP response never waits for inference. The job state lives on the node:
+
+    queued -> running -> completed | failed
+
+Because the state is persisted, jobs that were dropped (queue full) or cut off
+by a restart are picked up again by the recovery sweep.
+"""
+import queue
+import threading
+import time
+
+from config import Config
+from database.connection import Neo4jConnection
+from utils.detector import predict_from_neo4j, analyze_fraud_and_save
+
+# SET clause that (re)queues scoring for `cm`; used inside the claim-creating writes
+QUEUE_SCORING_SET = """
+    cm.scoringStatus = 'queued',
+    cm.scoringCustomerId = $email,
+    cm.scoringQueuedAt = timestamp(),
+    cm.scoringError = null
+"""
+
+# A job is claimed by moving it to running. Running jobs whose worker died
+# (restart) are claimable again once their lease is stale. Writing _lock first
+# takes the node's write lock before the status is read, so of two workers
+# racing for the job the second sees 'running' and claims nothing; the lock is
+# held to commit even though the property is removed straight away.
+CLAIM_JOB_QUERY = """
+MATCH (cm:ClaimManagement {id: $management_id})
+SET cm._lock = true
+REMOVE cm._lock
+WITH cm
+WHERE cm.scoringStatus = 'queued'
+   OR (cm.scoringStatus = 'running' AND cm.scoringStartedAt < timestamp() - $stale_ms)
+SET cm.scoringStatus = 'running',
+    cm.scoringStartedAt = timestamp()
+RETURN cm.scoringCustomerId AS customer_id, cm.scoringStartedAt AS started_at
+"""
+
+# A claim attached while the job ran leaves it queued so the new claim is scored too
+FINISH_JOB_QUERY = """
+MATCH (cm:ClaimManagement {id: $management_id})
+SET cm.scoringStatus = CASE
+        WHEN $error IS NULL AND cm.scoringQueuedAt > $started_at THEN 'queued'
+        WHEN $error IS NULL THEN 'completed'
+        ELSE 'failed' END,
+    cm.scoringError = $error,
+    cm.scoringFinishedAt = timestamp()
+RETURN cm.scoringStatus AS status
+"""
+
+PENDING_JOBS_QUERY = """
+MATCH (cm:ClaimManagement)
+WHERE cm.scoringStatus = 'queued'
+   OR (cm.scoringStatus = 'running' AND cm.scoringStartedAt < timestamp() - $stale_ms)
+RETURN cm.id AS management_id
+ORDER BY cm.scoringQueuedAt
+LIMIT $limit
+"""
+
+
+class ScoringQueue:
+    """Bounded job queue drained by a fixed pool of daemon worker threads"""
+
+    def __init__(self, workers, maxsize):
+        self.workers = workers
+        self.queue = queue.Queue(maxsize=maxsize)
+        self.neo4j = Neo4jConnection()
+        self.stale_ms = int(Config.SCORING_STALE_AFTER * 1000)
+        self._pending = set()
+        self._waiters = {}
+        self._lock = threading.Lock()
+        self._started = False
+        self.counters = {'enqueued': 0, 'dropped': 0, 'completed': 0, 'failed': 0}
+
+    def start(self, recovery_interval=None):
+        """Start the workers and the recovery sweep (once per process)"""
+        with self._lock:
+            if self._started:
+                return
+            self._started = True
+
+        for _ in range(self.workers):
+            worker = threading.Thread(target=self._work)
+            worker.daemon = True
+            worker.start()
+
+        sweeper = threading.Thread(target=self._sweep, args=(recovery_interval or Config.SCORING_RECOVERY_INTERVAL,))
+        sweeper.daemon = True
+        sweeper.start()
+
+    def submit(self, management_id):
+        """
+        Queue a persisted job. Returns False when the queue is full; the node
+        stays queued and the next recovery sweep resubmits it.
+        """
+        with self._lock:
+            if management_id in self._pending:
+                return True
+            try:
+                self.queue.put_nowait(management_id)
+            except queue.Full:
+                self.counters['dropped'] += 1
+                return False
+            self._pending.add(management_id)
+            self.counters['enqueued'] += 1
+        return True
+
+    def wait(self, management_id, timeout):
+        """Block until this process finishes the job or timeout passes; True if it finished"""
+        with self._lock:
+            if management_id not in self._pending:
+                return False
+            event = self._waiters.setdefault(management_id, threading.Event())
+        return event.wait(timeout)
+
+    def recover(self, limit=None):
+        """Resubmit queued jobs and jobs whose running worker went away"""
+        limit = limit or self.queue.maxsize or 1000
+        records = self.neo4j.execute_query(PENDING_JOBS_QUERY, {'stale_ms': self.stale_ms, 'limit': limit})
+        submitted = 0
+        for record in records:
+            if not self.submit(record['management_id']):
+                break
+            submitted += 1
+        return submitted
+
+    def stats(self):
+        with self._lock:
+            return dict(self.counters, queued=self.queue.qsize(), maxsize=self.queue.maxsize,
+                        workers=self.workers)
+
+    def _sweep(self, interval):
+        while True:
+            try:
+                self.recover()
+            except Exception as e:
+                print(f"Scoring recovery sweep failed: {str(e)}")
+            time.sleep(interval)
+
+    def _work(self):
+        while True:
+            management_id = self.queue.get()
+            requeue = False
+            try:
+                requeue = self._run(management_id)
+            except Exception as e:
+                print(f"Scoring job {management_id} failed: {str(e)}")
+            finally:
+                with self._lock:
+                    self._pending.discard(management_id)
+                    event = self._waiters.pop(management_id, None)
+                if event:
+                    event.set()
+                self.queue.task_done()
+            if requeue:
+                # Another claim arrived while scoring; go again for it
+                self.submit(management_id)
+
+    def _run(self, management_id):
+        """Claim and score one job; returns True if it was queued again meanwhile"""
+        claimed = self.neo4j.execute_query(CLAIM_JOB_QUERY, {
+            'management_id': management_id, 'stale_ms': self.stale_ms
+        })
+        if not claimed:
+            return False  # finished already or taken by another process
+
+        error = None
+        try:
+            customer_id = claimed[0]['customer_id']
+            if customer_id:
+                predict_from_neo4j(customer_id=customer_id)
+            analyze_fraud_and_save(management_id)
+        except Exception as e:
+            error = str(e)
+            print(f"Error scoring claim {management_id}: {error}")
+
+        finished = self.neo4j.execute_query(FINISH_JOB_QUERY, {
+            'management_id': management_id,
+            'started_at': claimed[0]['started_at'],
+            'error': error
+        })
+        with self._lock:
+            self.counters['failed' if error else 'completed'] += 1
+        return bool(finished) and finished[0]['status'] == 'queued'
+
+
+scoring_queue = ScoringQueue(Config.SCORING_WORKERS, Config.SCORING_QUEUE_SIZE)
+
+
+def start_scoring_workers():
+    scoring_queue.start()
+    return scoring_queue
@@ -0,0 +1,175 @@
+"""
+Shadow evaluation of a candidate fraud model.
+
+When Config.FRAUD_SHADOW_MODEL_PATH is set, every claim scored by the
+production model (once per claim, keyed by its ClaimManagement id) is also
+scored by the candidate on a background thread, off the request path. Both
+results, the probability delta and each model's latency go to
+logs/shadow_scores.jsonl; nothing the candidate produces is written to the
+graph. Latency covers predict and predict_proba only, for both models; the
+production fraud-reason contributions are not included. Summarize the log with:
+
+    python -m utils.shadow                 # whole log
+    python -m utils.shadow --last 1000     # most recent 1000 claims
+"""
+import argparse
+import json
+import os
+import queue
+import threading
+import time
+from collections import deque
+from datetime import datetime
+
+from config import Config
+
+SHADOW_LOG_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                               'logs', 'shadow_scores.jsonl')
+
+
+class ShadowScorer:
+    """Bounded queue of scored feature frames replayed against the candidate model"""
+
+    def __init__(self, model_path, log_path=SHADOW_LOG_PATH, maxsize=1000):
+        self.model_path = model_path
+        self.log_path = log_path
+        self.queue = queue.Queue(maxsize=maxsize)
+        self.dropped = 0
+        self._thread = None
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self):
+        return bool(self.model_path)
+
+    def submit(self, claim_ids, df_features, primary_model, prediction, fraud_prob, latency):
+        """
+        Hand a frame the production model just scored to the shadow thread.
+        Never blocks: when the queue is full the frame is dropped and counted.
+        """
+        if not self.enabled:
+            return False
+        self._ensure_started()
+        try:
+            self.queue.put_nowait((list(claim_ids), df_features, {
+                'version': primary_model.version,
+                'prediction': [int(p) for p in prediction],
+                'probability': [float(p) for p in fraud_prob] if fraud_prob is not None else None,
+                'latency': latency
+            }))
+        except queue.Full:
+            with self._lock:
+                self.dropped += 1
+            return False
+        return True
+
+    def _ensure_started(self):
+        with self._lock:
+            if self._thread is None:
+                os.makedirs(os.path.dirname(self.log_path), exist_ok=True)
+                self._thread = threading.Thread(target=self._work)
+                self._thread.daemon = True
+                self._thread.start()
+
+    def _work(self):
+        # Imported here: utils.detector imports this module
+        from utils.detector import model_registry, predict_features
+        while True:
+            claim_ids, df_features, primary = self.queue.get()
+            try:
+                candidate = model_registry.get(self.model_path)
+                start = time.perf_counter()
+                prediction, fraud_prob, _ = predict_features(candidate.model, df_features, with_reasons=False)
+                latency = time.perf_counter() - start
+                self._log(claim_ids, primary, {
+                    'version': candidate.version,
+                    'prediction': [int(p) for p in prediction],
+                    'probability': [float(p) for p in fraud_prob] if fraud_prob is not None else None,
+                    'latency': latency
+                })
+            except Exception as e:
+                print(f"Shadow scoring failed: {str(e)}")
+            finally:
+                self.queue.task_done()
+
+    def _log(self, claim_ids, primary, shadow):
+        rows = len(claim_ids)
+        now = datetime.now().isoformat()
+        lines = []
+        for index, claim_id in enumerate(claim_ids):
+            entry = {'timestamp': now, 'claim_id': claim_id, 'batch_size': rows}
+            for name, result in (('primary', primary), ('shadow', shadow)):
+                entry[name] = {
+                    'model_version': result['version'],
+                    'prediction': result['prediction'][index],
+                    'probability': result['probability'][index] if result['probability'] else None,
+                    'latency_ms': round(result['latency'] / rows * 1000, 3)
+                }
+            if entry['primary']['probability'] is not None and entry['shadow']['probability'] is not None:
+                entry['delta'] = entry['shadow']['probability'] - entry['primary']['probability']
+            lines.append(json.dumps(entry))
+        with open(self.log_path, 'a') as f:
+            f.write('\n'.join(lines) + '\n')
+
+
+shadow_scorer = ShadowScorer(Config.FRAUD_SHADOW_MODEL_PATH, maxsize=Config.SHADOW_QUEUE_SIZE)
+
+
+def _percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def shadow_report(log_path=SHADOW_LOG_PATH, last=None):
+    """Agreement, probability deltas and latency per model over the shadow log"""
+    entries = deque(maxlen=last)
+    with open(log_path) as f:
+        for line in f:
+            if line.strip():
+                entries.append(json.loads(line))
+    if not entries:
+        return {'claims': 0}
+
+    agree = sum(1 for e in entries if e['primary']['prediction'] == e['shadow']['prediction'])
+    deltas = [abs(e['delta']) for e in entries if e.get('delta') is not None]
+    flips = {
+        'legit_to_fraud': sum(1 for e in entries
+                              if e['primary']['prediction'] == 0 and e['shadow']['prediction'] == 1),
+        'fraud_to_legit': sum(1 for e in entries
+                              if e['primary']['prediction'] == 1 and e['shadow']['prediction'] == 0),
+    }
+    report = {
+        'claims': len(entries),
+        'agreement': round(agree / len(entries), 4),
+        'flips': flips,
+        'mean_abs_delta': round(sum(deltas) / len(deltas), 4) if deltas else None,
+        'max_abs_delta': round(max(deltas), 4) if deltas else None,
+        'models': {}
+    }
+    for name in ('primary', 'shadow'):
+        latencies = [e[name]['latency_ms'] for e in entries]
+        report['models'][name] = {
+            'versions': sorted({e[name]['model_version'][:12] for e in entries}),
+            'fraud_rate': round(sum(e[name]['prediction'] for e in entries) / len(entries), 4),
+            'latency_ms_p50': _percentile(latencies, 50),
+            'latency_ms_p95': _percentile(latencies, 95),
+        }
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Summarize shadow model scoring")
+    parser.add_argument('--log', default=SHADOW_LOG_PATH)
+    parser.add_argument('--last', type=int, help="only the most recent N claims")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.log):
+        print(f"No shadow log at {args.log}; set FRAUD_SHADOW_MODEL_PATH to start shadow scoring.")
+        return
+    print(json.dumps(shadow_report(args.log, args.last), indent=2))
+
+
+if __name__ == '__main__':
+    main()